@@ -0,0 +1,83 @@
+"""
+Backfill of a synthetic transaction history with ``Backfill`` using 1 to
+``max_processes`` decoding processes, compared to ``iter_transactions``.
+Responses are rendered once and replayed, so fetching costs only the
+simulated latency.
+
+    $ python -m benchmarks.bench_backfill [transactions] [max_processes] \\
+        [latency_ms]
+"""
+import datetime
+import multiprocessing
+import sys
+import time
+import timeit
+
+import iso8601
+
+import sofort
+from sofort.backfill import Backfill
+from sofort.testing import FakeSofortApi, FakeTransport
+
+TO_TIME = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+FROM_TIME = TO_TIME - datetime.timedelta(days=365)
+PAGE_SIZE = 100
+
+
+class ReplayTransport(FakeTransport):
+    """Answers repeated requests with the response rendered first time"""
+    def __init__(self, api, latency):
+        FakeTransport.__init__(self, api)
+        self.responses = {}
+        self.delay = latency
+
+    def post(self, url, auth, data, stream=False, timeout=None):
+        if data not in self.responses:
+            self.responses[data] = FakeTransport.post(self, url, auth, data)
+        if self.delay:
+            time.sleep(self.delay)
+        response = self.responses[data]
+        return type(response)(response.status_code, response.content)
+
+
+def main(transactions=100000, max_processes=None, latency_ms=20):
+    max_processes = max_processes or multiprocessing.cpu_count()
+    api = FakeSofortApi(seed=1)
+    api.generate(transactions, FROM_TIME, TO_TIME)
+    transport = ReplayTransport(api, latency_ms / 1000.0)
+    client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                           transport=transport)
+    timer = timeit.default_timer
+
+    def consume(iterable):
+        start = timer()
+        count = sum(1 for _ in iterable)
+        assert count == transactions, count
+        return timer() - start
+
+    # renders every page once
+    transport.delay = 0
+    consume(client.iter_transactions(FROM_TIME, TO_TIME, PAGE_SIZE))
+    transport.delay = latency_ms / 1000.0
+
+    print('{0} transactions, {1} per page, {2} ms latency, {3} CPUs'.format(
+        transactions, PAGE_SIZE, latency_ms, multiprocessing.cpu_count()))
+    elapsed = consume(client.iter_transactions(FROM_TIME, TO_TIME,
+                                               PAGE_SIZE))
+    print('{0:<24} {1:8.2f} s {2:10.0f} transactions/s'.format(
+        'iter_transactions', elapsed, transactions / elapsed))
+
+    single = None
+    processes = 1
+    while processes <= max_processes:
+        elapsed = consume(Backfill(client, processes).run(
+            FROM_TIME, TO_TIME, PAGE_SIZE))
+        single = single or elapsed
+        print('{0:<24} {1:8.2f} s {2:10.0f} transactions/s  x{3:.2f}'.format(
+            'Backfill processes={0}'.format(processes), elapsed,
+            transactions / elapsed, single / elapsed))
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
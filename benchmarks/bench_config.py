@@ -0,0 +1,107 @@
+"""
+Cost of ``Config.clone`` and of ``Client.payment`` request building with
+copy-on-write ``Config`` versus the previous deep-copying clone, for
+small and large client defaults.
+
+    $ python -m benchmarks.bench_config [number]
+
+Allocations are reported when ``tracemalloc`` is available (Python 3).
+"""
+import copy
+import sys
+import timeit
+
+import sofort
+from sofort.internals import Config
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class DeepCopyConfig(object):
+    """Config as it was before copy-on-write"""
+    def __init__(self, **params):
+        self.update(params)
+
+    def has(self, key):
+        return key in self.__dict__.keys()
+
+    def update(self, dict_):
+        self.__dict__.update(dict_)
+        return self
+
+    def clone(self):
+        return DeepCopyConfig(**copy.deepcopy(self.__dict__))
+
+
+def defaults(size):
+    return dict(
+        base_url='https://api.sofort.com/api/xml',
+        user_id='123456', api_key='secret', project_id='654321',
+        currency_code='EUR', country_code='DE',
+        success_url='https://shop.example.com/ok?trn=' + sofort.TRANSACTION_ID,
+        abort_url='https://shop.example.com/abort?trn=' + sofort.TRANSACTION_ID,
+        notification_urls=dict(
+            ('event{0}'.format(i), 'https://shop.example.com/n{0}'.format(i))
+            for i in range(size)),
+        reasons=['Default reason'],
+        extra_defaults=['value {0}'.format(i) for i in range(size)],
+    )
+
+
+def allocated(func, number):
+    """Peak bytes allocated by a single call"""
+    if tracemalloc is None:
+        return None
+    func()
+    peaks = []
+    for _ in range(number):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+    return min(peaks)
+
+
+def timed(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def clone_and_update(config_type, size):
+    config = config_type(**defaults(size))
+
+    def run():
+        params = config.clone().update({'amount': 10}) \
+                               .update({'reasons': ['Invoice 1']})
+        return params.base_url, params.user_id, params.api_key
+    return run
+
+
+def client_payment(size):
+    params = defaults(size)
+    client = sofort.Client(params.pop('user_id'), params.pop('api_key'),
+                           params.pop('project_id'), **params)
+    return lambda: client._payment_request(10, reasons=['Invoice 1'])
+
+
+def main(number=2000):
+    print('{0:<28} {1:>6} {2:>12} {3:>14}'.format(
+        'case', 'size', 'time us', 'peak alloc B'))
+    for size in (10, 100, 1000):
+        cases = [
+            ('deepcopy clone + update', clone_and_update(DeepCopyConfig, size)),
+            ('cow clone + update', clone_and_update(Config, size)),
+            ('client._payment_request', client_payment(size)),
+        ]
+        for name, func in cases:
+            alloc = allocated(func, 5)
+            print('{0:<28} {1:>6} {2:12.2f} {3:>14}'.format(
+                name, size, timed(func, number) * 1e6,
+                '-' if alloc is None else '{0:.0f}'.format(alloc)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,50 @@
+"""
+``model.response`` (xmltodict + schematics) versus ``fastmodel.response``
+(lxml + slotted records) on the fixtures of ``tests/test_sofort.py`` and
+a synthetic page of transactions.
+
+    $ python -m benchmarks.bench_decoders [repeat]
+"""
+import sys
+import timeit
+import warnings
+
+from sofort import fastmodel, model
+from benchmarks import fixtures
+from tests import test_sofort
+
+SAMPLES = [
+    ('new_transaction', test_sofort.TRANSACTION_RESPONSE),
+    ('transaction_by_id', test_sofort.TRANSACTION_BY_ID_RESPONSE),
+    ('transactions_by_ids', test_sofort.TRANSACTION_LIST_BY_IDS_RESPONSE),
+    ('transactions_search', test_sofort.TRANSACTION_LIST_BY_SEARCH_PARAMS),
+    ('refunds', test_sofort.REFUNDS_RESPONSE),
+    ('warning', test_sofort.EXTRA_WARNING),
+    ('transactions_x100', fixtures.transactions_xml(100)),
+]
+
+DECODERS = [
+    ('schematics', model.response),
+    ('lxml', fastmodel.response),
+]
+
+
+def best_of(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(repeat=5):
+    warnings.simplefilter('ignore')
+    print('{0:<22} {1:>14} {2:>14} {3:>8}'.format(
+        'fixture', 'schematics us', 'lxml us', 'speedup'))
+    for name, xml in SAMPLES:
+        xml = xml.encode('utf-8')
+        number = 5 if 'x100' in name else 200
+        timings = [best_of(lambda: decode(xml), repeat, number)
+                   for _, decode in DECODERS]
+        print('{0:<22} {1:14.1f} {2:14.1f} {3:7.1f}x'.format(
+            name, timings[0] * 1e6, timings[1] * 1e6, timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,110 @@
+"""
+Import time of ``import sofort`` in a fresh interpreter, measured with
+``-X importtime`` (Python 3.7+, wall time around the import on older
+versions). Heavy dependencies must not be loaded by the import, and the
+best of ``--repeat`` runs must fit into the budget; the exit status is 1
+otherwise. CI runs it on every build.
+
+    $ python -m benchmarks.bench_import
+    $ python -m benchmarks.bench_import --budget 20 --top 10
+
+The budget of 30 ms leaves room for slow CI machines, ``import sofort``
+takes about 15 ms on a developer laptop. Importing everything the client
+may need on first request (lxml, schematics models, requests) takes
+about 120 ms and is reported for comparison.
+"""
+import argparse
+import subprocess
+import sys
+
+BUDGET_MS = 30
+
+HEAVY_MODULES = ('lxml', 'xmltodict', 'schematics', 'iso8601', 'requests')
+
+FULL_IMPORT = 'import sofort.model, sofort.xml, sofort.transport'
+
+LOADED = '''
+import sys
+print(' '.join(sorted(set(name.split('.')[0] for name in sys.modules))))
+'''
+
+TIMED = '''
+import timeit
+start = timeit.default_timer()
+{0}
+print(timeit.default_timer() - start)
+'''
+
+
+def importtime_supported():
+    return sys.version_info >= (3, 7)
+
+
+def measure(statement, module):
+    """Seconds taken by ``statement`` and ``[(us, name), ...]`` of the
+    slowest modules, if known"""
+    if not importtime_supported():
+        output = subprocess.check_output(
+            [sys.executable, '-c', TIMED.format(statement)])
+        return float(output), []
+
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    total = 0
+    modules = []
+    for line in stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue  # header
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        modules.append((int(own), name))
+        # entries imported by the statement itself, e.g. ``sofort``
+        if depth == 1 and name.split('.')[0] == module:
+            total += int(cumulative)
+    return total / 1e6, sorted(modules, reverse=True)
+
+
+def loaded_heavy_modules():
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'import sofort' + LOADED])
+    return sorted(set(output.decode('ascii').split()) & set(HEAVY_MODULES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--budget', type=float, default=BUDGET_MS,
+                        help='maximal import time, milliseconds')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of fresh interpreters measured')
+    parser.add_argument('--top', type=int, default=0,
+                        help='list slowest modules of the best run')
+    args = parser.parse_args(argv)
+
+    light = min((measure('import sofort', 'sofort')
+                 for _ in range(args.repeat)), key=lambda run: run[0])
+    full = min(measure(FULL_IMPORT, 'sofort')[0] for _ in range(args.repeat))
+    heavy = loaded_heavy_modules()
+
+    print('import sofort        {0:8.1f} ms   budget {1:.0f} ms'.format(
+        light[0] * 1000, args.budget))
+    print('with all dependencies {0:7.1f} ms'.format(full * 1000))
+    for own, name in light[1][:args.top]:
+        print('    {0:8.1f} ms  {1}'.format(own / 1000.0, name))
+
+    failed = False
+    if heavy:
+        print('heavy modules loaded by import: {0}'.format(', '.join(heavy)))
+        failed = True
+    if light[0] * 1000 > args.budget:
+        print('import time exceeds budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
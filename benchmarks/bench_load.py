@@ -0,0 +1,60 @@
+"""
+Load test of ``sofort.Client`` against the fake Sofort API served over
+HTTP, with simulated latency and a small share of failing requests.
+Reports throughput and latency of ``details`` calls.
+
+    $ python -m benchmarks.bench_load [calls] [threads] [latency_ms]
+"""
+import sys
+import timeit
+from multiprocessing.pool import ThreadPool
+
+import sofort
+from sofort.resilience import RetryPolicy
+from sofort.testing import FakeServer, FakeSofortApi
+
+from benchmarks.bench_transport import percentile
+
+
+def main(calls=2000, threads=16, latency_ms=20):
+    latency = latency_ms / 1000.0
+    api = FakeSofortApi(latency=(latency / 2, latency * 1.5),
+                        errors={503: 0.01}, seed=1)
+    ids = api.generate(1000)
+    timer = timeit.default_timer
+
+    with FakeServer(api) as server:
+        client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                               base_url=server.url, pool_maxsize=threads,
+                               retry=RetryPolicy(backoff=0.01))
+
+        def call(index):
+            start = timer()
+            try:
+                client.details(ids[index % len(ids)])
+                failed = False
+            except Exception:
+                failed = True
+            return timer() - start, failed
+
+        pool = ThreadPool(threads)
+        try:
+            start = timer()
+            results = pool.map(call, range(calls))
+            elapsed = timer() - start
+        finally:
+            pool.terminate()
+            client.close()
+
+    samples = [sample for sample, _ in results]
+    print('{0} calls, {1} threads, {2} ms latency'.format(
+        calls, threads, latency_ms))
+    print('throughput {0:10.1f} calls/s'.format(calls / elapsed))
+    print('latency    p50 {0:8.3f} ms   p99 {1:8.3f} ms'.format(
+        percentile(samples, 50) * 1000, percentile(samples, 99) * 1000))
+    print('failed     {0}   requests sent {1}'.format(
+        sum(failed for _, failed in results), api.requests))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
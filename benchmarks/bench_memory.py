@@ -0,0 +1,124 @@
+"""
+Memory kept by decoded transactions, in bytes per transaction, for each
+decoder. Measured with :mod:`tracemalloc` (Python 3.4+) as memory still
+allocated after decoding a ``transactions`` response of ``count``
+transactions and dropping the XML.
+
+    $ python -m benchmarks.bench_memory [count]
+
+``model.lazy_response`` is left out as it keeps the lxml tree, which is
+allocated by libxml2 and not seen by tracemalloc.
+
+Without tracemalloc (Python 2.7) peak RSS is used instead: every
+decoder runs in fresh interpreters which decode a response of
+``count / REPEAT`` transactions once and ``REPEAT + 1`` times, keeping
+the results. The difference in peak RSS is memory kept by ``count``
+transactions, parser buffers freed in between cancel out. Memory freed
+by Python but not returned to the system is counted, so numbers are
+higher than with tracemalloc.
+"""
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+
+from sofort import columns, compact, fastmodel, model
+
+from benchmarks import fixtures
+
+DECODERS = (
+    ('model.response', model.response),
+    ('fastmodel.response', fastmodel.response),
+    ('compact.response', compact.response),
+    ('columns.response', columns.response),
+)
+
+REPEAT = 5
+
+
+def retained(decode, document):
+    """Bytes allocated by ``decode(document)`` and kept by its result"""
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = decode(document)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def peak_growth(name, path, times):
+    """
+    Bytes peak RSS grows by while decoder ``name`` decodes ``path``
+    ``times`` times in a fresh interpreter
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.bench_memory', '--child', name,
+         path, str(times)])
+    return int(output.decode('ascii'))
+
+
+def child(name, path, times):
+    import resource
+
+    decode = dict(DECODERS)[name]
+    decode(fixtures.transactions_xml(10).encode('utf-8'))
+    with open(path, 'rb') as f:
+        document = f.read()
+    gc.collect()
+    # ru_maxrss is in kilobytes on Linux
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results = [decode(document) for _ in range(int(times))]
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del results
+    print(1024 * (after - before))
+
+
+def main(count=10000):
+    if sys.version_info >= (3, 4):
+        document = fixtures.transactions_xml(count).encode('utf-8')
+        # warm up caches and lazily built tables (e.g. interned codes)
+        for _, decode in DECODERS:
+            decode(fixtures.transactions_xml(10).encode('utf-8'))
+
+        def measure(name, decode):
+            return retained(decode, document)
+        return report(count, 'kept', measure)
+
+    size = max(count // REPEAT, 1)
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        fixtures.write_transactions_xml(path, size)
+
+        def measure(name, decode):
+            return peak_growth(name, path, REPEAT + 1) - \
+                peak_growth(name, path, 1)
+        return report(size * REPEAT, 'peak RSS', measure)
+    finally:
+        os.unlink(path)
+
+
+def report(count, label, measure):
+    print('{0} transactions, {1} bytes/transaction'.format(count, label))
+    reference = None
+    for name, decode in DECODERS:
+        size = measure(name, decode) / float(count)
+        reference = reference or size
+        print('{0:<20} {1:10.0f} bytes/transaction  {2:6.1%}'.format(
+            name, size, size / reference))
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+    else:
+        sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,61 @@
+"""
+Full ``sofort.xml.multipay`` versus precompiled ``MultipayTemplate``,
+checks both produce the same bytes before timing.
+
+    $ python -m benchmarks.bench_multipay [number]
+"""
+import sys
+import timeit
+
+import sofort
+from sofort._version import __version__
+from sofort.internals import Config
+from sofort.xml import MultipayTemplate, multipay
+
+DEFAULTS = Config(
+    project_id=123456,
+    currency_code='EUR',
+    country_code='DE',
+    interface_version='python_sofort_v.{0}'.format(__version__),
+    success_link_redirect=True,
+    success_url='https://shop.example.com/success?trn=' + sofort.TRANSACTION_ID,
+    abort_url='https://shop.example.com/abort?trn=' + sofort.TRANSACTION_ID,
+    notification_urls={
+        'default': 'https://shop.example.com/notify?trn=' + sofort.TRANSACTION_ID,
+        'loss': 'https://shop.example.com/notify?trn=' + sofort.TRANSACTION_ID,
+        'refund': 'https://shop.example.com/refund?trn=' + sofort.TRANSACTION_ID,
+        'received': 'https://shop.example.com/notify?trn=' + sofort.TRANSACTION_ID,
+    },
+    notification_emails={'default': 'shop@example.com'},
+)
+
+
+def main(number=20000):
+    params = DEFAULTS.clone().update({
+        'amount': 199.99,
+        'reasons': ['Invoice 0001', sofort.TRANSACTION_ID],
+        'user_variables': ['customer-42'],
+    })
+    template = MultipayTemplate.compile(DEFAULTS)
+    assert template.matches(params)
+    assert template.render(params) == multipay(params), 'output differs'
+    print('output is byte-for-byte identical')
+
+    full = min(timeit.repeat(lambda: multipay(params), number=number,
+                             repeat=3)) / number
+    fast = min(timeit.repeat(lambda: template.render(params), number=number,
+                             repeat=3)) / number
+    def matches_and_render():
+        assert template.matches(params)
+        return template.render(params)
+
+    checked = min(timeit.repeat(matches_and_render, number=number,
+                                repeat=3)) / number
+    print('multipay          {0:8.2f} us'.format(full * 1e6))
+    print('template.render   {0:8.2f} us'.format(fast * 1e6))
+    print('matches + render  {0:8.2f} us   {1:.1f}x faster'.format(
+        checked * 1e6, full / checked))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,116 @@
+"""
+API requests needed to follow open transactions for a simulated day with
+``StatusPoller``, compared to checking every open transaction each
+minute, one request per transaction or in batches of 100. Transactions
+are created over the first 12 hours, most of them are received within 6
+hours, some are lost and the rest stay pending. Detection delay is the
+time between a status change and the poller reporting it.
+
+    $ python -m benchmarks.bench_polling [transactions]
+"""
+import calendar
+import datetime
+import random
+import sys
+
+import iso8601
+
+import sofort
+from sofort.polling import StatusPoller
+from sofort.testing import FakeSofortApi, FakeTransport
+
+START = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+DAY = 86400
+STEP = 60
+BATCH = 100
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def outcome(rand, created):
+    """``(status, status_reason, seconds)`` the transaction ends with"""
+    draw = rand.random()
+    if draw < 0.7:
+        return 'received', 'credited', created + rand.uniform(600, 6 * 3600)
+    if draw < 0.8:
+        return 'loss', 'not_credited', created + rand.uniform(3600, 12 * 3600)
+    return None
+
+
+def main(transactions=2000):
+    rand = random.Random(1)
+    start = calendar.timegm(START.utctimetuple())
+    api = FakeSofortApi(seed=1)
+    transaction_ids = api.generate(transactions, START,
+                                   START + datetime.timedelta(hours=12),
+                                   statuses=[('pending', 'not_credited_yet')])
+    created = dict((transaction_id, calendar.timegm(
+        api.transactions[transaction_id]['time'].utctimetuple()))
+        for transaction_id in transaction_ids)
+    changes = sorted((result[2], transaction_id) + result[:2]
+                     for transaction_id, result in (
+                         (transaction_id,
+                          outcome(rand, created[transaction_id]))
+                         for transaction_id in transaction_ids)
+                     if result is not None)
+    changed_at = dict((transaction_id, when)
+                      for when, transaction_id, _, _ in changes)
+
+    clock = Clock(start)
+    client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                           transport=FakeTransport(api))
+    poller = StatusPoller(client, clock=clock)
+    delays = []
+
+    @poller.subscribe
+    def record(change):
+        if change.previous is not None:
+            delays.append(clock.now - changed_at[change.transaction])
+
+    unseen = sorted(transaction_ids, key=created.get)
+    naive = naive_batched = 0
+    while clock.now < start + DAY:
+        while unseen and created[unseen[0]] <= clock.now:
+            transaction_id = unseen.pop(0)
+            poller.track(transaction_id, status='pending',
+                         created=created[transaction_id])
+        while changes and changes[0][0] <= clock.now:
+            when, transaction_id, status, status_reason = changes.pop(0)
+            api.set_status(transaction_id, status, status_reason,
+                           datetime.datetime.fromtimestamp(when, iso8601.UTC))
+        poller.tick()
+
+        open_count = sum(1 for transaction_id in transaction_ids
+                         if created[transaction_id] <= clock.now and
+                         changed_at.get(transaction_id, clock.now + 1) >
+                         clock.now - STEP)
+        naive += open_count
+        naive_batched += -(-open_count // BATCH)
+        clock.now += STEP
+
+    delays.sort()
+    print('{0} transactions, {1} status changes in a day'.format(
+        transactions, len(changed_at)))
+    print('{0:<26} {1:>9}'.format('strategy', 'requests'))
+    for name, requests in (('every minute, per ID', naive),
+                           ('every minute, batched', naive_batched),
+                           ('StatusPoller', poller.requests)):
+        print('{0:<26} {1:>9}  {2:8.1f}x'.format(
+            name, requests, float(naive) / max(requests, 1)))
+    if delays:
+        print('detection delay: median {0:.0f} s, 95% {1:.0f} s, '
+              'max {2:.0f} s'.format(delays[len(delays) // 2],
+                                     delays[int(len(delays) * 0.95)],
+                                     delays[-1]))
+    print('still tracked: {0}'.format(len(poller)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of reason sanitizing on a million reasons, compared to the
+former ``re.sub`` implementation, for unique reasons and for reasons
+built from a few templates.
+
+    $ python -m benchmarks.bench_reasons [reasons] [templates]
+"""
+import re
+import sys
+import timeit
+
+from sofort import internals
+
+
+def legacy_strip_reason(reason):
+    return re.sub(u'(?u)[^\\w\\ \\+\\-\\.\\,]', '', reason)
+
+
+def main(count=1000000, templates=100):
+    unique = [u'Rechnung {0} f\xfcr M\xfcller & S\xf6hne GmbH!'.format(i)
+              for i in range(count)]
+    templated = [u'Bestellung {0} – Stra\xdfe'.format(i % templates)
+                 for i in range(count)]
+
+    print('{0} reasons'.format(count))
+    for name, reasons in (('unique', unique),
+                          ('{0} templates'.format(templates), templated)):
+        for label, run in (
+                ('re.sub', lambda: [legacy_strip_reason(reason)
+                                    for reason in reasons]),
+                ('ReasonSanitizer', lambda: internals.ReasonSanitizer()
+                 .batch(reasons))):
+            elapsed = min(timeit.repeat(run, number=1, repeat=3))
+            print('{0:<14} {1:<14} {2:8.3f} s {3:12.0f} reasons/s'.format(
+                name, label, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,73 @@
+"""
+Peak memory of ``model.response`` versus ``model.stream_transactions``
+on a synthetic ``transactions`` response.
+
+    $ python -m benchmarks.bench_stream [transactions]
+
+Every mode runs in a fresh interpreter, peak RSS is reported.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from benchmarks import fixtures
+
+
+def full(path):
+    from sofort import model
+    with open(path, 'rb') as f:
+        return len(model.response(f.read()))
+
+
+def stream(path):
+    from sofort import model
+    count = 0
+    with open(path, 'rb') as f:
+        for _ in model.stream_transactions(f):
+            count += 1
+    return count
+
+
+def baseline(path):
+    import sofort.model
+    return 0
+
+
+MODES = {'baseline': baseline, 'full': full, 'stream': stream}
+
+
+def child(mode, path):
+    start = timeit.default_timer()
+    count = MODES[mode](path)
+    elapsed = timeit.default_timer() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('{0} {1} {2}'.format(count, elapsed, peak))
+
+
+def main(count=10000):
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        fixtures.write_transactions_xml(path, count)
+        print('{0} transactions, {1:.1f} MB of XML'.format(
+            count, os.path.getsize(path) / 1024.0 / 1024.0))
+        for mode in ('baseline', 'full', 'stream'):
+            output = subprocess.check_output(
+                [sys.executable, '-m', 'benchmarks.bench_stream',
+                 '--child', mode, path])
+            parsed, elapsed, peak = output.decode('ascii').split()
+            print('{0:<10} {1:>6} parsed {2:8.2f} s  peak RSS {3:8.1f} MB'
+                  .format(mode, parsed, float(elapsed), int(peak) / 1024.0))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:4])
+    else:
+        main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,61 @@
+"""
+Per-call latency of ``requests.post`` versus the pooled keep-alive
+transport of ``sofort.Client``, both against a local
+:class:`sofort.testing.FakeServer`.
+
+    $ python -m benchmarks.bench_transport [calls]
+"""
+import sys
+import timeit
+
+import requests
+
+import sofort
+from sofort.testing import FakeServer
+
+from benchmarks.fixtures import CannedApi
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(func, calls):
+    timer = timeit.default_timer
+    samples = []
+    for _ in range(calls):
+        start = timer()
+        func()
+        samples.append(timer() - start)
+    return samples
+
+
+def report(name, samples):
+    print('{0:<20} p50 {1:8.3f} ms   p99 {2:8.3f} ms'.format(
+        name, percentile(samples, 50) * 1000, percentile(samples, 99) * 1000))
+
+
+def main(calls=2000):
+    server = FakeServer(CannedApi())
+    server.start()
+    url = server.url
+    client = sofort.Client('user', 'key', '123', base_url=url,
+                           abort_url='http://abort', success_url='http://ok',
+                           reasons=['Benchmark'])
+    try:
+        report('requests.post', measure(
+            lambda: requests.post(url, auth=('user', 'key'), data=b'<x />'),
+            calls))
+        report('pooled transport', measure(
+            lambda: client.transport.post(url, ('user', 'key'), b'<x />'),
+            calls))
+        report('client.payment', measure(lambda: client.payment(1), calls))
+    finally:
+        client.close()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
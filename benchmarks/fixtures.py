@@ -0,0 +1,168 @@
+"""Synthetic Sofort responses of arbitrary size"""
+import datetime
+
+from sofort.testing import FakeSofortApi
+
+TRANSACTION_DETAILS = u"""    <transaction_details>
+        <project_id>123456</project_id>
+        <transaction>{transaction}</transaction>
+        <test>1</test>
+        <time>{time}</time>
+        <status>{status}</status>
+        <status_reason>{status_reason}</status_reason>
+        <status_modified>{time}</status_modified>
+        <payment_method>su</payment_method>
+        <language_code>de</language_code>
+        <amount>{amount}</amount>
+        <amount_refunded>0.00</amount_refunded>
+        <currency_code>EUR</currency_code>
+        <reasons>
+            <reason>Invoice {index}</reason>
+            <reason>{transaction}</reason>
+        </reasons>
+        <user_variables>
+            <user_variable>order-{index}</user_variable>
+        </user_variables>
+        <sender>
+            <holder>Max Mustermann</holder>
+            <account_number>23456789</account_number>
+            <bank_code>88888888</bank_code>
+            <bank_name>Demo Bank</bank_name>
+            <bic>SFRTDE20XXX</bic>
+            <iban>DE06000000000023456789</iban>
+            <country_code>DE</country_code>
+        </sender>
+        <recipient>
+            <holder>My Company GmbH</holder>
+            <account_number>0000000000</account_number>
+            <bank_code>00000000</bank_code>
+            <bank_name>Raiffeisenbank Oberteuringen</bank_name>
+            <bic>AAAAAAAAAAA</bic>
+            <iban>DE00000000000000000001</iban>
+            <country_code>DE</country_code>
+        </recipient>
+        <email_customer>customer@example.net</email_customer>
+        <phone_customer />
+        <exchange_rate>1.0000</exchange_rate>
+        <costs>
+            <fees>0.25</fees>
+            <currency_code>EUR</currency_code>
+            <exchange_rate>1.0000</exchange_rate>
+        </costs>
+        <su>
+            <consumer_protection>1</consumer_protection>
+        </su>
+        <status_history_items>
+            <status_history_item>
+                <status>{status}</status>
+                <status_reason>{status_reason}</status_reason>
+                <time>{time}</time>
+            </status_history_item>
+        </status_history_items>
+    </transaction_details>
+"""
+
+STATUSES = [
+    ('untraceable', 'sofort_bank_account_needed'),
+    ('pending', 'not_credited_yet'),
+    ('received', 'credited'),
+    ('loss', 'not_credited'),
+    ('refunded', 'refunded'),
+]
+
+START = datetime.datetime(2016, 1, 1, 12, 0, 0)
+
+
+def transaction_id(index):
+    return u'123456-123456-{0:08X}-{1:04X}'.format(index, index % 0xFFFF)
+
+
+def transaction_details(index):
+    status, status_reason = STATUSES[index % len(STATUSES)]
+    time = START + datetime.timedelta(minutes=index)
+    return TRANSACTION_DETAILS.format(
+        index=index,
+        transaction=transaction_id(index),
+        time=time.isoformat() + '+01:00',
+        status=status,
+        status_reason=status_reason,
+        amount='{0}.{1:02d}'.format(index % 500 + 1, index % 100),
+    )
+
+
+def iter_transactions_xml(count, start=0):
+    yield u'<?xml version="1.0" encoding="UTF-8" ?>\n<transactions>\n'
+    for index in range(start, start + count):
+        yield transaction_details(index)
+    yield u'</transactions>\n'
+
+
+def transactions_xml(count, start=0):
+    """``transactions`` response with ``count`` transaction details"""
+    return u''.join(iter_transactions_xml(count, start))
+
+
+def write_transactions_xml(path, count):
+    with open(path, 'wb') as f:
+        for chunk in iter_transactions_xml(count):
+            f.write(chunk.encode('utf-8'))
+
+
+REFUND = u"""    <refund>
+        <transaction>{transaction}</transaction>
+        <amount>{amount}</amount>
+        <comment>Order {index} cancelled</comment>
+        <reason_1>Refund {index}</reason_1>
+        <time>{time}</time>
+        <partial_refund_id>{index:010x}</partial_refund_id>
+        <status>accepted</status>
+    </refund>
+"""
+
+
+def refunds_xml(count):
+    """``refunds`` response with ``count`` accepted refunds"""
+    rows = [REFUND.format(
+        index=index,
+        transaction=transaction_id(index),
+        amount='{0}.{1:02d}'.format(index % 500 + 1, index % 100),
+        time=(START + datetime.timedelta(minutes=index)).isoformat() + '+01:00',
+    ) for index in range(count)]
+    return (u'<?xml version="1.0" encoding="UTF-8" ?>\n<refunds version="3">\n'
+            u'    <title>Refunds</title>\n' + u''.join(rows) + u'</refunds>\n')
+
+
+def errors_xml(count):
+    """``errors`` response with ``count`` errors"""
+    rows = [u'    <error><code>{0}</code><message>Error {0}.</message>'
+            u'<field>field_{0}</field></error>\n'.format(8000 + index)
+            for index in range(count)]
+    return (u'<?xml version="1.0" encoding="UTF-8" ?>\n<errors>\n' +
+            u''.join(rows) + u'</errors>\n')
+
+
+def new_transaction_xml(warnings=0):
+    """``new_transaction`` response with ``warnings`` warnings"""
+    rows = [u'        <warning><code>{0}</code><message>Warning {0}.'
+            u'</message></warning>\n'.format(8000 + index)
+            for index in range(warnings)]
+    if rows:
+        rows = [u'    <warnings>\n'] + rows + [u'    </warnings>\n']
+    return (u'<?xml version="1.0" encoding="UTF-8" ?>\n<new_transaction>\n'
+            u'    <transaction>123456-123456-56A3BE0E-ACAB</transaction>\n'
+            u'    <payment_url>https://www.sofort.com/payment/go/'
+            u'136b2012718da0160fac20c2ec2f51100c90406e</payment_url>\n' +
+            u''.join(rows) + u'</new_transaction>\n')
+
+
+class CannedApi(FakeSofortApi):
+    """
+    Answers every request with ``body``, served by
+    :class:`sofort.testing.FakeServer` it measures the client side only
+    """
+    def __init__(self, body=None):
+        FakeSofortApi.__init__(self)
+        self.body = body or new_transaction_xml().encode('utf-8')
+
+    def handle(self, data, auth=None):
+        return 200, self.body
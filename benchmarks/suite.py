@@ -0,0 +1,336 @@
+"""
+Benchmark suite covering every hot path of the package, from request
+building and response decoding to full client round trips against a
+local fake server, on fixture sizes from 1 to 10k::
+
+    $ python -m benchmarks.suite
+    $ python -m benchmarks.suite --stage xml. --sizes 1,100
+    $ python -m benchmarks.suite --output baseline.json
+    $ python -m benchmarks.suite --baseline baseline.json --threshold 0.1
+
+Every stage and size is measured in ``--repeat`` samples. Each sample
+runs the stage enough times to take at least ``--min-time`` seconds.
+Median, spread and minimum per call are reported and can be saved as
+JSON.
+
+With ``--baseline``, a stage is flagged as a regression when its median
+is slower than the baseline by more than ``--threshold``. The difference
+must also exceed the interquartile range of both runs. The exit status
+is 1 when there are regressions.
+"""
+import argparse
+import datetime
+import json
+import math
+import platform
+import re
+import sys
+import timeit
+import warnings
+
+import sofort
+from sofort import columns, compact, fastmodel, model, xml
+from sofort._version import __version__
+from sofort.exceptions import RequestErrors
+from sofort.internals import Config, strip_reason
+from sofort.testing import FakeServer
+
+from benchmarks import fixtures
+
+SIZES = (1, 10, 100, 1000, 10000)
+
+#: ``(name, sizes, setup)``, ``setup(size)`` returns function to time or
+#: ``(function, cleanup)``; ``sizes`` limits the sizes a stage runs with
+STAGES = []
+
+
+def stage(name, sizes=None):
+    def register(setup):
+        STAGES.append((name, sizes, setup))
+        return setup
+    return register
+
+
+def defaults(size):
+    return dict(
+        base_url='https://api.sofort.com/api/xml',
+        user_id='123456', api_key='secret', project_id='654321',
+        currency_code='EUR', country_code='DE',
+        success_url='https://shop.example.com/ok?trn=' + sofort.TRANSACTION_ID,
+        abort_url='https://shop.example.com/abort?trn=' + sofort.TRANSACTION_ID,
+        notification_urls={'default': 'https://shop.example.com/notify'},
+        reasons=['Default reason'],
+        extra_defaults=['value {0}'.format(i) for i in range(size)],
+    )
+
+
+@stage('config.clone')
+def config_clone(size):
+    """``size`` default values"""
+    return Config(**defaults(size)).clone
+
+
+@stage('internals.strip_reason')
+def internals_strip_reason(size):
+    """``size`` reasons"""
+    reasons = [u'Rechnung {0} f\xfcr M\xfcller & S\xf6hne GmbH!'.format(i)
+               for i in range(size)]
+    return lambda: [strip_reason(reason) for reason in reasons]
+
+
+@stage('xml.multipay')
+def xml_multipay(size):
+    """``size`` user variables"""
+    config = Config(**defaults(1)).update({
+        'amount': 12.5,
+        'user_variables': ['order-{0}'.format(i) for i in range(size)],
+    })
+    return lambda: xml.multipay(config)
+
+
+@stage('xml.transaction_request_by_params')
+def xml_transaction_request(size):
+    """``size`` transaction IDs"""
+    transaction_ids = [fixtures.transaction_id(i) for i in range(size)]
+    return lambda: xml.transaction_request_by_params(
+        {'transaction': transaction_ids})
+
+
+@stage('xml.refunds_by_params')
+def xml_refunds(size):
+    """``size`` refunds"""
+    sender = {'holder': 'Max Samplemerchant', 'iban': 'DE71700111109999999999',
+              'bic': 'DEKTDE7GXXX'}
+    refunds = [{'transaction': fixtures.transaction_id(i), 'amount': '1.00',
+                'comment': 'Order {0} cancelled'.format(i)}
+               for i in range(size)]
+    return lambda: xml.refunds_by_params({'sender': sender,
+                                          'refunds': refunds})
+
+
+def decoding(decode, root, size):
+    document = {
+        'transactions': fixtures.transactions_xml,
+        'new_transaction': fixtures.new_transaction_xml,
+        'refunds': fixtures.refunds_xml,
+        'errors': fixtures.errors_xml,
+    }[root](size).encode('utf-8')
+
+    def run():
+        try:
+            decode(document)
+        except RequestErrors:
+            pass
+    return run
+
+
+for _root in ('transactions', 'new_transaction', 'refunds', 'errors'):
+    for _name, _decode in (('model.response', model.response),
+                           ('model.lazy_response', model.lazy_response),
+                           ('fastmodel.response', fastmodel.response),
+                           ('compact.response', compact.response)):
+        stage('{0}[{1}]'.format(_name, _root))(
+            lambda size, decode=_decode, root=_root:
+            decoding(decode, root, size))
+
+
+@stage('model.lazy_response[transactions]+status')
+def lazy_status_sweep(size):
+    """decode ``size`` transactions and read ``transaction`` and ``status``"""
+    document = fixtures.transactions_xml(size).encode('utf-8')
+    return lambda: [(details.transaction, details.status)
+                    for details in model.lazy_response(document)]
+
+
+stage('columns.response[transactions]')(
+    lambda size: decoding(columns.response, 'transactions', size))
+
+
+@stage('columns.response[transactions]+sum_by')
+def columns_sum_by(size):
+    """decode ``size`` transactions and sum amounts by status"""
+    document = fixtures.transactions_xml(size).encode('utf-8')
+    return lambda: columns.response(document).sum_by('status')
+
+
+def round_trip(body, call):
+    server = FakeServer(fixtures.CannedApi(body.encode('utf-8')))
+    server.start()
+    params = defaults(1)
+    client = sofort.Client(params.pop('user_id'), params.pop('api_key'),
+                           params.pop('project_id'),
+                           **dict(params, base_url=server.url))
+
+    def cleanup():
+        client.close()
+        server.stop()
+    return lambda: call(client), cleanup
+
+
+@stage('client.payment', sizes=(1,))
+def client_payment(size):
+    return round_trip(fixtures.new_transaction_xml(),
+                      lambda client: client.payment(12.5))
+
+
+@stage('client.details')
+def client_details(size):
+    """``size`` transactions in response"""
+    transaction_ids = [fixtures.transaction_id(i) for i in range(size)]
+    return round_trip(fixtures.transactions_xml(size),
+                      lambda client: client.details(transaction_ids))
+
+
+def calibrate(func, min_time):
+    """Number of calls taking at least ``min_time`` seconds"""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2,
+                     int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+
+def statistics(samples):
+    samples = sorted(samples)
+    count = len(samples)
+    mean = sum(samples) / count
+    variance = sum((sample - mean) ** 2 for sample in samples) / \
+        max(count - 1, 1)
+    return {
+        'median': quantile(samples, 0.5),
+        'min': samples[0],
+        'max': samples[-1],
+        'mean': mean,
+        'stdev': math.sqrt(variance),
+        'iqr': quantile(samples, 0.75) - quantile(samples, 0.25),
+    }
+
+
+def quantile(ordered, q):
+    position = (len(ordered) - 1) * q
+    low = int(math.floor(position))
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def measure(func, repeat, min_time):
+    number = calibrate(func, min_time)
+    samples = [elapsed / number for elapsed in
+               timeit.repeat(func, repeat=repeat, number=number)]
+    result = statistics(samples)
+    result.update(number=number, repeat=repeat)
+    return result
+
+
+def compare(result, baseline, threshold):
+    """``regression``, ``improvement`` or ``None``"""
+    difference = result['median'] - baseline['median']
+    noise = max(result['iqr'], baseline['iqr'])
+    if abs(difference) <= noise or \
+            abs(difference) <= threshold * baseline['median']:
+        return None
+    return 'regression' if difference > 0 else 'improvement'
+
+
+def key(name, size):
+    return '{0}@{1}'.format(name, size)
+
+
+def run(stages, sizes, repeat, min_time, baseline=None, threshold=0.1,
+        out=sys.stdout):
+    results = {}
+    regressions = []
+    out.write('{0:<42} {1:>6} {2:>14} {3:>12} {4:>14}  {5}\n'.format(
+        'stage', 'size', 'median us', 'iqr us', 'min us', 'baseline'))
+    for name, stage_sizes, setup in stages:
+        for size in sizes:
+            if stage_sizes is not None and size not in stage_sizes:
+                continue
+            func = setup(size)
+            cleanup = None
+            if isinstance(func, tuple):
+                func, cleanup = func
+            try:
+                result = measure(func, repeat, min_time)
+            finally:
+                if cleanup is not None:
+                    cleanup()
+            results[key(name, size)] = result
+
+            note = ''
+            base = (baseline or {}).get(key(name, size))
+            if base is not None:
+                verdict = compare(result, base, threshold)
+                note = '{0:+.1%}'.format(result['median'] / base['median'] - 1)
+                if verdict is not None:
+                    note += ' ' + verdict.upper()
+                if verdict == 'regression':
+                    regressions.append(key(name, size))
+            out.write('{0:<42} {1:>6} {2:14.2f} {3:12.2f} {4:14.2f}  {5}\n'
+                      .format(name, size, result['median'] * 1e6,
+                              result['iqr'] * 1e6, result['min'] * 1e6,
+                              note))
+            out.flush()
+    return results, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--stage', default='',
+                        help='regular expression selecting stages')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='comma separated fixture sizes')
+    parser.add_argument('--repeat', type=int, default=7,
+                        help='samples per stage and size')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='minimal duration of one sample, seconds')
+    parser.add_argument('--output', help='write JSON results to file')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as regression')
+    parser.add_argument('--list', action='store_true',
+                        help='list stages and exit')
+    args = parser.parse_args(argv)
+
+    stages = [item for item in STAGES if re.search(args.stage, item[0])]
+    if args.list:
+        for name, _, _ in stages:
+            print(name)
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    warnings.simplefilter('ignore')
+    results, regressions = run(
+        stages, [int(size) for size in args.sizes.split(',')],
+        args.repeat, args.min_time, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'sofort': __version__,
+                    'python': platform.python_version(),
+                    'implementation': platform.python_implementation(),
+                    'platform': platform.platform(),
+                    'time': datetime.datetime.utcnow().isoformat() + 'Z',
+                    'repeat': args.repeat,
+                    'min_time': args.min_time,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if regressions:
+        print('\n{0} regression(s): {1}'.format(len(regressions),
+                                                ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
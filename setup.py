@@ -103,6 +103,8 @@ setup(
     extras_require={
     #     'dev': ['check-manifest'],
         'test': ['mock', 'coverage'],
+        'aio': ['aiohttp'],
+        'columns': ['numpy', 'pandas', 'pyarrow'],
     },
 
     # If there are data files included in your packages that need to be
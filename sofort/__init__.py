@@ -1,3 +1,22 @@
+import sys
+
 from sofort.client import Client
 from sofort.client import TRANSACTION_ID
 from sofort.exceptions import UnauthorizedError
+from sofort.internals import LazyModule
+
+# submodules imported by ``sofort.client`` before their imports became
+# lazy, kept as attributes of the package without loading them
+LAZY_SUBMODULES = ('model', 'transport', 'xml')
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in LAZY_SUBMODULES:
+            import importlib
+            return importlib.import_module('sofort.' + name)
+        raise AttributeError(
+            "module 'sofort' has no attribute {0!r}".format(name))
+else:
+    model = LazyModule('sofort.model')
+    transport = LazyModule('sofort.transport')
+    xml = LazyModule('sofort.xml')
@@ -0,0 +1,284 @@
+"""
+asyncio flavour of :class:`sofort.Client`, requires Python 3.6+ and
+aiohttp (``pip install sofort[aio]``).
+"""
+import asyncio
+import datetime
+
+import aiohttp
+from lxml import etree
+
+from sofort.client import (IDEMPOTENT_REQUESTS, MAX_PAGE_SIZE,
+                           TRANSACTION_HISTORY_LIMIT, Client, DetailsChunk)
+from sofort.resilience import RetryPolicy, retry_after
+from sofort.internals import chunks, time_windows
+from sofort.notifications import MAX_BODY_SIZE
+from sofort.observers import notify, timer
+
+
+class AiohttpTransport(object):
+    """
+    Non-blocking keep-alive transport. At most ``concurrency`` requests
+    are in flight at once, the rest of the callers wait for a free slot.
+    """
+    errors = (aiohttp.ClientError, asyncio.TimeoutError)
+
+    def __init__(self, concurrency=100, pool_maxsize=10, keep_alive=True,
+                 idle_timeout=None):
+        self.concurrency = concurrency
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self._session = None
+        self._semaphore = None
+
+    async def post(self, url, auth, data, timeout=None):
+        """Send request, returns ``(status, headers, text)``"""
+        session = self._acquire()
+        options = {}
+        if timeout is not None:
+            options['timeout'] = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                                       sock_read=timeout[1])
+        async with self._semaphore:
+            async with session.post(url, auth=aiohttp.BasicAuth(*auth),
+                                    data=data, **options) as r:
+                return r.status, r.headers, await r.text()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _acquire(self):
+        if self._session is None:
+            options = {}
+            if self.keep_alive and self.idle_timeout is not None:
+                options['keepalive_timeout'] = self.idle_timeout
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                limit_per_host=self.pool_maxsize,
+                force_close=not self.keep_alive,
+                **options
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+
+class AsyncClient(Client):
+    """
+    Same as :class:`sofort.Client` but every API call is a coroutine::
+
+        >>> async with sofort.aio.AsyncClient('123456', '123456', '123456',
+        ...                                   concurrency=50) as client:
+        ...     details = await client.details('123456-321321-56A29EC6-066A')
+
+    :param int concurrency:
+        Maximum number of requests in flight, shared by all coroutines
+        using this client
+
+    Responses are not streamed, ``details`` and ``find_transactions``
+    take no ``stream`` argument. Close the client with ``async with`` or
+    ``await client.close()``, plain ``with`` raises ``TypeError``.
+    """
+    def __init__(self, user_id, api_key, project_id, concurrency=100,
+                 **kwargs):
+        self.concurrency = concurrency
+        Client.__init__(self, user_id, api_key, project_id, **kwargs)
+
+    def __enter__(self):
+        raise TypeError('Use "async with" with AsyncClient')
+
+    def __exit__(self, *exc_info):
+        raise TypeError('Use "async with" with AsyncClient')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._transport is not None:
+            await self._transport.close()
+
+    async def payment(self, amount, **kwargs):
+        return await self._request(*self._payment_request(amount, **kwargs))
+
+    async def refunds(self, sender, refunds):
+        return await self._request(self._refunds_request(sender, refunds))
+
+    async def details(self, transaction_ids):
+        if self.details_cache is None:
+            return await self._request(self._details_request(transaction_ids))
+
+        found, missing = self._cache_lookup(transaction_ids)
+        if missing:
+            self._cache_store(found, await self._request(
+                self._details_request(missing)))
+        return self._cache_result(transaction_ids, found)
+
+    async def details_bulk(self, transaction_ids, chunk_size=100):
+        """
+        Async generator yielding :class:`sofort.client.DetailsChunk` as
+        chunks complete, requests are bounded by client ``concurrency``
+        """
+        pending = [self._details_chunk(chunk)
+                   for chunk in chunks(transaction_ids, chunk_size)]
+        for result in asyncio.as_completed(pending):
+            yield await result
+
+    async def _details_chunk(self, transaction_ids):
+        try:
+            return DetailsChunk(transaction_ids,
+                                await self.details(transaction_ids) or [],
+                                None)
+        except Exception as e:
+            return DetailsChunk(transaction_ids, None, e)
+
+    async def find_transactions(self, from_time=None, to_time=None,
+                                number=10, **extra_params):
+        return await self._request(self._find_transactions_request(
+            from_time, to_time, number, **extra_params))
+
+    async def iter_transactions(self, from_time, to_time=None, page_size=100,
+                                time_field='time', **extra_params):
+        """
+        Async generator over every transaction in given time range, same
+        as :meth:`sofort.Client.iter_transactions` but pages are not
+        prefetched
+        """
+        seen = set()
+        async for page in self._transaction_pages(
+                from_time, to_time, page_size, time_field=time_field,
+                **extra_params):
+            for transaction in page:
+                if transaction.transaction in seen:
+                    continue
+                seen.add(transaction.transaction)
+                yield transaction
+
+    async def _transaction_pages(self, from_time, to_time=None,
+                                 page_size=100, time_field='time',
+                                 decoder=None, **extra_params):
+        if to_time is None:
+            to_time = datetime.datetime.now(from_time.tzinfo)
+        # a shorter page than requested marks the end
+        page_size = min(page_size, MAX_PAGE_SIZE)
+
+        for window_from, window_to in time_windows(
+                from_time, to_time, TRANSACTION_HISTORY_LIMIT):
+            page_number = 1
+            while True:
+                page = await self._request(self._find_transactions_request(
+                    window_from, window_to, page_size, page=page_number,
+                    time_field=time_field, **extra_params),
+                    decoder=decoder) or []
+                yield page
+                if len(page) < page_size:
+                    break
+                page_number += 1
+
+    def _create_transport(self):
+        return AiohttpTransport(
+            concurrency=self.concurrency,
+            pool_maxsize=self.config.pool_maxsize,
+            keep_alive=self.config.keep_alive,
+            idle_timeout=self.config.pool_idle_timeout
+        )
+
+    async def _request(self, data, config=None, decoder=None):
+        if config is None:
+            config = self.config.clone()
+        decoder = decoder or self.decoder
+
+        if not self.observers:
+            response = await self._request_xml(config, data)
+            return decoder(response.encode('utf-8'))
+
+        event = self._start_event(data)
+        try:
+            response = await self._request_xml(config, data, event)
+            result = decoder(response.encode('utf-8'))
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        self._finish_event(event)
+        return result
+
+    async def _request_xml(self, config, data, event=None):
+        retry = self.retry if data.startswith(IDEMPOTENT_REQUESTS) else None
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+            if event is not None:
+                event.attempts = attempt + 1
+                event.sent = timer()
+            try:
+                status, headers, text = await self.transport.post(
+                    config.base_url, auth=(config.user_id, config.api_key),
+                    data=data,
+                    timeout=(config.connect_timeout, config.read_timeout))
+            except self.transport.errors:
+                self._record_outcome(False)
+                if retry is None or not retry.should_retry(attempt):
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+                attempt += 1
+                continue
+            except Exception:
+                # must not leave a trial call running
+                self._record_outcome(False)
+                raise
+
+            self._record_outcome(status not in RetryPolicy.STATUSES)
+            if retry is None or status not in retry.statuses \
+                    or not retry.should_retry(attempt):
+                break
+            await asyncio.sleep(retry.delay(attempt, retry_after(headers)))
+            attempt += 1
+
+        if event is not None:
+            # aiohttp hands over the whole body at once
+            event.status = status
+            event.first_byte = event.received = timer()
+            event.response_size = len(text.encode('utf-8'))
+            notify(self.observers, 'request_sent', event)
+            notify(self.observers, 'first_byte', event)
+            notify(self.observers, 'response_received', event)
+
+        self._check_status(config, status)
+        return text
+
+
+def notification_app(receiver):
+    """
+    ASGI application feeding notification requests to
+    :class:`sofort.notifications.NotificationReceiver`
+    """
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        status, body = 200, b'OK'
+        if scope['method'] != 'POST':
+            status, body = 405, b''
+        else:
+            request_body = b''
+            more_body = True
+            while more_body and len(request_body) <= MAX_BODY_SIZE:
+                message = await receive()
+                request_body += message.get('body', b'')
+                more_body = message.get('more_body', False)
+            if len(request_body) > MAX_BODY_SIZE:
+                status, body = 413, b'Notification too large'
+            else:
+                try:
+                    receiver.receive(request_body)
+                except (ValueError, etree.XMLSyntaxError):
+                    status, body = 400, b'Invalid notification'
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': body})
+    return app
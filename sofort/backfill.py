@@ -0,0 +1,149 @@
+"""
+Download of long transaction histories. Pages are fetched in a
+background thread while a pool of processes decodes them, so neither the
+network nor a single CPU core holds the other back::
+
+    >>> backfill = Backfill(client, processes=4)
+    >>> for details in backfill.run(datetime.datetime(2015, 1, 1)):
+    ...     store.save(details)
+
+Transactions come in page order. At most ``max_pending`` pages are
+fetched ahead of the consumer, which keeps memory bounded.
+"""
+import multiprocessing
+import threading
+
+try:
+    from queue import Empty, Full, Queue
+except ImportError:
+    from Queue import Empty, Full, Queue
+
+from sofort import model
+
+_DONE = object()
+
+
+class RawPage(object):
+    """Undecoded response body, ``len()`` is number of transactions"""
+    __slots__ = ('body', 'count')
+
+    def __init__(self, body):
+        self.body = body
+        self.count = body.count(b'<transaction_details>')
+
+    def __len__(self):
+        return self.count
+
+
+def raw_page(body):
+    """Decoder keeping response body for decoding elsewhere"""
+    page = RawPage(body)
+    if not page.count:
+        # empty list or errors, decoding is cheap and raises errors here
+        model.response(body)
+    return page
+
+
+class _Failure(object):
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Backfill(object):
+    """
+    :param client:
+        :class:`sofort.Client`
+    :param int processes:
+        Number of decoding processes, number of CPUs by default
+    :param int max_pending:
+        Maximum number of pages fetched ahead of the consumer, twice
+        ``processes`` by default
+    :param decoder:
+        Function decoding response body, must be picklable (defined at
+        module level), ``sofort.model.response`` by default
+    """
+    def __init__(self, client, processes=None, max_pending=None,
+                 decoder=model.response):
+        self.client = client
+        self.processes = processes or multiprocessing.cpu_count()
+        self.max_pending = max_pending or 2 * self.processes
+        self.decoder = decoder
+
+    def run(self, from_time, to_time=None, page_size=100, time_field='time',
+            **extra_params):
+        """
+        Iterate over every transaction in given time range, like
+        ``client.iter_transactions``. Transactions are yielded once even
+        if they appear on several pages.
+        """
+        seen = set()
+        for page in self.pages(from_time, to_time, page_size, time_field,
+                               **extra_params):
+            for transaction in page:
+                if transaction.transaction in seen:
+                    continue
+                seen.add(transaction.transaction)
+                yield transaction
+
+    def pages(self, from_time, to_time=None, page_size=100, time_field='time',
+              **extra_params):
+        """Iterate over decoded non-empty pages in order"""
+        pool = multiprocessing.Pool(self.processes)
+        pending = Queue(self.max_pending)
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self._fetch, args=(
+            pool, pending, stop, from_time, to_time, page_size, time_field,
+            extra_params))
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item.get()
+        finally:
+            stop.set()
+            _drain(pending)
+            fetcher.join()
+            pool.terminate()
+            pool.join()
+
+    def _fetch(self, pool, pending, stop, from_time, to_time, page_size,
+               time_field, extra_params):
+        try:
+            for page in self.client._transaction_pages(
+                    from_time, to_time, page_size, time_field=time_field,
+                    decoder=raw_page, **extra_params):
+                if not page:
+                    continue
+                result = pool.apply_async(self.decoder, (page.body,))
+                if not _put(pending, result, stop):
+                    return
+        except Exception as e:
+            _put(pending, _Failure(e), stop)
+        else:
+            _put(pending, _DONE, stop)
+
+
+def _put(queue, item, stop):
+    """Blocking put giving up when ``stop`` is set"""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _drain(queue):
+    while True:
+        try:
+            queue.get_nowait()
+        except Empty:
+            return
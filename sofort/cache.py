@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class DetailsCache(object):
+    """
+    Bounded LRU cache of transaction details keyed by transaction ID.
+    Entries expire depending on transaction status, so final states
+    are kept long while ``pending``/``untraceable`` ones are refreshed
+    soon::
+
+        >>> cache = DetailsCache(maxsize=10000)
+        >>> client = sofort.Client(user_id, api_key, project_id,
+        ...                        details_cache=cache)
+        >>> client.details(transaction_id)  # API request
+        >>> client.details(transaction_id)  # served from cache
+        >>> cache.invalidate(transaction_id)  # e.g. on notification
+
+    Cache hits return the same details instance to every caller, treat
+    them as read-only (or decode with :mod:`sofort.compact`, whose
+    records are immutable).
+
+    :param int maxsize:
+        Maximum number of cached transactions
+    :param float ttl:
+        Seconds to keep transactions with status not listed in
+        ``status_ttl``
+    :param dict status_ttl:
+        Seconds to keep transactions by status
+    """
+    STATUS_TTL = {
+        'pending': 30,
+        'untraceable': 30,
+    }
+
+    def __init__(self, maxsize=1024, ttl=3600, status_ttl=None,
+                 clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.status_ttl = dict(self.STATUS_TTL, **(status_ttl or {}))
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, transaction_id):
+        with self._lock:
+            entry = self._data.pop(transaction_id, None)
+            if entry is None or entry[0] <= self._clock():
+                self.misses += 1
+                return None
+            self._data[transaction_id] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, details):
+        expires = self._clock() + self.status_ttl.get(details.status,
+                                                      self.ttl)
+        with self._lock:
+            self._data.pop(details.transaction, None)
+            self._data[details.transaction] = (expires, details)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, transaction_id=None):
+        """Drop one transaction, or everything if no ID is given"""
+        with self._lock:
+            if transaction_id is None:
+                self._data.clear()
+            else:
+                self._data.pop(transaction_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._data), 'maxsize': self.maxsize}
@@ -1,19 +1,57 @@
 import datetime
-import requests
+import functools
+import threading
+import time
+from collections import namedtuple
 
-import sofort.xml
-
-from sofort.exceptions import UnauthorizedError
-from sofort.internals import Config, as_list
-from sofort import model
+from sofort.exceptions import (RateLimitedError, ResponseStatusError,
+                               ServerError, UnauthorizedError)
+from sofort.internals import (Config, LazyModule, as_list, chunks, prefetch,
+                              strip_reasons, time_windows)
+from sofort.observers import RequestEvent, notify, request_kind, timer
+from sofort.resilience import RetryPolicy, retry_after
 
 from sofort._version import __version__
 
+# lxml, xmltodict, schematics and requests are loaded on first use
+model = LazyModule('sofort.model')
+transport = LazyModule('sofort.transport')
+xml = LazyModule('sofort.xml')
+
 API_URL = 'https://api.sofort.com/api/xml'
 TRANSACTION_ID = '-TRANSACTION-'
 
 TRANSACTION_HISTORY_LIMIT = datetime.timedelta(days=29)
 
+# the API returns no more transactions per page
+MAX_PAGE_SIZE = 100
+
+# only read requests can be safely sent again
+IDEMPOTENT_REQUESTS = (b'<transaction_request',)
+
+
+class DetailsChunk(namedtuple('DetailsChunk',
+                              ['transaction_ids', 'transactions', 'error'])):
+    """
+    Result of one ``transaction_request`` sent by ``Client.details_bulk``.
+    Either ``transactions`` is a list of details or ``error`` holds the
+    exception raised for the chunk.
+    """
+    __slots__ = ()
+
+
+def _builder(method):
+    """Measure how long building a request document takes, for observers"""
+    @functools.wraps(method)
+    def build(self, *args, **kwargs):
+        if not self.observers:
+            return method(self, *args, **kwargs)
+        started = timer()
+        result = method(self, *args, **kwargs)
+        self._build_times.value = (started, timer())
+        return result
+    return build
+
 
 class Client(object):
     """
@@ -27,8 +65,43 @@ class Client(object):
         API key
     :param str project_id:
         Project ID
+
+    Connections to the API are kept alive and pooled, the pool can be
+    tuned with ``pool_connections``, ``pool_maxsize`` (connections per
+    host), ``keep_alive`` and ``pool_idle_timeout`` (seconds). Call
+    ``close()`` or use it as a context manager to release the
+    connections::
+
+        >>> with sofort.Client('123456', '123456', '123456') as client:
+        ...     client.details('123456-123456-56A29EC6-066A')
+
+    Requests time out after ``connect_timeout`` and ``read_timeout``
+    seconds. ``retry`` (:class:`sofort.resilience.RetryPolicy`) sets how
+    ``details`` and ``find_transactions`` are retried on 429/5xx and
+    connection errors, pass ``retry=None`` to disable. ``payment`` and
+    ``refunds`` are never retried. ``circuit_breaker``
+    (:class:`sofort.resilience.CircuitBreaker`) makes calls fail fast
+    while the API keeps failing. ``coalescer``
+    (:class:`sofort.coalesce.DetailsCoalescer`) lets concurrent
+    ``details`` calls share requests. ``observers`` is a list of
+    :class:`sofort.observers.Observer` notified about every stage of
+    each call.
+
+    A client is thread-safe, one instance can serve every thread of a
+    process. Defaults are frozen when the client is created, every call
+    works on its own copy. ``client.config`` is read-only, its lists and
+    dicts are tuples and read-only dicts; change the defaults with
+    ``configure()``.
     """
     def __init__(self, user_id, api_key, project_id, **kwargs):
+        self.details_cache = kwargs.pop('details_cache', None)
+        self.coalescer = kwargs.pop('coalescer', None)
+        self._decoder = kwargs.pop('decoder', None)
+        self.retry = kwargs.pop('retry', RetryPolicy())
+        self.circuit_breaker = kwargs.pop('circuit_breaker', None)
+        self._transport = kwargs.pop('transport', None)
+        self._transport_lock = threading.Lock()
+        self.observers = tuple(kwargs.pop('observers', None) or ())
         self.config = Config(
             base_url=API_URL,
             user_id=user_id,
@@ -38,7 +111,65 @@ class Client(object):
             currency_code='EUR',
             country_code='DE',
             success_link_redirect=True,
-        ).update(kwargs)
+            pool_connections=10,
+            pool_maxsize=10,
+            keep_alive=True,
+            pool_idle_timeout=None,
+            connect_timeout=10,
+            read_timeout=30,
+        ).update(kwargs).freeze()
+
+        self._multipay_template = None
+        self._build_times = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def configure(self, **params):
+        """
+        Change default parameters. Calls already running keep the old
+        ones, so this is safe while other threads use the client.
+        """
+        self.config = self.config.clone().update(params).freeze()
+
+    def close(self):
+        """Close pooled connections"""
+        if self._transport is not None:
+            self._transport.close()
+
+    @property
+    def transport(self):
+        """Transport sending requests, created on first use"""
+        if self._transport is None:
+            with self._transport_lock:
+                if self._transport is None:
+                    self._transport = self._create_transport()
+        return self._transport
+
+    @transport.setter
+    def transport(self, value):
+        self._transport = value
+
+    @property
+    def decoder(self):
+        """Function decoding responses, :func:`sofort.model.response` by
+        default"""
+        return self._decoder or model.response
+
+    @decoder.setter
+    def decoder(self, value):
+        self._decoder = value
+
+    def _create_transport(self):
+        return transport.HttpTransport(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            keep_alive=self.config.keep_alive,
+            idle_timeout=self.config.pool_idle_timeout
+        )
 
     def payment(self, amount, **kwargs):
         """Get payment URL and new transaction ID
@@ -55,6 +186,128 @@ class Client(object):
             >>> t.payment_url
             https://www.sofort.com/payment/go/136b2012718da216af4c20c2ec2f51100c90406e
         """
+        return self._request(*self._payment_request(amount, **kwargs))
+
+    def refunds(self, sender, refunds):
+        return self._request(self._refunds_request(sender, refunds))
+
+    def details(self, transaction_ids, stream=False):
+        """
+        Get details of one or many transactions. With ``stream=True``
+        a generator is returned which parses the response incrementally
+        and yields transactions one by one.
+        """
+        if stream:
+            return self._request_stream(self._details_request(transaction_ids))
+        if self.details_cache is None:
+            return self._fetch_details(transaction_ids)
+
+        found, missing = self._cache_lookup(transaction_ids)
+        if missing:
+            self._cache_store(found, self._fetch_details(missing))
+        return self._cache_result(transaction_ids, found)
+
+    def _fetch_details(self, transaction_ids):
+        if self.coalescer is not None:
+            return self.coalescer.details(transaction_ids,
+                                          self._request_details)
+        return self._request_details(transaction_ids)
+
+    def _request_details(self, transaction_ids):
+        return self._request(self._details_request(transaction_ids))
+
+    def details_bulk(self, transaction_ids, chunk_size=100, workers=4):
+        """
+        Get details of many transactions. IDs are split into chunks of
+        ``chunk_size`` which are requested concurrently by ``workers``
+        threads. :class:`DetailsChunk` results are yielded as soon as they
+        arrive, a failed chunk does not stop the others::
+
+            >>> for chunk in client.details_bulk(ids, chunk_size=50):
+            ...     if chunk.error:
+            ...         retry_later(chunk.transaction_ids)
+            ...     else:
+            ...         update_statuses(chunk.transactions)
+        """
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(workers)
+        try:
+            for chunk in pool.imap_unordered(
+                    self._details_chunk, chunks(transaction_ids, chunk_size)):
+                yield chunk
+        finally:
+            pool.terminate()
+
+    def _details_chunk(self, transaction_ids):
+        try:
+            return DetailsChunk(transaction_ids,
+                                self.details(transaction_ids) or [], None)
+        except Exception as e:
+            return DetailsChunk(transaction_ids, None, e)
+
+    def find_transactions(self, from_time=None, to_time=None, number=10,
+                          stream=False, **extra_params):
+        request_body = self._find_transactions_request(
+            from_time, to_time, number, **extra_params)
+        if stream:
+            return self._request_stream(request_body)
+        return self._request(request_body)
+
+    def iter_transactions(self, from_time, to_time=None, page_size=100,
+                          prefetch_pages=True, time_field='time',
+                          **extra_params):
+        """
+        Lazily iterate over every transaction in given time range. The
+        range is split into windows of ``TRANSACTION_HISTORY_LIMIT``
+        length, and each window is requested page by page. Transactions
+        are yielded once even if they appear on several pages.
+
+        :param int page_size:
+            Number of transactions requested per page, at most
+            ``MAX_PAGE_SIZE``
+        :param bool prefetch_pages:
+            Fetch next page in background while current one is consumed
+        :param str time_field:
+            ``time`` to select transactions by creation time, or
+            ``status_modified_time`` by time of the last status change
+        """
+        pages = self._transaction_pages(from_time, to_time, page_size,
+                                        time_field=time_field,
+                                        **extra_params)
+        if prefetch_pages:
+            pages = prefetch(pages)
+
+        seen = set()
+        for page in pages:
+            for transaction in page:
+                if transaction.transaction in seen:
+                    continue
+                seen.add(transaction.transaction)
+                yield transaction
+
+    def _transaction_pages(self, from_time, to_time=None, page_size=100,
+                           time_field='time', decoder=None, **extra_params):
+        if to_time is None:
+            to_time = datetime.datetime.now(from_time.tzinfo)
+        # a shorter page than requested marks the end
+        page_size = min(page_size, MAX_PAGE_SIZE)
+
+        for window_from, window_to in time_windows(
+                from_time, to_time, TRANSACTION_HISTORY_LIMIT):
+            page_number = 1
+            while True:
+                page = self._request(self._find_transactions_request(
+                    window_from, window_to, page_size, page=page_number,
+                    time_field=time_field, **extra_params),
+                    decoder=decoder) or []
+                yield page
+                if len(page) < page_size:
+                    break
+                page_number += 1
+
+    @_builder
+    def _payment_request(self, amount, **kwargs):
         params = self.config.clone()\
             .update({ 'amount': amount })\
             .update(kwargs)
@@ -65,28 +318,61 @@ class Client(object):
             if not params.has(field):
                 raise ValueError('Mandatory field "{}" is not specified'.format(field))
 
-        params.reasons = [sofort.internals.strip_reason(reason)
-                                for reason
-                                in params.reasons]
+        params.reasons = strip_reasons(params.reasons)
 
-        return self._request(sofort.xml.multipay(params), params)
+        return self._multipay(params), params
 
-    def refunds(self, sender, refunds):
-        request_body = sofort.xml.refunds_by_params({
+    def _multipay(self, params):
+        template = self._multipay_template
+        if template is None or not params.shares(template.config):
+            template = xml.MultipayTemplate.compile(self.config)
+            self._multipay_template = template
+
+        if template is not None and template.matches(params):
+            return template.render(params)
+        return xml.multipay(params)
+
+    @_builder
+    def _refunds_request(self, sender, refunds):
+        return xml.refunds_by_params({
             'sender': sender,
             'refunds': refunds
         })
-        return self._request(request_body)
 
-    def details(self, transaction_ids):
-        request_body = sofort.xml.transaction_request_by_params({
+    def _cache_lookup(self, transaction_ids):
+        found = {}
+        missing = []
+        for transaction_id in as_list(transaction_ids):
+            details = self.details_cache.get(transaction_id)
+            if details is None:
+                missing.append(transaction_id)
+            else:
+                found[transaction_id] = details
+        return found, missing
+
+    def _cache_store(self, found, transactions):
+        for details in transactions or []:
+            self.details_cache.set(details)
+            found[details.transaction] = details
+
+    def _cache_result(self, transaction_ids, found):
+        # same as the API response: ``None`` when nothing is found
+        return [found[transaction_id]
+                for transaction_id in as_list(transaction_ids)
+                if transaction_id in found] or None
+
+    @_builder
+    def _details_request(self, transaction_ids):
+        return xml.transaction_request_by_params({
             'transaction': as_list(transaction_ids)
         })
-        return self._request(request_body)
 
-    def find_transactions(self, from_time=None, to_time=None, number=10,
-                          **extra_params):
-        today = datetime.datetime.now()
+    @_builder
+    def _find_transactions_request(self, from_time=None, to_time=None,
+                                   number=10, time_field='time',
+                                   **extra_params):
+        today = datetime.datetime.now(
+            getattr(from_time or to_time, 'tzinfo', None))
 
         if to_time is None:
             to_time = today
@@ -98,34 +384,151 @@ class Client(object):
             )
 
         params = {
-            'from_time': from_time,
-            'to_time': to_time,
+            'from_' + time_field: from_time,
+            'to_' + time_field: to_time,
             'number': number
         }
         params.update(extra_params)
-        request_body = sofort.xml.transaction_request_by_params(params)
-        return self._request(request_body)
+        return xml.transaction_request_by_params(params)
 
-    def _request(self, data, config=None):
+    def _request(self, data, config=None, decoder=None):
         if config is None:
             config = self.config.clone()
+        if decoder is None:
+            decoder = self.decoder
+        if self.observers:
+            return self._observed_request(data, config, decoder)
 
         response = self._request_xml(config, data).encode('utf-8')
-        return model.response(response)
+        return decoder(response)
+
+    def _observed_request(self, data, config, decoder):
+        event = self._start_event(data)
+        try:
+            response = self._request_xml(config, data, event=event)
+            result = decoder(response.encode('utf-8'))
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        self._finish_event(event)
+        return result
+
+    def _request_stream(self, data, config=None):
+        if config is None:
+            config = self.config.clone()
+        event = self._start_event(data) if self.observers else None
+
+        try:
+            source = self._request_xml(config, data, stream=True, event=event)
+            try:
+                for transaction in model.stream_transactions(source):
+                    yield transaction
+            finally:
+                if hasattr(source, 'close'):
+                    source.close()
+        except Exception as e:
+            if event is not None:
+                self._fail_event(event, e)
+            raise
+        if event is not None:
+            event.received = timer()
+            notify(self.observers, 'response_received', event)
+            self._finish_event(event)
 
-    def _request_xml(self, config, data):
-        r = requests.post(config.base_url,
-                          auth=(config.user_id, config.api_key),
-                          data=data)
+    def _start_event(self, data):
+        times = getattr(self._build_times, 'value', None) or ()
+        self._build_times.value = None
+        event = RequestEvent(request_kind(data), len(data), *times)
+        notify(self.observers, 'request_built', event)
+        return event
 
-        if r.status_code == 200:
-            return r.text
-        elif r.status_code == 401:
+    def _first_byte(self, event, response):
+        event.first_byte = timer()
+        event.status = response.status_code
+        elapsed = getattr(response, 'elapsed', None)
+        # requests measures from sending the request to response headers
+        event.sent = event.first_byte if elapsed is None else \
+            max(event.built, event.first_byte - elapsed.total_seconds())
+        notify(self.observers, 'request_sent', event)
+        notify(self.observers, 'first_byte', event)
+
+    def _finish_event(self, event):
+        event.parsed = event.finished = timer()
+        notify(self.observers, 'response_parsed', event)
+
+    def _fail_event(self, event, error):
+        event.error = error
+        event.finished = timer()
+        notify(self.observers, 'request_failed', event)
+
+    def _request_xml(self, config, data, stream=False, event=None):
+        retry = self.retry if data.startswith(IDEMPOTENT_REQUESTS) else None
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+            if event is not None:
+                event.attempts = attempt + 1
+            try:
+                r = self.transport.post(
+                    config.base_url,
+                    auth=(config.user_id, config.api_key),
+                    data=data, stream=stream or event is not None,
+                    timeout=(config.connect_timeout, config.read_timeout))
+            except self.transport.errors:
+                self._record_outcome(False)
+                if retry is None or not retry.should_retry(attempt):
+                    raise
+                time.sleep(retry.delay(attempt))
+                attempt += 1
+                continue
+            except Exception:
+                # e.g. truncated body, must not leave a trial call running
+                self._record_outcome(False)
+                raise
+
+            failed = r.status_code in RetryPolicy.STATUSES
+            self._record_outcome(not failed)
+            if retry is None or r.status_code not in retry.statuses \
+                    or not retry.should_retry(attempt):
+                break
+            r.close()
+            time.sleep(retry.delay(attempt, retry_after(r.headers)))
+            attempt += 1
+
+        if event is not None:
+            self._first_byte(event, r)
+            if not stream:
+                event.response_size = len(r.content)
+                event.received = timer()
+                notify(self.observers, 'response_received', event)
+
+        try:
+            self._check_status(config, r.status_code)
+        except Exception:
+            # a streamed response would keep its connection from the pool
+            r.close()
+            raise
+        if stream:
+            r.raw.decode_content = True
+            return r.raw
+        return r.text
+
+    def _record_outcome(self, success):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(success)
+
+    def _check_status(self, config, status_code):
+        if status_code == 200:
+            return
+        elif status_code == 401:
             raise UnauthorizedError()
-        elif r.status_code == 404:
+        elif status_code == 404:
             raise Exception('Sofort resource not found: {}'.format(
                                 config.base_url))
+        elif status_code == 429:
+            raise RateLimitedError(status_code)
+        elif status_code >= 500:
+            raise ServerError(status_code)
         else:
-            raise NotImplementedError(
-                'Unknown response status: {}'.format(r.status_code)
-            )
+            raise ResponseStatusError(status_code)
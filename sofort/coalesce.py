@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+
+from sofort.internals import as_list
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Batch(_Call):
+    def __init__(self):
+        _Call.__init__(self)
+        self.transaction_ids = OrderedDict()
+        self.full = threading.Event()
+
+
+class DetailsCoalescer(object):
+    """
+    Deduplicates concurrent ``details(...)`` calls. Threads asking for the
+    same set of transactions while a request for it is in flight wait
+    for that request and share its result::
+
+        >>> client = sofort.Client(user_id, api_key, project_id,
+        ...                        coalescer=DetailsCoalescer())
+
+    With ``merge_window`` lookups of different transactions arriving
+    within that many seconds are merged into one request of up to
+    ``max_batch`` transactions, and each caller gets its own
+    transactions back.
+
+    :param float merge_window:
+        Seconds to wait for more lookups before the request is sent,
+        ``None`` disables merging
+    :param int max_batch:
+        Maximum number of transactions in a merged request
+    """
+    def __init__(self, merge_window=None, max_batch=100):
+        self.merge_window = merge_window
+        self.max_batch = max_batch
+        self.requests = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._batch = None
+
+    def details(self, transaction_ids, fetch):
+        """
+        :param fetch:
+            Function requesting details of a list of transaction IDs
+        """
+        transaction_ids = as_list(transaction_ids)
+        key = frozenset(transaction_ids)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = self._fetch(transaction_ids, fetch)
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+        # callers get own lists, details objects are shared
+        return None if call.result is None else list(call.result)
+
+    def stats(self):
+        return {'requests': self.requests, 'shared': self.shared}
+
+    def _fetch(self, transaction_ids, fetch):
+        if self.merge_window is None:
+            with self._lock:
+                self.requests += 1
+            return fetch(transaction_ids)
+
+        with self._lock:
+            batch = self._batch
+            leader = batch is None or len(batch.transaction_ids) + \
+                len(transaction_ids) > self.max_batch
+            if leader:
+                if batch is not None:
+                    batch.full.set()
+                batch = self._batch = _Batch()
+            for transaction_id in transaction_ids:
+                batch.transaction_ids[transaction_id] = None
+            if len(batch.transaction_ids) >= self.max_batch:
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.merge_window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+                self.requests += 1
+            try:
+                batch.result = fetch(list(batch.transaction_ids)) or []
+            except Exception as e:
+                batch.error = e
+                raise
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+
+        wanted = set(transaction_ids)
+        found = [details for details in batch.result
+                 if details.transaction in wanted]
+        return found or None
@@ -0,0 +1,329 @@
+"""
+Columnar decoding of ``transactions`` responses. Transactions go straight
+from XML into typed column arrays, without an object per row::
+
+    >>> columns = sofort.columns.fetch(client, from_time, to_time)
+    >>> columns.sum_by('status')
+    {'received': 1204550, 'loss': 2300, ...}
+
+    >>> frame = columns.to_pandas()  # or to_numpy(), to_arrow()
+    >>> frame.groupby(frame.time.dt.date).amount.sum()
+
+Amounts are fixed-point integers in cents (``AMOUNT_SCALE``), times are
+microseconds since epoch in UTC (``datetime64[us]`` when exported),
+statuses and other short texts are categorical codes. NumPy, pandas and
+pyarrow are only needed for the respective export.
+"""
+import calendar
+import datetime
+import re
+from array import array
+
+from lxml import etree
+
+from sofort import model
+
+try:
+    array('q')
+    INT64 = 'q'
+except ValueError:
+    # Python 2 has no 'q', 'l' is 64 bit on LP64 platforms
+    INT64 = 'l'
+
+#: amounts are stored as integer multiples of 1 / AMOUNT_SCALE
+AMOUNT_SCALE = 100
+#: stored for missing times, read as NaT by NumPy and pandas
+NAT = -2 ** 63
+#: code of missing categorical value
+MISSING = -1
+
+TIME_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?'
+                     r'(Z|[+-]\d\d:?\d\d)?$')
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def response(xmlstr):
+    """
+    Decoder for ``Client(decoder=...)``, ``transactions`` become
+    :class:`TransactionColumns`, other roots are decoded by
+    :func:`sofort.model.response`
+    """
+    if isinstance(xmlstr, type(u'')):
+        xmlstr = xmlstr.encode('utf-8')
+    root = etree.fromstring(xmlstr)
+    if root.tag != 'transactions':
+        return model.response(xmlstr)
+    columns = TransactionColumns()
+    columns.append_elements(root.iterchildren('transaction_details'))
+    return columns
+
+
+def fetch(client, from_time, to_time=None, page_size=100, **extra_params):
+    """
+    Every transaction in time range as one :class:`TransactionColumns`,
+    requested page by page like ``client.iter_transactions``
+    """
+    columns = TransactionColumns()
+    seen = set()
+    for page in client._transaction_pages(from_time, to_time, page_size,
+                                          decoder=response, **extra_params):
+        # empty pages come as ``[]``
+        if isinstance(page, TransactionColumns):
+            columns.extend(page, seen)
+    return columns
+
+
+class Categories(object):
+    """Categorical column, ``codes`` index ``categories``"""
+    def __init__(self):
+        self.categories = []
+        self.codes = array('h')
+        self._index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return None if code == MISSING else self.categories[code]
+
+    def code(self, value):
+        if value is None:
+            return MISSING
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+
+class TransactionColumns(object):
+    """Transaction details as columns, one entry per transaction"""
+    INTEGER = ('project_id',)
+    BOOLEAN = ('test',)
+    AMOUNT = ('amount', 'amount_refunded')
+    TIME = ('time', 'status_modified')
+    CATEGORICAL = ('status', 'status_reason', 'payment_method',
+                   'language_code', 'currency_code')
+    TEXT = ('transaction',)
+
+    def __init__(self):
+        self.transaction = []
+        for name in self.INTEGER + self.AMOUNT + self.TIME:
+            setattr(self, name, array(INT64))
+        for name in self.BOOLEAN:
+            setattr(self, name, array('b'))
+        for name in self.CATEGORICAL:
+            setattr(self, name, Categories())
+
+    def __len__(self):
+        return len(self.transaction)
+
+    @classmethod
+    def names(cls):
+        return cls.TEXT + cls.INTEGER + cls.BOOLEAN + cls.TIME + \
+            cls.CATEGORICAL + cls.AMOUNT
+
+    def append_elements(self, elements):
+        """Append ``<transaction_details>`` elements"""
+        names = set(self.names())
+        for element in elements:
+            values = {}
+            for child in element:
+                if child.tag in names:
+                    text = child.text
+                    values[child.tag] = text.strip() or None if text else None
+            self._append(values)
+
+    def _append(self, values):
+        self.transaction.append(values.get('transaction'))
+        for name in self.INTEGER:
+            value = values.get(name)
+            getattr(self, name).append(0 if value is None else int(value))
+        for name in self.BOOLEAN:
+            value = values.get(name)
+            getattr(self, name).append(
+                value is not None and value.lower() in ('1', 'true'))
+        for name in self.AMOUNT:
+            getattr(self, name).append(parse_amount(values.get(name)))
+        for name in self.TIME:
+            getattr(self, name).append(parse_time(values.get(name)))
+        for name in self.CATEGORICAL:
+            getattr(self, name).append(values.get(name))
+
+    def extend(self, other, seen=None):
+        """
+        Append columns of ``other``. Transactions already in ``seen``
+        (set of IDs, updated) are skipped.
+        """
+        rows = range(len(other))
+        if seen is not None:
+            rows = [row for row in rows
+                    if other.transaction[row] not in seen]
+            seen.update(other.transaction[row] for row in rows)
+            if len(rows) == len(other):
+                rows = None
+        else:
+            rows = None
+
+        if rows is None:
+            self.transaction.extend(other.transaction)
+            for name in self.INTEGER + self.BOOLEAN + self.AMOUNT + \
+                    self.TIME:
+                getattr(self, name).extend(getattr(other, name))
+        else:
+            self.transaction.extend(other.transaction[row] for row in rows)
+            for name in self.INTEGER + self.BOOLEAN + self.AMOUNT + \
+                    self.TIME:
+                column = getattr(other, name)
+                getattr(self, name).extend(
+                    array(column.typecode, [column[row] for row in rows]))
+
+        for name in self.CATEGORICAL:
+            column = getattr(self, name)
+            source = getattr(other, name)
+            mapping = [column.code(value) for value in source.categories]
+            column.codes.extend(array('h', [
+                MISSING if code == MISSING else mapping[code]
+                for code in (source.codes if rows is None else
+                             (source.codes[row] for row in rows))]))
+
+    def sum_by(self, key, value='amount'):
+        """
+        Sum of a column (``amount`` in cents by default) by categorical
+        column or by ``day`` of ``time``
+        """
+        values = getattr(self, value)
+        sums = {}
+        if key == 'day':
+            day = 86400 * 10 ** 6
+            for time, item in zip(self.time, values):
+                if time != NAT:
+                    sums[time // day] = sums.get(time // day, 0) + item
+            return dict((EPOCH.date() + datetime.timedelta(days=days), total)
+                        for days, total in sums.items())
+
+        column = getattr(self, key)
+        for code, item in zip(column.codes, values):
+            sums[code] = sums.get(code, 0) + item
+        return dict((None if code == MISSING else column.categories[code],
+                     total) for code, total in sums.items())
+
+    def to_numpy(self):
+        """Dict of NumPy arrays, categorical columns as codes plus
+        ``<name>_categories``"""
+        import numpy
+
+        result = {'transaction': numpy.array(self.transaction, dtype=object)}
+        for name in self.INTEGER + self.AMOUNT:
+            result[name] = _numpy_array(numpy, getattr(self, name), 'int64')
+        for name in self.BOOLEAN:
+            result[name] = _numpy_array(numpy, getattr(self, name), bool)
+        for name in self.TIME:
+            result[name] = _numpy_array(numpy, getattr(self, name),
+                                        'int64').view('datetime64[us]')
+        for name in self.CATEGORICAL:
+            column = getattr(self, name)
+            result[name] = _numpy_array(numpy, column.codes, 'int16')
+            result[name + '_categories'] = numpy.array(column.categories,
+                                                       dtype=object)
+        return result
+
+    def to_pandas(self):
+        """``pandas.DataFrame``, statuses as ``Categorical``, times in UTC"""
+        import pandas
+
+        data = self.to_numpy()
+        frame = {}
+        for name in self.names():
+            if name in self.CATEGORICAL:
+                frame[name] = pandas.Categorical.from_codes(
+                    data[name], data[name + '_categories'])
+            elif name in self.TIME:
+                frame[name] = pandas.Series(data[name]).dt.tz_localize('UTC')
+            else:
+                frame[name] = data[name]
+        return pandas.DataFrame(frame, columns=list(self.names()))
+
+    def to_arrow(self):
+        """``pyarrow.Table``, statuses as dictionary arrays"""
+        import pyarrow
+
+        arrays = []
+        for name in self.names():
+            if name in self.TEXT:
+                arrays.append(pyarrow.array(getattr(self, name),
+                                            pyarrow.string()))
+            elif name in self.BOOLEAN:
+                arrays.append(pyarrow.array(
+                    [bool(value) for value in getattr(self, name)],
+                    pyarrow.bool_()))
+            elif name in self.TIME:
+                arrays.append(_arrow_array(pyarrow, getattr(self, name),
+                                           pyarrow.timestamp('us', 'UTC'),
+                                           NAT))
+            elif name in self.CATEGORICAL:
+                column = getattr(self, name)
+                arrays.append(pyarrow.DictionaryArray.from_arrays(
+                    _arrow_array(pyarrow, column.codes, pyarrow.int16(),
+                                 MISSING),
+                    pyarrow.array(column.categories, pyarrow.string())))
+            else:
+                arrays.append(_arrow_array(pyarrow, getattr(self, name),
+                                           pyarrow.int64(), None))
+        return pyarrow.Table.from_arrays(arrays, names=list(self.names()))
+
+
+def parse_amount(value):
+    """``'12.5'`` -> ``1250``"""
+    if value is None:
+        return 0
+    negative = value.startswith('-')
+    whole, _, fraction = value.lstrip('+-').partition('.')
+    fraction = (fraction + '00')[:2]
+    amount = int(whole or 0) * AMOUNT_SCALE + int(fraction)
+    return -amount if negative else amount
+
+
+def parse_time(value):
+    """ISO 8601 time -> microseconds since epoch, UTC"""
+    if value is None:
+        return NAT
+    match = TIME_RE.match(value)
+    if match is None:
+        raise ValueError('Invalid time: {0}'.format(value))
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour),
+                               int(minute), int(second)))
+    if zone and zone != 'Z':
+        offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+        seconds -= offset if zone[0] == '+' else -offset
+    micro = int((fraction + '000000')[:6]) if fraction else 0
+    return seconds * 10 ** 6 + micro
+
+
+def _numpy_array(numpy, values, dtype):
+    # astype copies, the result does not share memory with growing arrays
+    return numpy.frombuffer(values, dtype='i{0}'.format(values.itemsize)) \
+        .astype(dtype)
+
+
+def _arrow_array(pyarrow, values, arrow_type, missing):
+    if values.itemsize != arrow_type.bit_width // 8:
+        values = array(INT64 if arrow_type.bit_width == 64 else 'h', values)
+    validity = None
+    if missing is not None and missing in values:
+        bits = bytearray((len(values) + 7) // 8)
+        for index, value in enumerate(values):
+            if value != missing:
+                bits[index >> 3] |= 1 << (index & 7)
+        validity = pyarrow.py_buffer(bytes(bits))
+    return pyarrow.Array.from_buffers(
+        arrow_type, len(values),
+        [validity, pyarrow.py_buffer(values.tobytes()
+                                     if hasattr(values, 'tobytes')
+                                     else values.tostring())])
@@ -0,0 +1,195 @@
+"""
+Compact immutable records for keeping many transactions in memory::
+
+    >>> client = sofort.Client(user_id, api_key, project_id,
+    ...                        decoder=sofort.compact.response)
+
+Records are named tuples with the fields of :mod:`sofort.fastmodel`
+records (which mirror :mod:`sofort.model`), lists become tuples. Values
+repeated across transactions are shared: short codes such as ``status``,
+``currency_code`` or ``bank_code`` are interned process wide, while
+equal nested records (e.g. the recipient account), times and amounts are
+shared within one response. Use ``_replace`` to get a changed copy.
+
+Responses other than ``transactions`` are decoded by
+:func:`sofort.fastmodel.response`.
+"""
+from collections import namedtuple
+
+from lxml import etree
+
+from sofort import fastmodel
+
+
+class Interner(object):
+    """
+    Maps equal values to one shared instance. Stops taking new values
+    at ``maxsize``, values seen later are returned as they are.
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._values = {}
+
+    def __call__(self, value):
+        shared = self._values.get(value)
+        if shared is None:
+            if value is None or len(self._values) >= self.maxsize:
+                return value
+            shared = self._values[value] = value
+        return shared
+
+    def __len__(self):
+        return len(self._values)
+
+
+#: process wide table of interned codes
+codes = Interner()
+
+
+def response(xmlstr):
+    if isinstance(xmlstr, type(u'')):
+        xmlstr = xmlstr.encode('utf-8')
+    root = etree.fromstring(xmlstr)
+    if root.tag != 'transactions':
+        return fastmodel.response(xmlstr)
+    if len(root) == 0:
+        return None
+    memo = {}
+    return [TransactionDetails.from_element(child, memo)
+            for child in root.iterchildren('transaction_details')]
+
+
+def _plain(convert):
+    return lambda element, memo: convert(element)
+
+
+text = _plain(fastmodel.text)
+
+
+def code(element, memo):
+    return codes(fastmodel.text(element))
+
+
+def _shared(convert):
+    def convert_shared(element, memo):
+        value = fastmodel.text(element)
+        if value is None:
+            return None
+        key = (convert, value)
+        result = memo.get(key)
+        if result is None:
+            result = memo[key] = convert(element)
+        return result
+    return convert_shared
+
+
+#: fastmodel converters replaced by ones sharing equal values
+SHARED = {
+    fastmodel.integer: _shared(fastmodel.integer),
+    fastmodel.decimal: _shared(fastmodel.decimal),
+    fastmodel.datetime: _shared(fastmodel.datetime),
+}
+
+#: fastmodel converters returning immutable values, taken over as they are
+SCALARS = (fastmodel.text, fastmodel.boolean)
+
+
+def record(record_type):
+    def convert(element, memo):
+        value = record_type.from_element(element, memo)
+        return memo.setdefault((record_type, value), value)
+    return convert
+
+
+def items(convert):
+    def convert_items(element, memo):
+        if len(element) == 0:
+            return None
+        return tuple(convert(child, memo) for child in element)
+    return convert_items
+
+
+class CompactRecord(object):
+    """Base of records, ``fields`` maps tag names to converters"""
+    __slots__ = ()
+    fields = ()
+
+    @classmethod
+    def from_element(cls, element, memo=None):
+        if memo is None:
+            memo = {}
+        children = {}
+        for child in element:
+            children.setdefault(child.tag, child)
+        values = []
+        for name, convert in cls.fields:
+            child = children.get(name)
+            values.append(None if child is None else convert(child, memo))
+        return tuple.__new__(cls, values)
+
+
+def _record_type(base, overrides):
+    """
+    Record with the fields of :mod:`sofort.fastmodel` record type
+    ``base``. Converters in ``overrides`` (e.g. interned codes, nested
+    records) replace those of ``base``, which must be given for fields
+    that are not plain values.
+    """
+    names = [name for name, _ in base.fields]
+    unknown = set(overrides) - set(names)
+    if unknown:
+        raise ValueError('{0} has no fields {1}'.format(
+            base.__name__, ', '.join(sorted(unknown))))
+
+    fields = []
+    for name, convert in base.fields:
+        if name in overrides:
+            convert = overrides[name]
+        elif convert in SHARED:
+            convert = SHARED[convert]
+        elif convert in SCALARS:
+            convert = _plain(convert)
+        else:
+            raise TypeError('{0}.{1} needs a compact converter'.format(
+                base.__name__, name))
+        fields.append((name, convert))
+
+    namedtuple_type = namedtuple(base.__name__, names)
+    return type(base.__name__, (namedtuple_type, CompactRecord), {
+        '__slots__': (),
+        'fields': tuple(fields),
+    })
+
+
+BankAccount = _record_type(fastmodel.BankAccount, {
+    'bank_code': code,
+    'bank_name': code,
+    'bic': code,
+    'country_code': code,
+})
+
+Costs = _record_type(fastmodel.Costs, {
+    'currency_code': code,
+})
+
+Su = _record_type(fastmodel.Su, {})
+
+StatusHistoryItem = _record_type(fastmodel.StatusHistoryItem, {
+    'status': code,
+    'status_reason': code,
+})
+
+TransactionDetails = _record_type(fastmodel.TransactionDetails, {
+    'status': code,
+    'status_reason': code,
+    'payment_method': code,
+    'language_code': code,
+    'currency_code': code,
+    'reasons': items(text),
+    'user_variables': items(text),
+    'sender': record(BankAccount),
+    'recipient': record(BankAccount),
+    'costs': record(Costs),
+    'su': record(Su),
+    'status_history_items': items(record(StatusHistoryItem)),
+})
@@ -2,6 +2,24 @@ class UnauthorizedError(Exception):
     pass
 
 
+class ResponseStatusError(Exception):
+    """Response with HTTP status the client does not handle"""
+    def __init__(self, status_code):
+        super(ResponseStatusError, self).__init__(status_code)
+        self.status_code = status_code
+
+    def __str__(self):
+        return 'Unexpected response status: {0}'.format(self.status_code)
+
+
+class ServerError(ResponseStatusError):
+    """Sofort API failed with 5xx status"""
+
+
+class RateLimitedError(ResponseStatusError):
+    """Too many requests (429)"""
+
+
 class RequestErrors(Exception):
     def __init__(self, errors):
         super(RequestErrors, self).__init__('Request errors')
@@ -41,3 +59,9 @@ class SofortWarning(Warning):
 
     def __str__(self):
         return repr(self)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self):
+        super(CircuitOpenError, self).__init__(
+            'Sofort API calls are suspended after repeated failures')
@@ -0,0 +1,219 @@
+"""
+Lightweight response decoder. Goes straight from lxml tree to slotted
+records which have the same fields as models in :mod:`sofort.model`,
+skipping xmltodict and schematics::
+
+    >>> client = sofort.Client(user_id, api_key, project_id,
+    ...                        decoder=sofort.fastmodel.response)
+"""
+from decimal import Decimal
+from warnings import warn
+
+import iso8601
+from lxml import etree
+
+from sofort.exceptions import RequestError, RequestErrors, SofortWarning
+
+
+def response(xmlstr):
+    if isinstance(xmlstr, type(u'')):
+        xmlstr = xmlstr.encode('utf-8')
+    root = etree.fromstring(xmlstr)
+    if len(root) == 0 and not (root.text and root.text.strip()):
+        return None
+    return factories[root.tag](root)
+
+
+def text(element):
+    value = element.text and element.text.strip()
+    return value or None
+
+
+def integer(element):
+    value = text(element)
+    return None if value is None else int(value)
+
+
+def decimal(element):
+    value = text(element)
+    return None if value is None else Decimal(value)
+
+
+def boolean(element):
+    value = text(element)
+    return None if value is None else value.lower() in ('1', 'true')
+
+
+def datetime(element):
+    value = text(element)
+    return None if value is None else iso8601.parse_date(value)
+
+
+def record(record_type):
+    return record_type.from_element
+
+
+def items(convert):
+    def convert_items(element):
+        if len(element) == 0:
+            return None
+        return [convert(child) for child in element]
+    return convert_items
+
+
+class Record(object):
+    """Base of decoded records, ``fields`` maps tag names to converters"""
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, **values):
+        for name, _ in self.fields:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_element(cls, element):
+        result = cls.__new__(cls)
+        children = {}
+        for child in element:
+            children.setdefault(child.tag, child)
+        for name, convert in cls.fields:
+            child = children.get(name)
+            setattr(result, name, None if child is None else convert(child))
+        return result
+
+    def __repr__(self):
+        return '<{0}: {1}>'.format(type(self).__name__, ', '.join(
+            '{0}={1!r}'.format(name, getattr(self, name))
+            for name, _ in self.fields))
+
+
+def _record_type(name, fields):
+    return type(name, (Record,), {
+        '__slots__': tuple(field for field, _ in fields),
+        'fields': tuple(fields),
+    })
+
+
+Error = _record_type('Error', [
+    ('code', integer),
+    ('message', text),
+    ('field', text),
+])
+
+BankAccount = _record_type('BankAccount', [
+    ('holder', text),
+    ('account_number', text),
+    ('bank_code', text),
+    ('bank_name', text),
+    ('bic', text),
+    ('iban', text),
+    ('country_code', text),
+])
+
+Costs = _record_type('Costs', [
+    ('fees', decimal),
+    ('currency_code', text),
+    ('exchange_rate', decimal),
+])
+
+Su = _record_type('Su', [
+    ('consumer_protection', boolean),
+])
+
+StatusHistoryItem = _record_type('StatusHistoryItem', [
+    ('status', text),
+    ('status_reason', text),
+    ('time', datetime),
+])
+
+TransactionDetails = _record_type('TransactionDetails', [
+    ('project_id', integer),
+    ('transaction', text),
+    ('test', boolean),
+    ('time', datetime),
+    ('status', text),
+    ('status_reason', text),
+    ('status_modified', datetime),
+    ('payment_method', text),
+    ('language_code', text),
+    ('amount', decimal),
+    ('amount_refunded', decimal),
+    ('currency_code', text),
+    ('reasons', items(text)),
+    ('user_variables', items(text)),
+    ('sender', record(BankAccount)),
+    ('recipient', record(BankAccount)),
+    ('email_customer', text),
+    ('phone_customer', text),
+    ('exchange_rate', decimal),
+    ('costs', record(Costs)),
+    ('su', record(Su)),
+    ('status_history_items', items(record(StatusHistoryItem))),
+])
+
+Refund = _record_type('Refund', [
+    ('recipient', record(BankAccount)),
+    ('transaction', text),
+    ('amount', decimal),
+    ('comment', text),
+    ('reason_1', text),
+    ('reason_2', text),
+    ('time', datetime),
+    ('partial_refund_id', text),
+    ('status', text),
+    ('errors', items(record(Error))),
+])
+
+Refunds = _record_type('Refunds', [
+    ('sender', record(BankAccount)),
+    ('title', text),
+    ('pain', text),
+    ('refund', record(Refund)),
+    ('refunds', None),
+])
+
+
+def refunds(element):
+    result = Refunds.from_element(element)
+    result.refunds = [Refund.from_element(child)
+                      for child in element.iterchildren('refund')]
+    return result
+
+
+def warning(element):
+    result = Error.from_element(element)
+    warn(SofortWarning(result.code, result.message, result.field))
+    return result
+
+
+NewTransaction = _record_type('NewTransaction', [
+    ('transaction', text),
+    ('payment_url', text),
+    ('warnings', items(warning)),
+])
+
+
+def transaction_list(element):
+    return [TransactionDetails.from_element(child)
+            for child in element.iterchildren('transaction_details')]
+
+
+def error_handler(element):
+    errors = [_request_error(child) for child in element.iterchildren('error')]
+    for su in element.iterchildren('su'):
+        for child in su.iterfind('errors/error'):
+            errors.append(_request_error(child))
+    raise RequestErrors(errors)
+
+
+def _request_error(element):
+    error = Error.from_element(element)
+    return RequestError(error.code, error.message, error.field)
+
+
+factories = {
+    'errors': error_handler,
+    'transactions': transaction_list,
+    'new_transaction': NewTransaction.from_element,
+    'refunds': refunds,
+}
@@ -1,36 +1,338 @@
 # -*- coding: utf-8 -*-
 
-import re
 import copy
+import importlib
+import threading
+import unicodedata
+
+try:
+    unichr
+except NameError:
+    unichr = chr
 
 
 class Config(object):
+    """
+    Settings with cheap copy-on-write cloning. Values are kept in two
+    layers: a frozen one shared by all clones, and an own one holding
+    values set on this instance. ``clone()`` freezes own values once and
+    returns an empty overlay on top of the shared layer, so cloning an
+    unchanged config costs the same no matter how large it is. Mutable
+    values (lists, dicts, sets) are copied from the shared layer when
+    first accessed, so changing them never leaks to other clones.
+
+    ``freeze()`` makes a config read-only: setting values raises
+    ``AttributeError``, and mutable values are handed out as tuples,
+    :class:`FrozenDict` and frozensets, so changing them fails instead
+    of getting lost. Nothing about a frozen config changes, so it can be
+    read and cloned from many threads at once.
+    """
+    __slots__ = ('_base', '_own', '_frozen', '_views')
+
+    MUTABLE_TYPES = (list, dict, set)
+
+    _freeze_lock = threading.Lock()
+
     def __init__(self, **params):
+        object.__setattr__(self, '_base', {})
+        object.__setattr__(self, '_own', {})
+        object.__setattr__(self, '_frozen', False)
+        object.__setattr__(self, '_views', None)
         self.update(params)
 
+    def __getattr__(self, name):
+        if name in Config.__slots__ or name.startswith('__'):
+            raise AttributeError(name)
+        own = self._own
+        if name in own:
+            return own[name]
+        views = self._views
+        if views is not None and name in views:
+            return views[name]
+        try:
+            value = self._base[name]
+        except KeyError:
+            raise AttributeError(name)
+        if isinstance(value, self.MUTABLE_TYPES):
+            value = own[name] = copy.deepcopy(value)
+        return value
+
+    def __setattr__(self, name, value):
+        self.update({name: value})
+
+    def __getstate__(self):
+        return {'base': self._base, 'own': self._own, 'frozen': self._frozen}
+
+    def __setstate__(self, state):
+        object.__setattr__(self, '_base', state['base'])
+        object.__setattr__(self, '_own', dict(state['own']))
+        object.__setattr__(self, '_frozen', False)
+        object.__setattr__(self, '_views', None)
+        if state['frozen']:
+            self.freeze()
+
     def has(self, key):
-        return key in self.__dict__.keys()
+        return key in self._own or key in self._base
 
     def update(self, dict_):
-        self.__dict__.update(dict_)
+        if self._frozen:
+            raise AttributeError('Config is frozen, change a clone() of it')
+        self._own.update(dict_)
         return self
 
     def clone(self):
-        return Config(**copy.deepcopy(self.__dict__))
+        """
+        Copy of this config. Own values move to the shared layer first,
+        so mutable values read from this config before are detached from
+        it: read them again after ``clone()`` to change them here.
+        """
+        if self._own:
+            self._share()
+        result = Config()
+        object.__setattr__(result, '_base', self._base)
+        return result
+
+    def freeze(self):
+        """Move own values into a new shared layer, make config read-only"""
+        self._share()
+        object.__setattr__(self, '_views', dict(
+            (name, _immutable(value)) for name, value in self._base.items()
+            if isinstance(value, self.MUTABLE_TYPES)))
+        object.__setattr__(self, '_frozen', True)
+        return self
+
+    def _share(self):
+        with self._freeze_lock:
+            if self._own:
+                base = dict(self._base)
+                base.update(copy.deepcopy(self._own))
+                object.__setattr__(self, '_base', base)
+                object.__setattr__(self, '_own', {})
+
+    def overridden(self):
+        """Names of values set or copied on top of the shared layer"""
+        return set(self._own)
+
+    def shares(self, other):
+        """Whether both configs are clones of the same frozen values"""
+        return self._base is other._base
+
+
+class FrozenDict(dict):
+    """Read-only dict, mappings of frozen configs are handed out as it"""
+    __slots__ = ()
+
+    def _refuse(self, *args, **kwargs):
+        raise TypeError('Config is frozen, change a clone() of it')
+
+    __setitem__ = __delitem__ = __ior__ = _refuse
+    clear = pop = popitem = setdefault = update = _refuse
+
+    def __reduce__(self):
+        # copies are plain dicts
+        return dict, (dict(self),)
+
+
+def _immutable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_immutable(item) for item in value)
+    if isinstance(value, dict):
+        return FrozenDict((key, _immutable(item))
+                          for key, item in value.items())
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+#: longest reason Sofort accepts
+REASON_MAX_LENGTH = 27
+
+REASON_CHARACTERS = frozenset(u'abcdefghijklmnopqrstuvwxyz'
+                              u'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 +,-.')
+
+TRANSLITERATIONS = {
+    u'\xe4': u'ae', u'\xf6': u'oe', u'\xfc': u'ue',
+    u'\xc4': u'Ae', u'\xd6': u'Oe', u'\xdc': u'Ue',
+    u'\xdf': u'ss', u'\u1e9e': u'SS',
+    u'\xe6': u'ae', u'\xc6': u'AE', u'\u0153': u'oe', u'\u0152': u'OE',
+    u'\xf8': u'o', u'\xd8': u'O', u'\u0142': u'l', u'\u0141': u'L',
+    u'\u0111': u'd', u'\u0110': u'D', u'\xfe': u'th', u'\xde': u'Th',
+    u'&': u'+', u'\u20ac': u'EUR',
+}
+
+# placeholder substituted by Sofort, never cut by the length limit
+_TRANSACTION_PLACEHOLDER = u'-TRANSACTION-'
+
+
+class _ReasonTable(dict):
+    """
+    ``unicode.translate`` table into the characters allowed in reasons,
+    computing the replacement of a character on its first lookup
+    """
+    def __missing__(self, code):
+        char = unichr(code)
+        if char in REASON_CHARACTERS:
+            replacement = char
+        elif char in TRANSLITERATIONS:
+            replacement = TRANSLITERATIONS[char]
+        elif char.isspace():
+            replacement = u' '
+        else:
+            # accents and ligatures: e with acute -> e, fi ligature -> fi
+            replacement = u''.join(part for part in
+                                   unicodedata.normalize('NFKD', char)
+                                   if part in REASON_CHARACTERS)
+        self[code] = replacement or None
+        return self[code]
 
 
-def strip_reason(reason):
+class ReasonSanitizer(object):
+    """
+    Converts reasons to the characters Sofort allows, one
+    ``translate`` pass per reason. Results are remembered, so reasons
+    repeated across payments are converted once; the memo is emptied
+    when it reaches ``cache_size`` entries.
+    """
+    table = _ReasonTable()
+
+    def __init__(self, max_length=REASON_MAX_LENGTH, cache_size=4096):
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def __call__(self, reason):
+        result = self._cache.get(reason)
+        if result is None:
+            result = self._strip(reason)
+        return result
+
+    def batch(self, reasons):
+        """Sanitize list of reasons"""
+        get = self._cache.get
+        strip = self._strip
+        result = []
+        for reason in reasons:
+            stripped = get(reason)
+            result.append(strip(reason) if stripped is None else stripped)
+        return result
+
+    def _strip(self, reason):
+        key = reason
+        if isinstance(reason, bytes):
+            reason = reason.decode('utf-8')
+        result = reason.translate(self.table)
+        if self.max_length is not None and len(result) > self.max_length:
+            result = self._truncate(result)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def _truncate(self, reason):
+        end = self.max_length
+        placeholder = reason.find(_TRANSACTION_PLACEHOLDER, 0,
+                                  end + len(_TRANSACTION_PLACEHOLDER) - 1)
+        if placeholder != -1 and \
+                placeholder + len(_TRANSACTION_PLACEHOLDER) > end:
+            end = placeholder
+        return reason[:end].rstrip()
+
+
+_sanitizers = {REASON_MAX_LENGTH: ReasonSanitizer()}
+
+
+def _sanitizer(max_length):
+    sanitizer = _sanitizers.get(max_length)
+    if sanitizer is None:
+        sanitizer = _sanitizers[max_length] = ReasonSanitizer(max_length)
+    return sanitizer
+
+
+def strip_reason(reason, max_length=REASON_MAX_LENGTH):
     """
     only the following characters are allowed:
     '0-9', 'a-z', 'A-Z', ' ', '+', ',', '-', '.'.
-    Umlauts are replaced, e.g. ä -> ae.
+    Umlauts are replaced, e.g. ä -> ae, accents dropped, other
+    characters removed, and the reason is cut to ``max_length``.
 
     @see: https://www.sofort.com/integrationCenter-eng-DE/content/view/full/2513#h5-1
     """
-    return re.sub('(?u)[^\w\ \+\-\.\,]', '', reason)
+    return _sanitizer(max_length)(reason)
+
+
+def strip_reasons(reasons, max_length=REASON_MAX_LENGTH):
+    """:func:`strip_reason` of every reason in list"""
+    return _sanitizer(max_length).batch(reasons)
+
+
+class LazyModule(object):
+    """Stands in for a module which is imported on first attribute access"""
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self.__dict__['_module'] = \
+                importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(importlib.import_module(self._name), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(importlib.import_module(self._name), attr)
+
+    def __repr__(self):
+        return '<LazyModule {0!r}>'.format(self._name)
 
 
 def as_list(value):
     if not isinstance(value, list):
         value = [value]
     return value
+
+
+def chunks(iterable, size):
+    """Split ``iterable`` into lists of ``size`` items"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def time_windows(from_time, to_time, limit):
+    """Split ``[from_time, to_time]`` range into windows of ``limit`` length"""
+    while from_time < to_time:
+        end = min(from_time + limit, to_time)
+        yield from_time, end
+        from_time = end
+
+
+_DONE = object()
+
+
+def prefetch(iterable):
+    """
+    Iterate over ``iterable`` while computing its next item in background
+    thread, so producer and consumer of items work at the same time.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    iterator = iter(iterable)
+    pool = ThreadPool(1)
+    try:
+        pending = pool.apply_async(next, (iterator, _DONE))
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                return
+            pending = pool.apply_async(next, (iterator, _DONE))
+            yield item
+    finally:
+        pool.terminate()
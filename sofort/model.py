@@ -1,7 +1,10 @@
 import xmltodict
+from collections import OrderedDict
+from io import BytesIO
 from warnings import warn
 
 import iso8601
+from lxml import etree
 
 from schematics.models import Model
 from schematics.types import (URLType, StringType, IntType, BooleanType,
@@ -21,6 +24,81 @@ def response(xmlstr):
         return factory(value, strict=False)
 
 
+def lazy_response(xmlstr):
+    """
+    Same as :func:`response`, but transaction details are returned as
+    :class:`LazyModel` views which decode fields on first access::
+
+        >>> client = sofort.Client(user_id, api_key, project_id,
+        ...                        decoder=sofort.model.lazy_response)
+    """
+    if isinstance(xmlstr, type(u'')):
+        xmlstr = xmlstr.encode('utf-8')
+    root = etree.fromstring(xmlstr)
+    if root.tag != 'transactions':
+        return response(xmlstr)
+    transactions = [LazyModel(TransactionDetailsModel, element)
+                    for element in root.iterchildren('transaction_details')]
+    return transactions or None
+
+
+def stream_transactions(source, strict=False):
+    """
+    Incrementally parse ``transactions`` response and yield
+    ``TransactionDetailsModel`` as soon as each ``<transaction_details>``
+    element is closed. Parsed elements are dropped right away, so memory
+    usage does not grow with the number of transactions.
+
+    :param source:
+        XML string or file-like object
+    """
+    if isinstance(source, type(u'')):
+        source = source.encode('utf-8')
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    context = etree.iterparse(source, events=('start', 'end'))
+    event, root = next(context)
+
+    if root.tag == 'transactions':
+        for event, element in context:
+            if event != 'end' or element.getparent() is not root:
+                continue
+            if element.tag == 'transaction_details':
+                yield TransactionDetailsModel(element_to_dict(element),
+                                              strict=strict)
+            element.clear()
+            while element.getprevious() is not None:
+                del root[0]
+        return
+
+    for _ in context:
+        pass
+    value = element_to_dict(root)
+    if root.tag != 'errors':
+        raise ValueError('Unexpected response: {}'.format(root.tag))
+    if value is not None:
+        error_handler(value)
+
+
+def element_to_dict(element):
+    """lxml element to the same structure ``xmltodict.parse`` returns"""
+    if len(element) == 0:
+        text = element.text and element.text.strip()
+        return text or None
+
+    result = OrderedDict()
+    for child in element:
+        value = element_to_dict(child)
+        if child.tag not in result:
+            result[child.tag] = value
+        elif isinstance(result[child.tag], list):
+            result[child.tag].append(value)
+        else:
+            result[child.tag] = [result[child.tag], value]
+    return result
+
+
 class ForcedListType(ListType):
     def to_native(self, value):
         return [self.field.to_native(item) for item in as_list(value)]
@@ -40,6 +118,66 @@ class Iso8601DateTimeType(DateTimeType):
         return iso8601.parse_date(value)
 
 
+class LazyModel(object):
+    """
+    Read-only view of ``model_class`` over a parsed XML element. Fields
+    are converted by the model field types when first read and cached,
+    so reading ``transaction`` and ``status`` of many transactions does
+    not pay for dates, decimals and nested models.
+    """
+    __slots__ = ('model_class', '_element', '_values')
+
+    def __init__(self, model_class, element):
+        object.__setattr__(self, 'model_class', model_class)
+        object.__setattr__(self, '_element', element)
+        object.__setattr__(self, '_values', {})
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        field = self.model_class._fields.get(name)
+        if field is None:
+            raise AttributeError(name)
+
+        if isinstance(field, ListType) and \
+                not isinstance(field, SofortListType):
+            value = [_lazy_value(field.field, child)
+                     for child in self._element.iterchildren(name)] or None
+        else:
+            child = self._element.find(name)
+            value = None if child is None else _lazy_value(field, child)
+        self._values[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        if name not in self.model_class._fields:
+            raise AttributeError(name)
+        self._values[name] = value
+
+    def __repr__(self):
+        return '<Lazy{0}: {1}>'.format(
+            self.model_class.__name__,
+            self._element.findtext('transaction', '').strip())
+
+    def to_model(self, strict=False):
+        """Fully converted ``model_class`` instance"""
+        return self.model_class(element_to_dict(self._element),
+                                strict=strict)
+
+
+def _lazy_value(field, element):
+    if len(element) == 0 and not (element.text and element.text.strip()):
+        return None
+    if isinstance(field, ModelType):
+        return LazyModel(field.model_class, element)
+    if isinstance(field, SofortListType):
+        return [_lazy_value(field.field, child)
+                for child in element.iterchildren(field.field_name)]
+    return field.to_native(element_to_dict(element))
+
+
 class ErrorModel(Model):
     code = IntType()
     message = StringType()
@@ -136,6 +274,7 @@ class RefundsModel(Model):
     title = StringType()
     pain = StringType()
     refund = ModelType(RefundModel)
+    refunds = ForcedListType(ModelType(RefundModel))
 
 
 def transaction_list(transactions, strict=False):
@@ -144,6 +283,15 @@ def transaction_list(transactions, strict=False):
                 in as_list(transactions['transaction_details'])]
 
 
+def refunds_response(data, strict=False):
+    # ``refund`` keeps the first result, ``refunds`` has all of them
+    data = dict(data)
+    refunds = as_list(data.get('refund') or [])
+    data['refund'] = refunds[0] if refunds else None
+    data['refunds'] = refunds
+    return RefundsModel(data, strict=strict)
+
+
 def error_handler(data, strict=False):
     root = RootErrorsModel(data, strict=strict)
     errors = [RequestError(**error_item) for error_item in root.error]
@@ -158,5 +306,5 @@ factories = {
     'errors': error_handler,
     'transactions': transaction_list,
     'new_transaction': NewTransactionModel,
-    'refunds': RefundsModel,
+    'refunds': refunds_response,
 }
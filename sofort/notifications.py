@@ -0,0 +1,181 @@
+"""
+Receiver of Sofort status notifications. Notifications for the same
+transaction arriving within ``window`` seconds are coalesced, and all
+transactions of a window are resolved with one ``details(...)`` request::
+
+    >>> receiver = NotificationReceiver(client, window=2)
+    >>> receiver.subscribe(lambda details: db.update_status(details))
+    >>> receiver.start()
+
+    >>> # mount as WSGI application, or feed request bodies directly
+    >>> receiver.receive(request.body)
+"""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import iso8601
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+#: Largest notification request body accepted, in bytes
+MAX_BODY_SIZE = 16 * 1024
+
+
+class Notification(namedtuple('Notification', ['transaction', 'time'])):
+    __slots__ = ()
+
+
+def parse_notification(body):
+    """
+    Parse notification request body::
+
+        <status_notification>
+            <transaction>123456-123456-56A29EC6-066A</transaction>
+            <time>2016-01-22T22:28:14+01:00</time>
+        </status_notification>
+
+    Bodies come from anyone who can reach the endpoint: entities are not
+    resolved, documents with DOCTYPE or above ``MAX_BODY_SIZE`` bytes
+    are rejected.
+    """
+    if len(body) > MAX_BODY_SIZE:
+        raise ValueError('Notification too large')
+    # parsers are not shared between threads
+    parser = etree.XMLParser(resolve_entities=False, no_network=True,
+                             load_dtd=False)
+    root = etree.fromstring(body, parser)
+    if root.getroottree().docinfo.doctype:
+        raise ValueError('Notification with DOCTYPE')
+    transaction = root.findtext('transaction')
+    if root.tag != 'status_notification' or not transaction:
+        raise ValueError('Not a status notification')
+    time = root.findtext('time')
+    return Notification(transaction.strip(),
+                        iso8601.parse_date(time.strip()) if time else None)
+
+
+class NotificationReceiver(object):
+    """
+    :param client:
+        :class:`sofort.Client` used to resolve transaction details
+    :param float window:
+        Seconds to collect notifications before they are resolved
+    :param int max_batch:
+        Maximum number of transactions per ``details(...)`` request
+    :param on_error:
+        Called with transaction IDs and exception when details request
+        fails. Without it failed transactions are queued again for the
+        next window and the exception is raised from ``flush()``
+    """
+    def __init__(self, client, window=1.0, max_batch=100, on_error=None):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.on_error = on_error
+        self.callbacks = []
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def subscribe(self, callback):
+        """Call ``callback(details)`` for every resolved transaction"""
+        self.callbacks.append(callback)
+        return callback
+
+    def receive(self, body):
+        """Accept notification request body"""
+        notification = parse_notification(body)
+        self.add(notification.transaction)
+        return notification
+
+    def add(self, transaction_id):
+        cache = getattr(self.client, 'details_cache', None)
+        if cache is not None:
+            cache.invalidate(transaction_id)
+        with self._lock:
+            self._pending[transaction_id] = None
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self):
+        """Resolve collected transactions and notify subscribers"""
+        with self._lock:
+            transaction_ids = list(self._pending)
+            self._pending.clear()
+
+        for start in range(0, len(transaction_ids), self.max_batch):
+            chunk = transaction_ids[start:start + self.max_batch]
+            try:
+                transactions = self.client.details(chunk) or []
+            except Exception as e:
+                if self.on_error is None:
+                    with self._lock:
+                        for transaction_id in transaction_ids[start:]:
+                            self._pending[transaction_id] = None
+                    raise
+                self.on_error(chunk, e)
+                continue
+            for details in transactions:
+                self._emit(details)
+
+    def start(self):
+        """Flush every ``window`` seconds in background thread"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop background thread and resolve what is left"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.window):
+            try:
+                self.flush()
+            except Exception:
+                # failed transactions are retried in the next window
+                logger.exception('Resolving notified transactions failed')
+
+    def _emit(self, details):
+        for callback in self.callbacks:
+            try:
+                callback(details)
+            except Exception:
+                logger.exception('Subscriber %r failed on %s', callback,
+                                 details.transaction)
+
+    def __call__(self, environ, start_response):
+        """WSGI application accepting notification POST requests"""
+        if environ.get('REQUEST_METHOD') != 'POST':
+            start_response('405 Method Not Allowed', [('Allow', 'POST')])
+            return [b'']
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length > MAX_BODY_SIZE:
+                start_response('413 Request Entity Too Large',
+                               [('Content-Type', 'text/plain')])
+                return [b'Notification too large']
+            self.receive(environ['wsgi.input'].read(length))
+        except (ValueError, etree.XMLSyntaxError):
+            start_response('400 Bad Request',
+                           [('Content-Type', 'text/plain')])
+            return [b'Invalid notification']
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'OK']
@@ -0,0 +1,273 @@
+"""
+Instrumentation of API calls. Observers passed to the client are told
+about every stage of a request::
+
+    >>> metrics = HistogramObserver()
+    >>> client = sofort.Client(user_id, api_key, project_id,
+    ...                        observers=[metrics])
+    >>> client.details(transaction_id)
+    >>> print(metrics.render())  # Prometheus text format
+
+Without observers the client skips all of this.
+"""
+import logging
+import re
+import threading
+import time
+import timeit
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+timer = timeit.default_timer
+
+#: ``(name, start, end)`` of phases measured for every request
+PHASES = (
+    ('build', 'started', 'built'),
+    ('connect', 'built', 'sent'),
+    ('server', 'sent', 'first_byte'),
+    ('download', 'first_byte', 'received'),
+    ('parse', 'received', 'parsed'),
+)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestEvent(object):
+    """
+    State of one API call, the same object is passed to every hook.
+    Points in time come from :func:`timeit.default_timer`, ``None``
+    until reached; ``timestamp`` is wall clock time of ``started``.
+    ``sent`` is derived from response headers arrival, so it is known
+    only from ``first_byte`` on.
+
+    ``context`` is free for observers to keep their own state in.
+    """
+    __slots__ = ('kind', 'request_size', 'response_size', 'status',
+                 'attempts', 'error', 'timestamp', 'started', 'built', 'sent',
+                 'first_byte', 'received', 'parsed', 'finished', 'context')
+
+    def __init__(self, kind, request_size, started=None, built=None):
+        self.kind = kind
+        self.request_size = request_size
+        self.response_size = None
+        self.status = None
+        self.attempts = 0
+        self.error = None
+        self.built = built or timer()
+        self.started = started or self.built
+        self.timestamp = time.time() - (self.built - self.started)
+        self.sent = None
+        self.first_byte = None
+        self.received = None
+        self.parsed = None
+        self.finished = None
+        self.context = {}
+
+    def duration(self, start='started', end='finished'):
+        """Seconds between two points, ``None`` if any is unknown"""
+        start, end = getattr(self, start), getattr(self, end)
+        if start is None or end is None:
+            return None
+        return end - start
+
+    def phases(self):
+        """Durations of reached phases, ``{'build': ..., 'server': ...}``"""
+        result = {}
+        for name, start, end in PHASES:
+            duration = self.duration(start, end)
+            if duration is not None:
+                result[name] = duration
+        return result
+
+    def wall_time(self, point):
+        """Wall clock time of a point"""
+        return self.timestamp + (getattr(self, point) - self.started)
+
+
+class Observer(object):
+    """Base of observers, override the hooks you need"""
+    def request_built(self, event):
+        pass
+
+    def request_sent(self, event):
+        pass
+
+    def first_byte(self, event):
+        pass
+
+    def response_received(self, event):
+        pass
+
+    def response_parsed(self, event):
+        pass
+
+    def request_failed(self, event):
+        pass
+
+
+def request_kind(data):
+    """Root tag of request document, e.g. ``multipay``"""
+    match = re.match(br'\s*(?:<\?[^>]*\?>\s*)?<([\w-]+)', data)
+    return match.group(1).decode('ascii') if match else None
+
+
+def notify(observers, hook, event):
+    for observer in observers:
+        try:
+            getattr(observer, hook)(event)
+        except Exception:
+            logger.exception('Observer %r failed in %s', observer, hook)
+
+
+class Histogram(object):
+    """Cumulative histogram in the way Prometheus keeps them"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """``[(upper bound, count), ...]`` ending with ``+Inf``"""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class HistogramObserver(Observer):
+    """
+    Keeps Prometheus style histograms of phase durations and payload
+    sizes by request kind, and counts errors. ``render()`` returns them
+    in Prometheus text exposition format, e.g. for a ``/metrics`` view.
+    """
+    def __init__(self, prefix='sofort', buckets=DEFAULT_BUCKETS,
+                 size_buckets=SIZE_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.size_buckets = size_buckets
+        self.durations = {}
+        self.sizes = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def response_parsed(self, event):
+        self._record(event)
+
+    def request_failed(self, event):
+        key = (event.kind, type(event.error).__name__)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        self._record(event)
+
+    def _record(self, event):
+        phases = event.phases()
+        phases['total'] = event.duration()
+        with self._lock:
+            for phase, duration in phases.items():
+                self._histogram(self.durations, (event.kind, phase),
+                                self.buckets).observe(duration)
+            for direction, size in (('request', event.request_size),
+                                    ('response', event.response_size)):
+                if size is not None:
+                    self._histogram(self.sizes, (event.kind, direction),
+                                    self.size_buckets).observe(size)
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render(lines, 'request_duration_seconds',
+                         'Duration of Sofort API call phases',
+                         self.durations, ('kind', 'phase'))
+            self._render(lines, 'payload_size_bytes',
+                         'Size of Sofort API documents', self.sizes,
+                         ('kind', 'direction'))
+            name = '{0}_request_errors_total'.format(self.prefix)
+            lines.append('# HELP {0} Failed Sofort API calls'.format(name))
+            lines.append('# TYPE {0} counter'.format(name))
+            for (kind, error), count in sorted(self.errors.items()):
+                lines.append('{0}{{kind="{1}",error="{2}"}} {3}'.format(
+                    name, kind, error, count))
+        return '\n'.join(lines) + '\n'
+
+    def _render(self, lines, name, help_text, histograms, label_names):
+        name = '{0}_{1}'.format(self.prefix, name)
+        lines.append('# HELP {0} {1}'.format(name, help_text))
+        lines.append('# TYPE {0} histogram'.format(name))
+        for key, histogram in sorted(histograms.items()):
+            labels = ','.join('{0}="{1}"'.format(label, value)
+                              for label, value in zip(label_names, key))
+            for bound, count in histogram.cumulative():
+                lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(
+                    name, labels, '+Inf' if bound == float('inf')
+                    else repr(bound), count))
+            lines.append('{0}_sum{{{1}}} {2!r}'.format(name, labels,
+                                                      histogram.sum))
+            lines.append('{0}_count{{{1}}} {2}'.format(name, labels,
+                                                      histogram.count))
+
+
+class TracingObserver(Observer):
+    """
+    Reports every call as an OpenTelemetry span named
+    ``sofort.<kind>`` with an event per reached phase. ``tracer``
+    defaults to ``opentelemetry.trace.get_tracer('sofort')``.
+    """
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('sofort')
+        self.tracer = tracer
+
+    def request_built(self, event):
+        span = self.tracer.start_span(
+            'sofort.{0}'.format(event.kind),
+            start_time=_nanoseconds(event.wall_time('started')))
+        span.set_attribute('sofort.request_size', event.request_size)
+        event.context['span'] = span
+
+    def response_parsed(self, event):
+        self._end(event)
+
+    def request_failed(self, event):
+        span = event.context.get('span')
+        if span is not None:
+            span.record_exception(event.error)
+            span.set_attribute('error', True)
+        self._end(event)
+
+    def _end(self, event):
+        span = event.context.pop('span', None)
+        if span is None:
+            return
+        for point in ('built', 'sent', 'first_byte', 'received', 'parsed'):
+            if getattr(event, point) is not None:
+                span.add_event(point, timestamp=_nanoseconds(
+                    event.wall_time(point)))
+        for name in ('status', 'response_size', 'attempts'):
+            value = getattr(event, name)
+            if value is not None:
+                span.set_attribute('sofort.' + name, value)
+        span.end(end_time=_nanoseconds(event.wall_time('finished')))
+
+
+def _nanoseconds(seconds):
+    return int(seconds * 1e9)
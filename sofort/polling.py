@@ -0,0 +1,351 @@
+"""
+Polling of open transactions. Transactions are kept in a priority queue
+by time of their next check, the ones due are resolved together with
+multi-ID ``details(...)`` requests, and subscribers hear only about
+status changes::
+
+    >>> poller = StatusPoller(client)
+    >>> poller.subscribe(lambda change: db.update_status(change.details))
+    >>> poller.track(transaction_id)
+    >>> poller.start()
+
+A transaction is checked less often the longer its status stays the
+same and the older it gets; intervals depend on its status. Tracking
+stops once it reaches one of ``final_statuses``.
+"""
+import calendar
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+#: ``status: (first interval, maximal interval)`` in seconds
+INTERVALS = {
+    'pending': (60, 3600),
+    'untraceable': (300, 6 * 3600),
+}
+
+DEFAULT_INTERVAL = (60, 3600)
+
+FINAL_STATUSES = frozenset(['received', 'loss', 'refunded'])
+
+
+class StatusChange(namedtuple('StatusChange',
+                              ['transaction', 'previous', 'details'])):
+    """
+    ``previous`` status is ``None`` when the transaction is seen for the
+    first time, ``details`` is what ``client.details(...)`` returned
+    """
+    __slots__ = ()
+
+    @property
+    def status(self):
+        return self.details.status
+
+
+class _Entry(object):
+    __slots__ = ('status', 'created', 'unchanged', 'due')
+
+    def __init__(self, status, created, due):
+        self.status = status
+        self.created = created
+        self.unchanged = 0
+        self.due = due
+
+
+class StatusPoller(object):
+    """
+    :param client:
+        :class:`sofort.Client` used to fetch transaction details
+    :param dict intervals:
+        ``status: (first, maximal)`` intervals between checks in seconds,
+        statuses missing here use ``default_interval``
+    :param float backoff:
+        Interval grows by this factor with every check that finds the
+        status unchanged
+    :param float age_factor:
+        Interval is at least this share of the transaction age
+    :param float max_age:
+        Seconds after which a transaction is no longer tracked
+    :param int max_batch:
+        Maximum number of transactions per ``details(...)`` request
+    :param float lead:
+        Transactions due within this many seconds fill up the last
+        request of a tick, so they do not need a request of their own
+    :param on_error:
+        Called with transaction IDs and exception when details request
+        fails. Without it the exception is raised from ``tick()``;
+        failed transactions are checked again after ``error_delay``
+        seconds in both cases
+    :param clock:
+        Function returning current time in seconds
+    """
+    def __init__(self, client, intervals=INTERVALS,
+                 default_interval=DEFAULT_INTERVAL, backoff=1.5,
+                 age_factor=0.1, max_age=14 * 86400, max_batch=100,
+                 lead=300, final_statuses=FINAL_STATUSES, on_error=None,
+                 error_delay=60, clock=time.time):
+        self.client = client
+        self.intervals = intervals
+        self.default_interval = default_interval
+        self.backoff = backoff
+        self.age_factor = age_factor
+        self.max_age = max_age
+        self.max_batch = max_batch
+        self.lead = lead
+        self.final_statuses = frozenset(final_statuses)
+        self.on_error = on_error
+        self.error_delay = error_delay
+        self.clock = clock
+        self.callbacks = []
+        self.requests = 0
+        self.checks = 0
+        self.changes = 0
+        self._entries = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._entries
+
+    def subscribe(self, callback):
+        """Call ``callback(change)`` with :class:`StatusChange`"""
+        self.callbacks.append(callback)
+        return callback
+
+    def track(self, transaction_id, status=None, created=None):
+        """
+        Start polling a transaction. With ``status`` unknown it is
+        checked in the next tick. ``created`` (seconds since epoch)
+        defaults to now.
+        """
+        now = self.clock()
+        with self._lock:
+            if transaction_id in self._entries:
+                return
+            entry = _Entry(status, now if created is None else created, now)
+            if status is not None:
+                entry.due = now + self._interval(entry, now)
+            self._schedule(transaction_id, entry)
+        self._wakeup.set()
+
+    def untrack(self, transaction_id):
+        with self._lock:
+            self._entries.pop(transaction_id, None)
+
+    def update(self, details):
+        """
+        Take details fetched elsewhere (e.g. by
+        :class:`sofort.notifications.NotificationReceiver`) into account,
+        emits a change if the status is new
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(details.transaction)
+            if entry is None:
+                return
+            change = self._apply(details.transaction, entry, details, now)
+        if change is not None:
+            self._emit(change)
+
+    def next_due(self):
+        """Seconds until the next check is due, ``None`` if nothing is
+        tracked"""
+        with self._lock:
+            self._discard_stale()
+            if not self._queue:
+                return None
+            return max(0, self._queue[0][0] - self.clock())
+
+    def due(self, now=None):
+        """IDs of transactions due for a check, earliest first"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            return [transaction_id
+                    for due, _, transaction_id in sorted(self._queue)
+                    if due <= now and self._is_current(due, transaction_id)]
+
+    def tick(self):
+        """Check every transaction that is due, returns emitted changes"""
+        now = self.clock()
+        with self._lock:
+            transaction_ids = self._pop_due(now)
+            if transaction_ids and len(transaction_ids) % self.max_batch:
+                room = self.max_batch - len(transaction_ids) % self.max_batch
+                transaction_ids.extend(self._pop_due(now + self.lead, room))
+
+        changes = []
+        for start in range(0, len(transaction_ids), self.max_batch):
+            chunk = transaction_ids[start:start + self.max_batch]
+            try:
+                found = self._fetch(chunk)
+            except Exception as e:
+                self._retry_later(transaction_ids[start:]
+                                  if self.on_error is None else chunk)
+                if self.on_error is None:
+                    raise
+                self.on_error(chunk, e)
+                continue
+            resolved = self._resolved(chunk, found)
+            # before the next chunk, which may raise
+            for change in resolved:
+                self._emit(change)
+            changes.extend(resolved)
+        return changes
+
+    def stats(self):
+        return {'tracked': len(self._entries), 'requests': self.requests,
+                'checks': self.checks, 'changes': self.changes}
+
+    def start(self):
+        """Run ticks in background thread as transactions become due"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop background thread"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.next_due())
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.tick()
+            except Exception:
+                # failed transactions are checked again after error_delay
+                logger.exception('Polling transaction details failed')
+
+    def _pop_due(self, until, limit=None):
+        transaction_ids = []
+        while self._queue and self._queue[0][0] <= until and \
+                (limit is None or len(transaction_ids) < limit):
+            due, _, transaction_id = heapq.heappop(self._queue)
+            if self._is_current(due, transaction_id):
+                transaction_ids.append(transaction_id)
+        return transaction_ids
+
+    def _fetch(self, chunk):
+        # cached details would hide status changes
+        cache = self.client.details_cache
+        if cache is not None:
+            for transaction_id in chunk:
+                cache.invalidate(transaction_id)
+        self.requests += 1
+        return self.client.details(chunk) or []
+
+    def _resolved(self, chunk, found):
+        now = self.clock()
+        changes = []
+        with self._lock:
+            by_id = dict((details.transaction, details) for details in found)
+            for transaction_id in chunk:
+                entry = self._entries.get(transaction_id)
+                if entry is None:
+                    continue
+                self.checks += 1
+                details = by_id.get(transaction_id)
+                if details is None:
+                    entry.unchanged += 1
+                    self._reschedule(transaction_id, entry, now)
+                    continue
+                change = self._apply(transaction_id, entry, details, now)
+                if change is not None:
+                    changes.append(change)
+        return changes
+
+    def _apply(self, transaction_id, entry, details, now):
+        change = None
+        if details.status != entry.status:
+            change = StatusChange(transaction_id, entry.status, details)
+            entry.status = details.status
+            entry.unchanged = 0
+            self.changes += 1
+        else:
+            entry.unchanged += 1
+        created = _timestamp(getattr(details, 'time', None))
+        if created is not None:
+            entry.created = created
+
+        if entry.status in self.final_statuses or \
+                now - entry.created > self.max_age:
+            del self._entries[transaction_id]
+        else:
+            self._reschedule(transaction_id, entry, now)
+        return change
+
+    def _retry_later(self, transaction_ids):
+        due = self.clock() + self.error_delay
+        with self._lock:
+            for transaction_id in transaction_ids:
+                entry = self._entries.get(transaction_id)
+                if entry is not None:
+                    entry.due = due
+                    heapq.heappush(self._queue, (due, next(self._counter),
+                                                 transaction_id))
+
+    def _interval(self, entry, now):
+        first, maximum = self.intervals.get(entry.status,
+                                            self.default_interval)
+        interval = max(first * self.backoff ** entry.unchanged,
+                       (now - entry.created) * self.age_factor)
+        return min(interval, maximum)
+
+    def _reschedule(self, transaction_id, entry, now):
+        entry.due = now + self._interval(entry, now)
+        self._schedule(transaction_id, entry)
+
+    def _schedule(self, transaction_id, entry):
+        self._entries[transaction_id] = entry
+        heapq.heappush(self._queue, (entry.due, next(self._counter),
+                                     transaction_id))
+
+    def _is_current(self, due, transaction_id):
+        # queue items of rescheduled or untracked transactions are stale
+        entry = self._entries.get(transaction_id)
+        return entry is not None and entry.due == due
+
+    def _discard_stale(self):
+        while self._queue and not self._is_current(self._queue[0][0],
+                                                   self._queue[0][2]):
+            heapq.heappop(self._queue)
+
+    def _emit(self, change):
+        for callback in self.callbacks:
+            try:
+                callback(change)
+            except Exception:
+                logger.exception('Subscriber %r failed on %s', callback,
+                                 change.transaction)
+
+
+def _timestamp(value):
+    if value is None or getattr(value, 'tzinfo', None) is None:
+        return None
+    return calendar.timegm(value.utctimetuple())
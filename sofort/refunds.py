@@ -0,0 +1,194 @@
+"""
+Bulk refund submission. Refunds are grouped into batches which are sent
+concurrently, every row gets its own outcome, and progress is written to
+a journal so an interrupted run can be resumed without sending any
+refund twice::
+
+    >>> engine = BulkRefunds(client, sender, journal='refunds.journal')
+    >>> report = engine.run(refund_rows)
+    >>> [outcome for outcome in report if outcome.status != 'accepted']
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+from sofort.exceptions import RequestError, RequestErrors
+from sofort.internals import chunks
+
+#: Sofort rejected the whole document, rows were not refunded and are
+#: submitted again when the run is resumed
+FAILED = 'failed'
+#: request was sent but its result is not known (connection lost,
+#: process crashed); these rows are never submitted again automatically
+UNKNOWN = 'unknown'
+
+
+class RefundOutcome(namedtuple('RefundOutcome',
+                               ['key', 'refund', 'status', 'result',
+                                'errors'])):
+    """
+    Outcome of one refund row. ``status`` is the status Sofort returned
+    for the refund (e.g. ``accepted``), ``failed`` or ``unknown``.
+    ``result`` is the parsed ``<refund>`` of the response if there was
+    one, ``errors`` a list of error messages.
+    """
+    __slots__ = ()
+
+
+def refund_key(refund):
+    """
+    Default identity of a refund row. Identical rows (e.g. two equal
+    partial refunds of one transaction) get the same key, ``BulkRefunds``
+    tells them apart by their order of appearance.
+    """
+    return u'|'.join(_text(refund.get(name, u'')) for name in
+                     ('transaction', 'amount', 'comment', 'reason_1',
+                      'reason_2'))
+
+
+class RefundJournal(object):
+    """Append-only JSON lines log of submitted and finished rows"""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Latest entry for every key"""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line may be cut short by a crash
+                    continue
+                entries[entry['key']] = entry
+        return entries
+
+    def write(self, entries):
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BulkRefunds(object):
+    """
+    :param client:
+        :class:`sofort.Client`
+    :param dict sender:
+        Sender bank account, same for all refunds
+    :param journal:
+        Path of the journal file, ``None`` disables resuming
+    :param int batch_size:
+        Maximum number of refunds per ``<refunds>`` document
+    :param int workers:
+        Number of documents submitted at the same time
+    :param key:
+        Function returning identity of a refund row. Repeated keys get
+        ``#2``, ``#3``, ... appended in order of appearance, so the rows
+        must be passed in the same order when a run is resumed
+    """
+    def __init__(self, client, sender, journal=None, batch_size=50,
+                 workers=4, key=refund_key):
+        self.client = client
+        self.sender = sender
+        self.journal = RefundJournal(journal) if journal else None
+        self.batch_size = batch_size
+        self.workers = workers
+        self.key = key
+
+    def run(self, refunds):
+        """Submit refunds, returns list of :class:`RefundOutcome`"""
+        done = self.journal.load() if self.journal else {}
+        report = []
+        rows = []
+        occurrences = {}
+        for refund in refunds:
+            key = self.key(refund)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            if occurrences[key] > 1:
+                key = u'{0}#{1}'.format(key, occurrences[key])
+            entry = done.get(key)
+            if entry is None or entry['status'] == FAILED:
+                rows.append((key, refund))
+            elif entry['status'] == 'submitted':
+                report.append(RefundOutcome(key, refund, UNKNOWN, None, []))
+            else:
+                report.append(RefundOutcome(key, refund, entry['status'],
+                                            None, entry.get('errors', [])))
+
+        pool = ThreadPool(self.workers)
+        try:
+            for outcomes in pool.imap_unordered(
+                    self._submit, chunks(rows, self.batch_size)):
+                report.extend(outcomes)
+        finally:
+            pool.terminate()
+        return report
+
+    def _submit(self, rows):
+        self._journal(rows, 'submitted')
+        try:
+            response = self.client.refunds(
+                self.sender, [dict(refund) for _, refund in rows])
+        except RequestErrors as e:
+            # rejected document is not applied, so it is safe to find
+            # the bad rows by submitting halves of the batch
+            if len(rows) > 1:
+                middle = len(rows) // 2
+                return self._submit(rows[:middle]) + \
+                    self._submit(rows[middle:])
+            return self._finish(rows, FAILED, [_text(e)])
+        except Exception as e:
+            return self._finish(rows, UNKNOWN, [_text(e)])
+
+        results = response.refunds if response is not None else []
+        if len(results) != len(rows):
+            return self._finish(rows, UNKNOWN, [
+                'Expected {0} refunds in response, got {1}'.format(
+                    len(rows), len(results))])
+
+        outcomes = []
+        for (key, refund), result in zip(rows, results):
+            errors = [_text(error.message) for error in result.errors or []]
+            outcomes.append(RefundOutcome(key, refund, result.status, result,
+                                          errors))
+        self._journal_outcomes(outcomes)
+        return outcomes
+
+    def _finish(self, rows, status, errors):
+        outcomes = [RefundOutcome(key, refund, status, None, errors)
+                    for key, refund in rows]
+        self._journal_outcomes(outcomes)
+        return outcomes
+
+    def _journal(self, rows, status):
+        if self.journal is not None:
+            self.journal.write([{'key': key, 'status': status}
+                                for key, _ in rows])
+
+    def _journal_outcomes(self, outcomes):
+        if self.journal is not None:
+            self.journal.write([{'key': outcome.key, 'status': outcome.status,
+                                 'errors': outcome.errors}
+                                for outcome in outcomes])
+
+
+def _text(value):
+    """``value`` as text, ``str()`` fails on non-ASCII on Python 2"""
+    if isinstance(value, RequestErrors):
+        return u'; '.join(_text(error) for error in value.errors)
+    if isinstance(value, RequestError):
+        if value.field is None:
+            return _text(value.message)
+        return u'{0}: {1}'.format(value.field, _text(value.message))
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return u'{0}'.format(value)
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from collections import deque
+
+from sofort.exceptions import CircuitOpenError
+
+
+class RetryPolicy(object):
+    """
+    Retries with jittered exponential backoff. Only idempotent requests
+    (``details``, ``find_transactions``) are retried, ``payment`` and
+    ``refunds`` are always sent once.
+
+    :param int retries:
+        Maximum number of retries after the first attempt
+    :param float backoff:
+        Base delay in seconds, doubled on every retry
+    :param float max_backoff:
+        Upper bound of a single delay
+    :param statuses:
+        HTTP statuses worth retrying
+    """
+    STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, retries=2, backoff=0.2, max_backoff=5.0,
+                 statuses=STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def should_retry(self, attempt):
+        return attempt < self.retries
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number ``attempt + 1``"""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def retry_after(headers):
+    """Seconds from ``Retry-After`` header, ``None`` if absent or a date"""
+    try:
+        return float(headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast with :class:`sofort.exceptions.CircuitOpenError` while
+    the API is unhealthy. The circuit opens when at least
+    ``failure_rate`` of the last ``window`` calls failed (and at least
+    ``min_calls`` were made). After ``reset_timeout`` seconds one trial
+    call is let through, its outcome closes or reopens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=10,
+                 reset_timeout=30.0, clock=time.time):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_running = False
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError()
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpenError()
+                self._trial_running = True
+
+    def record(self, success):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and \
+                    failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
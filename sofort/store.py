@@ -0,0 +1,236 @@
+"""
+Local SQLite store of transaction details. Keeps a ledger in sync with
+the API by requesting only transactions whose status changed since the
+last sync, and serves reads from the local index::
+
+    >>> store = TransactionStore('transactions.db')
+    >>> store.incremental_sync(client)
+    >>> store.find(status='pending', from_time=yesterday)
+"""
+import datetime
+import json
+import sqlite3
+import threading
+from decimal import Decimal
+
+import iso8601
+from schematics.types.compound import ListType, ModelType
+
+from sofort.client import TRANSACTION_HISTORY_LIMIT
+from sofort.internals import as_list, chunks
+from sofort.model import SofortListType, TransactionDetailsModel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    status TEXT,
+    time TEXT,
+    status_modified TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_status
+    ON transactions (status, time);
+CREATE INDEX IF NOT EXISTS transactions_time
+    ON transactions (time);
+CREATE INDEX IF NOT EXISTS transactions_status_modified
+    ON transactions (status_modified);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+_DETAILS = ModelType(TransactionDetailsModel)
+
+
+class TransactionStore(object):
+    """
+    :param str path:
+        Database file, ``:memory:`` keeps everything in memory
+
+    Times are indexed in UTC, naive datetimes passed to queries are
+    taken as UTC. Transactions are read back as
+    :class:`sofort.model.TransactionDetailsModel` whichever decoder the
+    client used.
+    """
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM transactions')[0][0]
+
+    def close(self):
+        self._db.close()
+
+    def save(self, transactions):
+        """Insert or replace transaction details, returns their number"""
+        rows = [(details.transaction, details.status,
+                 _utc(details.time), _utc(details.status_modified),
+                 json.dumps(_raw(_DETAILS, details)))
+                for details in as_list(transactions)]
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO transactions '
+                    '(transaction_id, status, time, status_modified, data) '
+                    'VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def get(self, transaction_id):
+        """Details of one transaction, ``None`` if it is not stored"""
+        rows = self._query('SELECT data FROM transactions '
+                           'WHERE transaction_id = ?', (transaction_id,))
+        return _load(rows[0][0]) if rows else None
+
+    def find(self, status=None, from_time=None, to_time=None,
+             modified_since=None, limit=None):
+        """
+        Stored transactions, newest first
+
+        :param status:
+            Status or list of statuses
+        :param from_time:
+            Created at or after
+        :param to_time:
+            Created before
+        :param modified_since:
+            Status changed at or after
+        :param int limit:
+            Maximum number of transactions
+        """
+        where = []
+        params = []
+        if status is not None:
+            statuses = as_list(status)
+            where.append('status IN ({0})'.format(
+                ', '.join('?' * len(statuses))))
+            params.extend(statuses)
+        if from_time is not None:
+            where.append('time >= ?')
+            params.append(_utc(from_time))
+        if to_time is not None:
+            where.append('time < ?')
+            params.append(_utc(to_time))
+        if modified_since is not None:
+            where.append('status_modified >= ?')
+            params.append(_utc(modified_since))
+
+        sql = 'SELECT data FROM transactions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY time DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [_load(data) for data, in self._query(sql, params)]
+
+    def count(self, status=None):
+        """Number of stored transactions by status"""
+        if status is not None:
+            return self._query('SELECT COUNT(*) FROM transactions '
+                               'WHERE status = ?', (status,))[0][0]
+        return dict(self._query('SELECT status, COUNT(*) FROM transactions '
+                                'GROUP BY status'))
+
+    def high_water_mark(self):
+        """
+        Time (UTC) the last completed ``incremental_sync`` requested
+        changes up to. Transactions stored by :meth:`save` do not move it.
+        """
+        rows = self._query('SELECT value FROM meta WHERE key = ?',
+                           ('high_water_mark',))
+        if not rows:
+            return None
+        return datetime.datetime.strptime(rows[0][0], TIME_FORMAT)\
+            .replace(tzinfo=iso8601.UTC)
+
+    def incremental_sync(self, client, since=None, overlap=None,
+                         page_size=100):
+        """
+        Fetch transactions whose status changed after the high-water mark
+        and store them, then move the mark to the start of this sync.
+        Returns the number of stored transactions.
+
+        :param since:
+            Start of the first sync, defaults to ``TRANSACTION_HISTORY_LIMIT``
+            ago
+        :param datetime.timedelta overlap:
+            Also request changes this long before the mark, to catch
+            transactions modified within the same second; 1 minute by
+            default
+        """
+        now = datetime.datetime.now(iso8601.UTC)
+        from_time = self.high_water_mark()
+        if from_time is None:
+            from_time = since or now - TRANSACTION_HISTORY_LIMIT
+            if from_time.tzinfo is None:
+                from_time = from_time.replace(tzinfo=iso8601.UTC)
+        else:
+            from_time -= overlap or datetime.timedelta(minutes=1)
+
+        saved = 0
+        for batch in chunks(client.iter_transactions(
+                from_time, now, page_size=page_size,
+                time_field='status_modified_time'), page_size):
+            saved += self.save(batch)
+        # pages are not ordered by status change, only a complete run
+        # may move the mark
+        self._set_meta('high_water_mark', _utc(now))
+        return saved
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO meta (key, value) '
+                                 'VALUES (?, ?)', (key, value))
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+
+def _utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value.strftime(TIME_FORMAT)
+
+
+def _load(data):
+    return TransactionDetailsModel(json.loads(data), strict=False)
+
+
+def _raw(field, value):
+    """
+    Turn decoded value back to the structure ``xmltodict`` produces, so
+    it can be loaded by the model again. Works for schematics models
+    and :mod:`sofort.fastmodel` records alike.
+    """
+    if value is None:
+        return None
+    if isinstance(field, ModelType):
+        return dict((name, _raw(item_field, getattr(value, name, None)))
+                    for name, item_field in field.model_class._fields.items())
+    if isinstance(field, SofortListType):
+        return {field.field_name: [_raw(field.field, item) for item in value]}
+    if isinstance(field, ListType):
+        return [_raw(field.field, item) for item in value]
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -0,0 +1,545 @@
+"""
+Fake Sofort API for tests and offline load tests. It speaks the
+``multipay``, ``transaction_request`` and ``refunds`` protocols, keeps
+created transactions in memory, can generate synthetic transaction
+histories and simulates latency and failures::
+
+    >>> api = FakeSofortApi(latency=(0.05, 0.2), errors={503: 0.01},
+    ...                     seed=1)
+    >>> api.generate(10000)
+
+    >>> # in process, no sockets involved
+    >>> client = sofort.Client(api.user_id, api.api_key, api.project_id,
+    ...                        transport=FakeTransport(api))
+
+    >>> # over HTTP, e.g. for an application under load test
+    >>> with FakeServer(api) as server:
+    ...     client = sofort.Client(api.user_id, api.api_key,
+    ...                            api.project_id, base_url=server.url)
+"""
+import base64
+import calendar
+import datetime
+import hashlib
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+import iso8601
+import requests
+from lxml import etree
+
+from sofort.transport import HttpTransport
+
+#: key of ``errors`` profile simulating a dropped connection
+CONNECTION_ERROR = 'connection_error'
+
+STATUSES = [
+    ('untraceable', 'sofort_bank_account_needed'),
+    ('pending', 'not_credited_yet'),
+    ('received', 'credited'),
+    ('loss', 'not_credited'),
+]
+
+MULTIPAY_MANDATORY = ['project_id', 'amount', 'currency_code',
+                      'success_url', 'abort_url']
+
+INVALID_XML = (7000, 'Invalid XML.')
+UNKNOWN_REQUEST = (7001, 'Unknown request.')
+ABORTED = (8054, 'All products deactivated due to errors, initiation '
+                 'aborted.')
+EMPTY = (8010, 'Must not be empty.')
+INVALID_AMOUNT = (8014, 'Invalid amount.')
+UNKNOWN_TRANSACTION = (8016, 'Transaction is unknown.')
+AMOUNT_TOO_HIGH = (8017, 'Refund amount exceeds transaction amount.')
+
+SENDER = OrderedDict([
+    ('holder', 'Max Mustermann'),
+    ('account_number', '23456789'),
+    ('bank_code', '88888888'),
+    ('bank_name', 'Demo Bank'),
+    ('bic', 'SFRTDE20XXX'),
+    ('iban', 'DE06000000000023456789'),
+    ('country_code', 'DE'),
+])
+
+RECIPIENT = OrderedDict([
+    ('holder', 'My Company GmbH'),
+    ('account_number', '0000000000'),
+    ('bank_code', '00000000'),
+    ('bank_name', 'Demo Bank'),
+    ('bic', 'AAAAAAAAAAA'),
+    ('iban', 'DE00000000000000000001'),
+    ('country_code', 'DE'),
+])
+
+
+class FakeSofortApi(object):
+    """
+    :param latency:
+        Seconds per request: a number, ``(min, max)`` range or a function
+        returning seconds
+    :param errors:
+        Probability of a failure by HTTP status (e.g. ``{503: 0.01}``)
+        or :data:`CONNECTION_ERROR`, or a function returning the failure
+        of the next request (``None`` for a normal response)
+    :param seed:
+        Seed of the random generator, for reproducible runs
+    """
+    def __init__(self, user_id='123456', api_key='fake-api-key',
+                 project_id='123456', latency=0, errors=None, seed=None):
+        self.user_id = user_id
+        self.api_key = api_key
+        self.project_id = project_id
+        self.latency_profile = latency
+        self.errors = errors if callable(errors) else dict(errors or {})
+        self.requests = 0
+        self.transactions = OrderedDict()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._handlers = {
+            'multipay': self._multipay,
+            'transaction_request': self._transaction_request,
+            'refunds': self._refunds,
+        }
+
+    def latency(self):
+        """Seconds the next request takes"""
+        profile = self.latency_profile
+        if callable(profile):
+            return profile()
+        if isinstance(profile, (tuple, list)):
+            with self._lock:
+                return self._random.uniform(*profile)
+        return profile
+
+    def fault(self):
+        """HTTP status or :data:`CONNECTION_ERROR` to fail next request
+        with, ``None`` for a normal response"""
+        if callable(self.errors):
+            return self.errors()
+        if not self.errors:
+            return None
+        with self._lock:
+            draw = self._random.random()
+        for fault, probability in sorted(self.errors.items(),
+                                         key=lambda item: str(item[0])):
+            if draw < probability:
+                return fault
+            draw -= probability
+        return None
+
+    def generate(self, count, from_time=None, to_time=None,
+                 statuses=STATUSES):
+        """
+        Add ``count`` synthetic transactions created between ``from_time``
+        and ``to_time`` (last 29 days by default), returns their IDs
+        """
+        to_time = _aware(to_time) or datetime.datetime.now(iso8601.UTC)
+        from_time = _aware(from_time) or to_time - datetime.timedelta(days=29)
+        span = (to_time - from_time).total_seconds()
+
+        with self._lock:
+            times = sorted(from_time + datetime.timedelta(
+                seconds=self._random.uniform(0, span)) for _ in range(count))
+            transaction_ids = []
+            for created in times:
+                status, status_reason = self._random.choice(statuses)
+                modified = min(to_time, created + datetime.timedelta(
+                    seconds=self._random.uniform(0, 3 * 86400)))
+                amount = Decimal(self._random.randint(100, 50000)) / 100
+                transaction = self._create(created, amount, [
+                    'Order {0}'.format(self._counter)])
+                transaction['history'].append((status, status_reason,
+                                               modified))
+                transaction_ids.append(transaction['transaction'])
+        return transaction_ids
+
+    def set_status(self, transaction_id, status, status_reason, when=None):
+        """Change transaction status, as if the payment proceeded"""
+        with self._lock:
+            self.transactions[transaction_id]['history'].append(
+                (status, status_reason,
+                 _aware(when) or datetime.datetime.now(iso8601.UTC)))
+
+    def handle(self, data, auth=None):
+        """Answer request body, returns ``(status, body)``"""
+        with self._lock:
+            self.requests += 1
+        if auth is not None and tuple(auth) != (self.user_id, self.api_key):
+            return 401, b''
+        try:
+            root = etree.fromstring(data)
+        except etree.XMLSyntaxError:
+            return 200, _tostring(_errors([INVALID_XML]))
+        handler = self._handlers.get(root.tag)
+        if handler is None:
+            return 200, _tostring(_errors([UNKNOWN_REQUEST]))
+        return 200, _tostring(handler(root))
+
+    def _create(self, created, amount, reasons, currency_code='EUR',
+                user_variables=None):
+        self._counter += 1
+        transaction_id = '{0}-{1}-{2:08X}-{3:04X}'.format(
+            self.project_id, self.user_id,
+            calendar.timegm(created.utctimetuple()), self._counter & 0xFFFF)
+        transaction = self.transactions[transaction_id] = {
+            'transaction': transaction_id,
+            'time': created,
+            'amount': amount,
+            'amount_refunded': Decimal('0.00'),
+            'currency_code': currency_code,
+            'reasons': reasons,
+            'user_variables': user_variables or [],
+            'history': [('untraceable', 'sofort_bank_account_needed',
+                         created)],
+        }
+        return transaction
+
+    def _multipay(self, root):
+        errors = [EMPTY + (name,) for name in MULTIPAY_MANDATORY
+                  if not root.findtext(name)]
+        if not root.findall('reasons/reason'):
+            errors.append(EMPTY + ('reasons',))
+        try:
+            amount = Decimal(root.findtext('amount') or '0')
+        except InvalidOperation:
+            amount = Decimal(0)
+        if amount <= 0:
+            errors.append(INVALID_AMOUNT + ('amount',))
+        if errors:
+            result = _errors([ABORTED])
+            _append_errors(etree.SubElement(result, 'su'), errors)
+            return result
+
+        with self._lock:
+            transaction = self._create(
+                datetime.datetime.now(iso8601.UTC), amount,
+                [reason.text for reason in root.findall('reasons/reason')],
+                root.findtext('currency_code'),
+                [variable.text for variable in
+                 root.findall('user_variables/user_variable')])
+        transaction_id = transaction['transaction']
+
+        result = etree.Element('new_transaction')
+        etree.SubElement(result, 'transaction').text = transaction_id
+        etree.SubElement(result, 'payment_url').text = \
+            'https://www.sofort.com/payment/go/' + \
+            hashlib.sha1(transaction_id.encode('ascii')).hexdigest()
+        return result
+
+    def _transaction_request(self, root):
+        transaction_ids = [node.text for node in root.findall('transaction')]
+        with self._lock:
+            if transaction_ids:
+                found = [self.transactions[transaction_id]
+                         for transaction_id in transaction_ids
+                         if transaction_id in self.transactions]
+            else:
+                found = self._search(root)
+            result = etree.Element('transactions')
+            for transaction in found:
+                _append_details(result, transaction, self.project_id)
+        return result
+
+    def _search(self, root):
+        ranges = []
+        for name, key in (('time', lambda t: t['time']),
+                          ('status_modified_time',
+                           lambda t: t['history'][-1][2])):
+            from_time = _parse_time(root.findtext('from_' + name))
+            to_time = _parse_time(root.findtext('to_' + name))
+            if from_time is not None or to_time is not None:
+                ranges.append((key, from_time, to_time))
+        status = root.findtext('status')
+        number = min(int(root.findtext('number') or 10), 100)
+        page = max(int(root.findtext('page') or 1), 1)
+
+        found = []
+        for transaction in self.transactions.values():
+            if status and transaction['history'][-1][0] != status:
+                continue
+            if all((from_time is None or key(transaction) >= from_time) and
+                   (to_time is None or key(transaction) <= to_time)
+                   for key, from_time, to_time in ranges):
+                found.append(transaction)
+        found.sort(key=lambda transaction: transaction['time'])
+        return found[(page - 1) * number:page * number]
+
+    def _refunds(self, root):
+        result = etree.Element('refunds')
+        result.set('version', '3')
+        sender = root.find('sender')
+        if sender is not None:
+            result.append(sender)
+        etree.SubElement(result, 'title').text = 'Refunds {0}'.format(
+            datetime.date.today().isoformat())
+        etree.SubElement(result, 'pain').text = base64.b64encode(
+            b'pain.001').decode('ascii')
+
+        now = datetime.datetime.now(iso8601.UTC)
+        with self._lock:
+            for request in root.findall('refund'):
+                errors = self._refund(request.findtext('transaction'),
+                                      request.findtext('amount'), now)
+                refund = etree.SubElement(result, 'refund')
+                for node in list(request):
+                    refund.append(node)
+                etree.SubElement(refund, 'time').text = now.isoformat()
+                etree.SubElement(refund, 'status').text = \
+                    'error' if errors else 'accepted'
+                if errors:
+                    _append_errors(refund, errors)
+        return result
+
+    def _refund(self, transaction_id, amount, now):
+        transaction = self.transactions.get(transaction_id)
+        if transaction is None:
+            return [UNKNOWN_TRANSACTION + ('transaction',)]
+        try:
+            amount = Decimal(amount or '0')
+        except InvalidOperation:
+            amount = Decimal(0)
+        if amount <= 0:
+            return [INVALID_AMOUNT + ('amount',)]
+        refunded = transaction['amount_refunded'] + amount
+        if refunded > transaction['amount']:
+            return [AMOUNT_TOO_HIGH + ('amount',)]
+
+        transaction['amount_refunded'] = refunded
+        if refunded == transaction['amount']:
+            transaction['history'].append(('refunded', 'refunded', now))
+        else:
+            transaction['history'].append(('received', 'partially_credited',
+                                           now))
+        return []
+
+
+class FakeResponse(object):
+    """Subset of ``requests.Response`` used by :class:`sofort.Client`"""
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Type': 'application/xml'}
+        if status_code in (429, 503):
+            self.headers['Retry-After'] = '0'
+        self.raw = BytesIO(content)
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def close(self):
+        self.raw.close()
+
+
+class FakeTransport(object):
+    """
+    In-process transport answering from :class:`FakeSofortApi`, latency
+    is simulated by sleeping. Drop-in replacement of
+    :class:`sofort.transport.HttpTransport`.
+    """
+    errors = HttpTransport.errors
+
+    def __init__(self, api):
+        self.api = api
+
+    def post(self, url, auth, data, stream=False, timeout=None):
+        delay = self.api.latency()
+        if timeout is not None and timeout[1] is not None \
+                and delay > timeout[1]:
+            time.sleep(timeout[1])
+            raise requests.Timeout('Fake API read timed out')
+        if delay:
+            time.sleep(delay)
+        fault = self.api.fault()
+        if fault == CONNECTION_ERROR:
+            raise requests.ConnectionError('Connection reset by fake API')
+        if fault is not None:
+            return FakeResponse(fault, b'')
+        return FakeResponse(*self.api.handle(data, auth))
+
+    def close(self):
+        pass
+
+
+class FakeHandler(BaseHTTPRequestHandler, object):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_POST(self):
+        api = self.server.api
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        delay = api.latency()
+        if delay:
+            time.sleep(delay)
+        fault = api.fault()
+        if fault == CONNECTION_ERROR:
+            self.close_connection = True
+            return
+        if fault is not None:
+            status, content = fault, b''
+        else:
+            status, content = api.handle(body, self._auth())
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(content)))
+        if status in (429, 503):
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _auth(self):
+        header = self.headers.get('Authorization') or ''
+        if not header.startswith('Basic '):
+            return ('', '')
+        credentials = base64.b64decode(header[6:].encode('ascii'))
+        return tuple(credentials.decode('utf-8').split(':', 1))
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    """
+    :class:`FakeSofortApi` served over HTTP on a local port, runs in a
+    daemon thread between ``start()`` and ``stop()``. ``connections``
+    counts accepted TCP connections.
+    """
+    daemon_threads = True
+    # many client threads may connect at once
+    request_queue_size = 128
+
+    def __init__(self, api, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), FakeHandler)
+        self.api = api
+        self.connections = 0
+        self._thread = None
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        ThreadingMixIn.process_request(self, request, client_address)
+
+    def handle_error(self, request, client_address):
+        # clients giving up on a slow response (read timeout) reset the
+        # connection, everything else is reported
+        if not isinstance(sys.exc_info()[1], (IOError, OSError)):
+            HTTPServer.handle_error(self, request, client_address)
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}/api/xml'.format(*self.server_address[:2])
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+def _aware(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=iso8601.UTC)
+    return value
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    return iso8601.parse_date(value, default_timezone=iso8601.UTC)
+
+
+def _tostring(root):
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+
+def _errors(errors):
+    result = etree.Element('errors')
+    _append_errors(result, errors, parent_tag=None)
+    return result
+
+
+def _append_errors(root, errors, parent_tag='errors'):
+    if parent_tag is not None:
+        root = etree.SubElement(root, parent_tag)
+    for error in errors:
+        node = etree.SubElement(root, 'error')
+        etree.SubElement(node, 'code').text = str(error[0])
+        etree.SubElement(node, 'message').text = error[1]
+        if len(error) > 2:
+            etree.SubElement(node, 'field').text = error[2]
+
+
+def _append_account(root, tag, account):
+    node = etree.SubElement(root, tag)
+    for name, value in account.items():
+        etree.SubElement(node, name).text = value
+
+
+def _append_details(root, transaction, project_id):
+    status, status_reason, status_modified = transaction['history'][-1]
+    details = etree.SubElement(root, 'transaction_details')
+    for name, value in [
+            ('project_id', project_id),
+            ('transaction', transaction['transaction']),
+            ('test', '1'),
+            ('time', transaction['time'].isoformat()),
+            ('status', status),
+            ('status_reason', status_reason),
+            ('status_modified', status_modified.isoformat()),
+            ('payment_method', 'su'),
+            ('language_code', 'de'),
+            ('amount', str(transaction['amount'])),
+            ('amount_refunded', str(transaction['amount_refunded'])),
+            ('currency_code', transaction['currency_code'])]:
+        etree.SubElement(details, name).text = value
+
+    reasons = etree.SubElement(details, 'reasons')
+    for reason in transaction['reasons']:
+        etree.SubElement(reasons, 'reason').text = reason
+    user_variables = etree.SubElement(details, 'user_variables')
+    for variable in transaction['user_variables']:
+        etree.SubElement(user_variables, 'user_variable').text = variable
+
+    _append_account(details, 'sender', SENDER)
+    _append_account(details, 'recipient', RECIPIENT)
+    etree.SubElement(details, 'email_customer')
+    etree.SubElement(details, 'phone_customer')
+    etree.SubElement(details, 'exchange_rate').text = '1.0000'
+    costs = etree.SubElement(details, 'costs')
+    etree.SubElement(costs, 'fees').text = '0.25'
+    etree.SubElement(costs, 'currency_code').text = 'EUR'
+    etree.SubElement(costs, 'exchange_rate').text = '1.0000'
+    su = etree.SubElement(details, 'su')
+    etree.SubElement(su, 'consumer_protection').text = '1'
+
+    items = etree.SubElement(details, 'status_history_items')
+    for status, status_reason, changed in transaction['history']:
+        item = etree.SubElement(items, 'status_history_item')
+        etree.SubElement(item, 'status').text = status
+        etree.SubElement(item, 'status_reason').text = status_reason
+        etree.SubElement(item, 'time').text = changed.isoformat()
@@ -0,0 +1,45 @@
+"""
+In-process counterpart of :class:`sofort.testing.FakeTransport` for
+:class:`sofort.aio.AsyncClient`, requires Python 3.6+ and aiohttp::
+
+    >>> api = FakeSofortApi(latency=(0.05, 0.2), seed=1)
+    >>> client = AsyncClient(api.user_id, api.api_key, api.project_id,
+    ...                      transport=FakeAsyncTransport(api))
+"""
+import asyncio
+
+import aiohttp
+
+from sofort.aio import AiohttpTransport
+from sofort.testing import CONNECTION_ERROR
+
+
+class FakeAsyncTransport(object):
+    """
+    In-process counterpart of :class:`AiohttpTransport` answering from
+    :class:`sofort.testing.FakeSofortApi`
+    """
+    errors = AiohttpTransport.errors
+
+    def __init__(self, api):
+        self.api = api
+
+    async def post(self, url, auth, data, timeout=None):
+        delay = self.api.latency()
+        if timeout is not None and timeout[1] is not None \
+                and delay > timeout[1]:
+            await asyncio.sleep(timeout[1])
+            raise asyncio.TimeoutError()
+        if delay:
+            await asyncio.sleep(delay)
+        fault = self.api.fault()
+        if fault == CONNECTION_ERROR:
+            raise aiohttp.ServerDisconnectedError()
+        if fault is not None:
+            return fault, {}, ''
+        status, content = self.api.handle(data, auth)
+        return status, {'Content-Type': 'application/xml'}, \
+            content.decode('utf-8')
+
+    async def close(self):
+        pass
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpTransport(object):
+    """
+    Keep-alive HTTP transport backed by pooled ``requests`` sessions.
+    One instance is meant to be shared by every call of a client (and
+    by every thread using that client), so TCP/TLS connections to the
+    API are reused instead of being opened for each request. Every
+    thread gets its own session, all of them share one thread-safe
+    connection pool.
+
+    :param int pool_connections:
+        Number of per-host connection pools to cache
+    :param int pool_maxsize:
+        Maximum number of connections kept open per host
+    :param bool keep_alive:
+        Reuse connections between requests
+    :param float idle_timeout:
+        Drop pooled connections which were not used for that many
+        seconds, ``None`` keeps them until ``close()``
+    """
+    #: connection level failures, worth retrying for idempotent requests
+    errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True,
+                 idle_timeout=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._adapter = None
+        self._last_used = None
+        self._local = threading.local()
+
+    def post(self, url, auth, data, stream=False, timeout=None):
+        headers = None if self.keep_alive else {'Connection': 'close'}
+        return self._acquire().post(url, auth=auth, data=data,
+                                    headers=headers, stream=stream,
+                                    timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+                self._adapter = None
+
+    def _acquire(self):
+        """Session of the calling thread"""
+        with self._lock:
+            now = time.time()
+            if self._adapter is not None and self._is_idle(now):
+                self._adapter.close()
+                self._adapter = None
+            if self._adapter is None:
+                self._adapter = self._create_adapter()
+            self._last_used = now
+            adapter = self._adapter
+
+        local = self._local
+        if getattr(local, 'adapter', None) is not adapter:
+            # sessions are not closed, that would close the shared pool
+            local.session = self._create_session(adapter)
+            local.adapter = adapter
+        return local.session
+
+    def _is_idle(self, now):
+        return self.idle_timeout is not None \
+            and now - self._last_used > self.idle_timeout
+
+    def _create_adapter(self):
+        return HTTPAdapter(pool_connections=self.pool_connections,
+                           pool_maxsize=self.pool_maxsize)
+
+    def _create_session(self, adapter):
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
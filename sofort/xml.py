@@ -2,28 +2,105 @@ import datetime
 import collections
 from lxml import etree
 
+MULTIPAY_MANDATORY = ['project_id', 'amount', 'currency_code',
+                      'success_url', 'abort_url']
+MULTIPAY_OPTIONAL = ['interface_version', 'language_code', 'timeout',
+                     'email_customer', 'phone_customer', 'timeout_url',
+                     'success_link_redirect']
+MULTIPAY_LISTS = {
+    'user_variables': 'user_variable',
+    'reasons': 'reason'
+}
+MULTIPAY_NOTIFICATIONS = {
+    'notification_urls': 'notification_url',
+    'notification_emails': 'notification_email'
+}
+
+
 def multipay(config):
     root = etree.Element('multipay')
 
-    prime_mandatory = ['project_id', 'amount', 'currency_code',
-                       'success_url', 'abort_url']
-    prime_optional = ['interface_version', 'language_code', 'timeout',
-                      'email_customer', 'phone_customer', 'timeout_url',
-                      'success_link_redirect']
-    prime_lists = {
-        'user_variables': 'user_variable',
-        'reasons': 'reason'
-    }
-
-    notification_addresses = {
-        'notification_urls': 'notification_url',
-        'notification_emails': 'notification_email'
-    }
-
-    for attr_name in prime_mandatory:
+    for attr_name in MULTIPAY_MANDATORY:
         etree.SubElement(root, attr_name).text = str(getattr(config, attr_name))
 
-    for attr_name in prime_optional:
+    _append_optional(root, config)
+    _append_lists(root, config)
+    _append_notifications(root, config)
+    etree.SubElement(root, 'su')
+
+    return etree.tostring(root)
+
+
+class MultipayTemplate(object):
+    """
+    ``multipay`` document precompiled for a config. Everything except
+    ``amount``, ``reasons`` and ``user_variables`` is serialized once,
+    ``render(params)`` only builds these three and returns the same bytes
+    as ``multipay(params)`` would. Use ``matches(params)`` to check that
+    the template is valid for given params.
+    """
+    VARIABLE = frozenset(('amount',) + tuple(MULTIPAY_LISTS))
+
+    def __init__(self, config):
+        config = self.config = config.clone().freeze()
+        self.static = dict((name, getattr(config, name, None))
+                           for name in self._static_names())
+
+        root = etree.Element('multipay')
+        etree.SubElement(root, 'project_id').text = str(config.project_id)
+        self._head = b'<multipay>' + etree.tostring(root[0])
+
+        root = etree.Element('multipay')
+        for attr_name in MULTIPAY_MANDATORY[2:]:
+            etree.SubElement(root, attr_name).text = str(getattr(config, attr_name))
+        _append_optional(root, config)
+        self._middle = b''.join(etree.tostring(node) for node in root)
+
+        root = etree.Element('multipay')
+        _append_notifications(root, config)
+        etree.SubElement(root, 'su')
+        self._tail = b''.join(etree.tostring(node) for node in root) \
+            + b'</multipay>'
+
+    @classmethod
+    def compile(cls, config):
+        """Template for config, ``None`` if mandatory fields are missing"""
+        for name in MULTIPAY_MANDATORY:
+            if name != 'amount' and not config.has(name):
+                return None
+        return cls(config)
+
+    def matches(self, params):
+        if params.shares(self.config):
+            # values set or merely read (mutable ones are copied on
+            # read) on top of the shared layer may still be equal
+            names = params.overridden().intersection(self.static)
+        else:
+            names = self.static
+        for name in names:
+            if getattr(params, name, None) != self.static[name]:
+                return False
+        return True
+
+    def render(self, params):
+        amount = etree.Element('amount')
+        amount.text = str(params.amount)
+
+        root = etree.Element('multipay')
+        _append_lists(root, params)
+
+        return b''.join([self._head, etree.tostring(amount), self._middle] +
+                        [etree.tostring(node) for node in root] +
+                        [self._tail])
+
+    @staticmethod
+    def _static_names():
+        return [name for name in MULTIPAY_MANDATORY if name != 'amount'] \
+            + MULTIPAY_OPTIONAL + list(MULTIPAY_NOTIFICATIONS)
+
+
+def _append_optional(root, config):
+    for attr_name in MULTIPAY_OPTIONAL:
         value = getattr(config, attr_name, None)
 
         if value is None:
@@ -31,7 +108,9 @@ def multipay(config):
 
         etree.SubElement(root, attr_name).text = __serialize(value)
 
-    for collection_name, item_name in prime_lists.items():
+
+def _append_lists(root, config):
+    for collection_name, item_name in MULTIPAY_LISTS.items():
         if not config.has(collection_name):
             continue
 
@@ -39,7 +118,9 @@ def multipay(config):
         for value in getattr(config, collection_name):
             etree.SubElement(collection, item_name).text = value
 
-    for collection_name, item_name in notification_addresses.items():
+
+def _append_notifications(root, config):
+    for collection_name, item_name in MULTIPAY_NOTIFICATIONS.items():
         if not config.has(collection_name):
             continue
 
@@ -51,10 +132,6 @@ def multipay(config):
             if notify_on != 'default':
                 node.set('notify_on', notify_on)
 
-    etree.SubElement(root, 'su')
-
-    return etree.tostring(root)
-
 
 def transaction_request_by_params(params):
     root = etree.Element('transaction_request')
@@ -0,0 +1,224 @@
+import datetime
+import unittest
+
+import iso8601
+
+import sofort
+from sofort import columns
+from sofort.notifications import MAX_BODY_SIZE, NotificationReceiver
+from sofort.observers import HistogramObserver
+from sofort.resilience import CircuitBreaker
+from sofort.testing import FakeSofortApi
+from tests.test_sofort import (TRANSACTION_RESPONSE, TRANSACTION_BY_ID_RESPONSE,
+                               REFUNDS_RESPONSE, ROOT_ERROR)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+try:
+    import asyncio
+    import aiohttp
+    from sofort.aio import AsyncClient, notification_app
+    from sofort.testing_aio import FakeAsyncTransport
+except (ImportError, SyntaxError):
+    AsyncClient = None
+
+
+def returning(value):
+    def request_xml(config, data):
+        future = asyncio.Future()
+        future.set_result(value)
+        return future
+    return MagicMock(side_effect=request_xml)
+
+
+@unittest.skipIf(AsyncClient is None, 'asyncio and aiohttp are required')
+class TestAsyncClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = AsyncClient('user', 'key', '123', concurrency=5,
+            success_url='http://success.url',
+            abort_url='http://abort.url',
+            reasons=[sofort.TRANSACTION_ID])
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_sync(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def collect(self, generator):
+        results = []
+        while True:
+            try:
+                results.append(self.run_sync(generator.__anext__()))
+            except StopAsyncIteration:
+                return results
+
+    def test_payment(self):
+        self.client._request_xml = returning(TRANSACTION_RESPONSE)
+        tran = self.run_sync(self.client.payment(12))
+        self.assertEqual('123456-123456-56A3BE0E-ACAB', tran.transaction)
+
+    def test_details(self):
+        self.client._request_xml = returning(TRANSACTION_BY_ID_RESPONSE)
+        details = self.run_sync(
+            self.client.details('123456-123456-56A29EC6-066A'))
+        self.assertEqual('123456-123456-56A29EC6-066A', details[0].transaction)
+
+    def test_refunds(self):
+        self.client._request_xml = returning(REFUNDS_RESPONSE)
+        refunds = self.run_sync(self.client.refunds({}, []))
+        self.assertEqual('accepted', refunds.refund.status)
+
+    def test_errors(self):
+        self.client._request_xml = returning(ROOT_ERROR)
+        self.assertRaises(sofort.exceptions.RequestErrors, self.run_sync,
+                          self.client.details('123456-123456-56A29EC6-066A'))
+
+    def test_concurrent_calls(self):
+        self.client._request_xml = returning(TRANSACTION_BY_ID_RESPONSE)
+        results = self.run_sync(asyncio.gather(
+            *[self.client.details('123456-123456-56A29EC6-066A')
+              for _ in range(20)]))
+        self.assertEqual(20, len(results))
+
+    def test_details_bulk(self):
+        def request_xml(config, data):
+            future = asyncio.Future()
+            if b'bad' in data:
+                future.set_exception(KeyError('bad'))
+            else:
+                future.set_result(TRANSACTION_BY_ID_RESPONSE)
+            return future
+
+        self.client._request_xml = MagicMock(side_effect=request_xml)
+        ids = ['id-{0}'.format(i) for i in range(7)] + ['bad-id']
+        results = self.collect(self.client.details_bulk(ids, chunk_size=4))
+
+        self.assertEqual(2, len(results))
+        failed = [chunk for chunk in results if chunk.error]
+        self.assertEqual(1, len(failed))
+        self.assertIn('bad-id', failed[0].transaction_ids)
+
+    def test_fake_transport(self):
+        api = FakeSofortApi(latency=0.01, seed=1)
+        ids = api.generate(10)
+        client = AsyncClient(api.user_id, api.api_key, api.project_id,
+                             transport=FakeAsyncTransport(api))
+        results = self.run_sync(asyncio.gather(
+            *[client.details(transaction_id) for transaction_id in ids]))
+        self.assertEqual(ids, [details[0].transaction
+                               for details in results])
+        self.assertEqual(10, api.requests)
+
+    def test_circuit_trial_unexpected_error(self):
+        api = FakeSofortApi(seed=1)
+        ids = api.generate(1)
+        breaker = CircuitBreaker(window=1, min_calls=1, reset_timeout=0)
+        transport = FakeAsyncTransport(api)
+        client = AsyncClient(api.user_id, api.api_key, api.project_id,
+                             transport=transport, circuit_breaker=breaker)
+        breaker.record(False)
+        post = transport.post
+        transport.post = MagicMock(side_effect=ValueError)
+        self.assertRaises(ValueError, self.run_sync, client.details(ids[0]))
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+        transport.post = post
+        self.run_sync(client.details(ids[0]))
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_iter_transactions(self):
+        api = FakeSofortApi(seed=1)
+        to_time = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+        from_time = to_time - datetime.timedelta(days=40)
+        ids = api.generate(250, from_time, to_time)
+        client = AsyncClient(api.user_id, api.api_key, api.project_id,
+                             transport=FakeAsyncTransport(api))
+
+        found = self.collect(client.iter_transactions(from_time, to_time,
+                                                      page_size=500))
+        self.assertEqual(sorted(ids),
+                         sorted(details.transaction for details in found))
+
+        pages = self.collect(client._transaction_pages(
+            from_time, to_time, 100, decoder=columns.response))
+        self.assertEqual(250, sum(len(page) for page in pages))
+        self.assertIsInstance(pages[0], columns.TransactionColumns)
+
+    def test_sync_context_manager(self):
+        with self.assertRaises(TypeError):
+            with self.client:
+                pass
+        self.assertRaises(TypeError, self.client.details, 'id', stream=True)
+
+    def test_observers(self):
+        api = FakeSofortApi(seed=1)
+        ids = api.generate(3)
+        metrics = HistogramObserver()
+        client = AsyncClient(api.user_id, api.api_key, api.project_id,
+                             transport=FakeAsyncTransport(api),
+                             observers=[metrics])
+        self.run_sync(client.details(ids))
+        histogram = metrics.durations[('transaction_request', 'total')]
+        self.assertEqual(1, histogram.count)
+        self.assertEqual(1, metrics.sizes[('transaction_request',
+                                           'response')].count)
+
+    def test_concurrency_limit(self):
+        self.assertEqual(5, self.client.transport.concurrency)
+        self.assertEqual(self.client.config.pool_maxsize,
+                         self.client.transport.pool_maxsize)
+
+
+@unittest.skipIf(AsyncClient is None, 'asyncio and aiohttp are required')
+class TestNotificationApp(unittest.TestCase):
+    def call(self, app, messages):
+        sent = []
+
+        def receive():
+            future = asyncio.Future()
+            future.set_result(messages.pop(0))
+            return future
+
+        def send(message):
+            sent.append(message)
+            future = asyncio.Future()
+            future.set_result(None)
+            return future
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(app({'type': 'http', 'method': 'POST'},
+                                        receive, send))
+        finally:
+            loop.close()
+        return sent
+
+    def test_asgi(self):
+        receiver = NotificationReceiver(sofort.Client('user', 'key', '123'))
+        sent = self.call(notification_app(receiver), [
+            {'type': 'http.request', 'more_body': True,
+             'body': b'<status_notification><transaction>'},
+            {'type': 'http.request',
+             'body': b'123-ABC</transaction></status_notification>'},
+        ])
+        self.assertEqual(200, sent[0]['status'])
+        self.assertEqual(['123-ABC'], receiver.pending())
+
+    def test_asgi_too_large(self):
+        receiver = NotificationReceiver(sofort.Client('user', 'key', '123'))
+        chunk = {'type': 'http.request', 'more_body': True,
+                 'body': b' ' * (MAX_BODY_SIZE // 2 + 1)}
+        messages = [chunk, chunk, chunk]
+        sent = self.call(notification_app(receiver), messages)
+        self.assertEqual(413, sent[0]['status'])
+        # rest of the body is not read
+        self.assertEqual(1, len(messages))
+        self.assertEqual([], receiver.pending())
@@ -0,0 +1,63 @@
+import datetime
+import unittest
+
+import iso8601
+
+import sofort
+from sofort import columns
+from sofort.backfill import Backfill, raw_page
+from sofort.testing import FakeSofortApi, FakeTransport
+
+from tests.test_sofort import ROOT_ERROR, TRANSACTION_LIST_BY_SEARCH_PARAMS
+
+TO_TIME = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+FROM_TIME = TO_TIME - datetime.timedelta(days=40)
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeSofortApi(seed=1)
+        self.ids = self.api.generate(250, FROM_TIME, TO_TIME)
+        self.client = sofort.Client(self.api.user_id, self.api.api_key,
+                                    self.api.project_id,
+                                    transport=FakeTransport(self.api),
+                                    retry=None)
+
+    def test_raw_page(self):
+        page = raw_page(TRANSACTION_LIST_BY_SEARCH_PARAMS.encode('utf-8'))
+        self.assertEqual(3, len(page))
+        self.assertEqual(0, len(raw_page(b'<transactions />')))
+        self.assertRaises(sofort.exceptions.RequestErrors, raw_page,
+                          ROOT_ERROR.encode('utf-8'))
+
+    def test_run(self):
+        found = list(Backfill(self.client, processes=2).run(
+            FROM_TIME, TO_TIME, page_size=40))
+        self.assertEqual(self.ids, [details.transaction for details in found])
+        self.assertEqual(
+            [details.status for details in self.client.iter_transactions(
+                FROM_TIME, TO_TIME, page_size=40)],
+            [details.status for details in found])
+
+    def test_pages_with_decoder(self):
+        pages = list(Backfill(self.client, processes=2,
+                              decoder=columns.response).pages(
+            FROM_TIME, TO_TIME, page_size=100))
+        self.assertTrue(all(isinstance(page, columns.TransactionColumns)
+                            for page in pages))
+        self.assertEqual(self.ids, sum((page.transaction for page in pages),
+                                       []))
+
+    def test_backpressure(self):
+        pages = Backfill(self.client, processes=1, max_pending=1).pages(
+            FROM_TIME, TO_TIME, page_size=10)
+        next(pages)
+        requests = self.api.requests
+        self.assertLessEqual(requests, 4)
+        pages.close()
+        self.assertLessEqual(self.api.requests, requests + 1)
+
+    def test_fetch_error(self):
+        self.api.errors = {500: 1.0}
+        pages = Backfill(self.client, processes=1).pages(FROM_TIME, TO_TIME)
+        self.assertRaises(sofort.exceptions.ServerError, list, pages)
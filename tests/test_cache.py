@@ -0,0 +1,103 @@
+import unittest
+
+import sofort
+from sofort.cache import DetailsCache
+
+from tests.test_sofort import (TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_IDS_RESPONSE)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+
+class Details(object):
+    def __init__(self, transaction, status='received'):
+        self.transaction = transaction
+        self.status = status
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDetailsCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = DetailsCache(maxsize=2, ttl=100, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        details = Details('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set(details)
+        self.assertIs(details, self.cache.get('a'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_status_ttl(self):
+        self.cache.set(Details('final'))
+        self.cache.set(Details('open', 'pending'))
+        self.clock.now = 31
+        self.assertIsNone(self.cache.get('open'))
+        self.assertIsNotNone(self.cache.get('final'))
+        self.clock.now = 101
+        self.assertIsNone(self.cache.get('final'))
+
+    def test_lru_eviction(self):
+        self.cache.set(Details('a'))
+        self.cache.set(Details('b'))
+        self.cache.get('a')
+        self.cache.set(Details('c'))
+        self.assertEqual(2, len(self.cache))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_invalidate(self):
+        self.cache.set(Details('a'))
+        self.cache.set(Details('b'))
+        self.cache.invalidate('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.invalidate()
+        self.assertEqual(0, len(self.cache))
+
+
+class TestClientDetailsCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = DetailsCache()
+        self.client = sofort.Client('user', 'key', '123',
+                                    details_cache=self.cache)
+
+    def test_repeated_lookup(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_BY_ID_RESPONSE)
+        first = self.client.details('123456-123456-56A29EC6-066A')
+        second = self.client.details('123456-123456-56A29EC6-066A')
+        self.assertEqual(1, self.client._request_xml.call_count)
+        self.assertIs(first[0], second[0])
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1024},
+                         self.cache.stats())
+
+    def test_only_missing_ids_requested(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_BY_ID_RESPONSE)
+        self.client.details('123456-123456-56A29EC6-066A')
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_LIST_BY_IDS_RESPONSE)
+        found = self.client.details(['123456-123456-56A2A0C3-CA99',
+                                     '123456-123456-56A29EC6-066A'])
+        request = self.client._request_xml.call_args[0][1]
+        self.assertNotIn(b'56A29EC6', request)
+        self.assertEqual(['123456-123456-56A2A0C3-CA99',
+                          '123456-123456-56A29EC6-066A'],
+                         [details.transaction for details in found])
+
+    def test_unknown_transaction(self):
+        self.client._request_xml = MagicMock(return_value='<transactions />')
+        self.assertIsNone(self.client.details('unknown'))
+        self.assertIsNone(self.client.details(['unknown', 'other']))
+
+    def test_config_does_not_hold_cache(self):
+        self.assertFalse(self.client.config.has('details_cache'))
@@ -0,0 +1,155 @@
+import threading
+import time
+import unittest
+
+import sofort
+from sofort.coalesce import DetailsCoalescer
+
+from tests.test_sofort import (TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_IDS_RESPONSE)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+
+class Details(object):
+    def __init__(self, transaction):
+        self.transaction = transaction
+
+
+class BlockingFetch(object):
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, transaction_ids):
+        self.calls.append(list(transaction_ids))
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [Details(transaction_id) for transaction_id in transaction_ids
+                if not transaction_id.startswith('missing')]
+
+
+def run_threads(count, target):
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(5)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_shared_request(self):
+        coalescer = DetailsCoalescer()
+        fetch = BlockingFetch()
+        threads, results = run_threads(
+            5, lambda i: coalescer.details(['a', 'b'], fetch))
+        fetch.started.wait(5)
+        time.sleep(0.05)
+        fetch.release.set()
+        join(threads)
+
+        self.assertEqual([['a', 'b']], fetch.calls)
+        self.assertEqual({'requests': 1, 'shared': 4}, coalescer.stats())
+        for result in results:
+            self.assertEqual(['a', 'b'],
+                             [details.transaction for details in result])
+        self.assertIsNot(results[0], results[1])
+        self.assertIs(results[0][0], results[1][0])
+
+    def test_shared_error(self):
+        coalescer = DetailsCoalescer()
+        fetch = BlockingFetch(error=IOError('Connection reset'))
+        threads, results = run_threads(
+            3, lambda i: coalescer.details('a', fetch))
+        fetch.started.wait(5)
+        time.sleep(0.05)
+        fetch.release.set()
+        join(threads)
+
+        self.assertEqual(1, len(fetch.calls))
+        for result in results:
+            self.assertIsInstance(result, IOError)
+
+    def test_sequential_calls_are_not_shared(self):
+        coalescer = DetailsCoalescer()
+        fetch = BlockingFetch()
+        fetch.release.set()
+        coalescer.details('a', fetch)
+        coalescer.details('a', fetch)
+        self.assertEqual(2, len(fetch.calls))
+
+    def test_merge_window(self):
+        coalescer = DetailsCoalescer(merge_window=0.1)
+        fetch = BlockingFetch()
+        fetch.release.set()
+        ids = ['a', 'b', 'c', 'missing']
+        threads, results = run_threads(
+            4, lambda i: coalescer.details(ids[i], fetch))
+        join(threads)
+
+        self.assertEqual(1, len(fetch.calls))
+        self.assertEqual(sorted(ids), sorted(fetch.calls[0]))
+        for transaction_id, result in zip(ids, results):
+            if transaction_id == 'missing':
+                self.assertIsNone(result)
+            else:
+                self.assertEqual([transaction_id],
+                                 [details.transaction for details in result])
+
+    def test_max_batch(self):
+        coalescer = DetailsCoalescer(merge_window=0.1, max_batch=2)
+        fetch = BlockingFetch()
+        fetch.release.set()
+        threads, results = run_threads(
+            4, lambda i: coalescer.details('id-{0}'.format(i), fetch))
+        join(threads)
+
+        self.assertTrue(len(fetch.calls) >= 2)
+        self.assertTrue(all(len(call) <= 2 for call in fetch.calls))
+        self.assertEqual(['id-{0}'.format(i) for i in range(4)],
+                         [result[0].transaction for result in results])
+
+
+class TestClientCoalescing(unittest.TestCase):
+    def test_details(self):
+        client = sofort.Client('user', 'key', '123',
+                               coalescer=DetailsCoalescer(merge_window=0.05))
+        client._request_xml = MagicMock(
+            return_value=TRANSACTION_LIST_BY_IDS_RESPONSE)
+        ids = ['123456-123456-56A2A0C3-CA99', '123456-123456-56A29EC6-066A']
+        threads, results = run_threads(
+            2, lambda i: client.details(ids[i]))
+        join(threads)
+
+        self.assertEqual(1, client._request_xml.call_count)
+        self.assertEqual([[ids[0]], [ids[1]]],
+                         [[details.transaction for details in result]
+                          for result in results])
+
+    def test_empty_response(self):
+        client = sofort.Client('user', 'key', '123',
+                               coalescer=DetailsCoalescer())
+        client._request_xml = MagicMock(return_value='<transactions />')
+        self.assertIsNone(client.details('123456-123456-56A29EC6-066A'))
+        client._request_xml = MagicMock(
+            return_value=TRANSACTION_BY_ID_RESPONSE)
+        self.assertEqual(1, len(client.details('123456-123456-56A29EC6-066A')))
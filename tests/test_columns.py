@@ -0,0 +1,147 @@
+import datetime
+import unittest
+
+import iso8601
+
+import sofort
+from sofort import columns, model
+from sofort.testing import FakeSofortApi, FakeTransport
+
+from tests.test_sofort import (TRANSACTION_LIST_BY_SEARCH_PARAMS,
+                               TRANSACTION_RESPONSE)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def epoch_us(value):
+    delta = value - datetime.datetime(1970, 1, 1, tzinfo=iso8601.UTC)
+    return (delta.days * 86400 + delta.seconds) * 10 ** 6 + \
+        delta.microseconds
+
+
+class TestColumns(unittest.TestCase):
+    def setUp(self):
+        self.columns = columns.response(TRANSACTION_LIST_BY_SEARCH_PARAMS)
+        self.models = model.response(TRANSACTION_LIST_BY_SEARCH_PARAMS)
+
+    def test_same_values(self):
+        self.assertEqual(len(self.models), len(self.columns))
+        for row, details in enumerate(self.models):
+            self.assertEqual(details.transaction,
+                             self.columns.transaction[row])
+            self.assertEqual(details.project_id, self.columns.project_id[row])
+            self.assertEqual(details.test, bool(self.columns.test[row]))
+            self.assertEqual(int(details.amount * columns.AMOUNT_SCALE),
+                             self.columns.amount[row])
+            self.assertEqual(epoch_us(details.time), self.columns.time[row])
+            self.assertEqual(epoch_us(details.status_modified),
+                             self.columns.status_modified[row])
+            for name in columns.TransactionColumns.CATEGORICAL:
+                self.assertEqual(getattr(details, name),
+                                 getattr(self.columns, name)[row])
+
+    def test_categorical(self):
+        self.assertEqual(['untraceable'], self.columns.status.categories)
+        self.assertEqual([0, 0, 0], list(self.columns.status.codes))
+
+    def test_parse_amount(self):
+        self.assertEqual(1250, columns.parse_amount('12.5'))
+        self.assertEqual(1205, columns.parse_amount('12.05'))
+        self.assertEqual(1200, columns.parse_amount('12'))
+        self.assertEqual(-99, columns.parse_amount('-0.99'))
+        self.assertEqual(0, columns.parse_amount(None))
+
+    def test_parse_time(self):
+        self.assertEqual(0, columns.parse_time('1970-01-01T01:00:00+01:00'))
+        self.assertEqual(1500000, columns.parse_time('1970-01-01T00:00:01.5Z'))
+        self.assertEqual(columns.NAT, columns.parse_time(None))
+        self.assertRaises(ValueError, columns.parse_time, 'yesterday')
+
+    def test_extend(self):
+        combined = columns.TransactionColumns()
+        seen = set()
+        combined.extend(self.columns, seen)
+        combined.extend(self.columns, seen)
+        self.assertEqual(3, len(combined))
+        self.assertEqual(self.columns.transaction, combined.transaction)
+
+        combined.extend(self.columns)
+        self.assertEqual(6, len(combined))
+        self.assertEqual(['untraceable'], combined.status.categories)
+        self.assertEqual(list(self.columns.amount) * 2, list(combined.amount))
+
+    def test_sum_by(self):
+        total = sum(self.columns.amount)
+        self.assertEqual({'untraceable': total},
+                         self.columns.sum_by('status'))
+        by_day = self.columns.sum_by('day')
+        self.assertEqual(total, sum(by_day.values()))
+        self.assertTrue(all(isinstance(day, datetime.date) for day in by_day))
+
+    def test_other_roots(self):
+        self.assertIsInstance(columns.response(TRANSACTION_RESPONSE),
+                              model.NewTransactionModel)
+        self.assertEqual(0, len(columns.response('<transactions />')))
+
+    def test_fetch(self):
+        api = FakeSofortApi(seed=1)
+        to_time = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+        ids = api.generate(250, to_time - datetime.timedelta(days=10),
+                           to_time)
+        client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                               transport=FakeTransport(api))
+
+        found = columns.fetch(client, to_time - datetime.timedelta(days=20),
+                              to_time, page_size=100)
+        self.assertEqual(ids, found.transaction)
+        self.assertEqual(sorted(set(found.status.categories)),
+                         sorted(found.status.categories))
+        self.assertEqual(sum(found.amount),
+                         sum(found.sum_by('status').values()))
+
+    def test_fetch_empty_pages(self):
+        api = FakeSofortApi(seed=1)
+        to_time = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+        ids = api.generate(3, to_time - datetime.timedelta(days=5), to_time)
+        client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                               transport=FakeTransport(api))
+
+        # first 29 day window is empty, last page of the second one full
+        found = columns.fetch(client, to_time - datetime.timedelta(days=40),
+                              to_time, page_size=3)
+        self.assertEqual(ids, found.transaction)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_to_numpy(self):
+        data = self.columns.to_numpy()
+        self.assertEqual('datetime64[us]', str(data['time'].dtype))
+        self.assertEqual(list(self.columns.amount), data['amount'].tolist())
+        self.assertEqual(['untraceable'], list(data['status_categories']))
+
+    @unittest.skipIf(pandas is None, 'requires pandas')
+    def test_to_pandas(self):
+        frame = self.columns.to_pandas()
+        self.assertEqual(3, len(frame))
+        self.assertEqual('category', str(frame.status.dtype))
+        self.assertEqual(sum(self.columns.amount),
+                         frame.groupby('status').amount.sum()['untraceable'])
+
+    @unittest.skipIf(pyarrow is None, 'requires pyarrow')
+    def test_to_arrow(self):
+        table = self.columns.to_arrow()
+        self.assertEqual(3, table.num_rows)
+        self.assertEqual(list(self.columns.amount),
+                         table.column('amount').to_pylist())
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import sofort
+from sofort import compact, fastmodel, model
+
+from tests.test_sofort import (TRANSACTION_RESPONSE, TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_IDS_RESPONSE,
+                               TRANSACTION_LIST_BY_SEARCH_PARAMS, ROOT_ERRORS)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+
+class TestCompact(unittest.TestCase):
+    def assertSameFields(self, expected, actual):
+        if isinstance(actual, tuple) and \
+                not isinstance(actual, compact.CompactRecord):
+            self.assertEqual(len(expected), len(actual))
+            for expected_item, actual_item in zip(expected, actual):
+                self.assertSameFields(expected_item, actual_item)
+        elif isinstance(actual, compact.CompactRecord):
+            for name, _ in actual.fields:
+                self.assertSameFields(getattr(expected, name),
+                                      getattr(actual, name))
+        else:
+            self.assertEqual(expected, actual)
+
+    def test_same_fields(self):
+        for xml in (TRANSACTION_BY_ID_RESPONSE,
+                    TRANSACTION_LIST_BY_IDS_RESPONSE,
+                    TRANSACTION_LIST_BY_SEARCH_PARAMS):
+            expected = model.response(xml)
+            actual = compact.response(xml)
+            self.assertEqual(len(expected), len(actual))
+            for expected_item, actual_item in zip(expected, actual):
+                self.assertSameFields(expected_item, actual_item)
+
+    def test_immutable(self):
+        details = compact.response(TRANSACTION_BY_ID_RESPONSE)[0]
+        self.assertRaises(AttributeError, setattr, details, 'status',
+                          'received')
+        self.assertRaises(AttributeError, setattr, details, 'unknown', 1)
+        self.assertIsInstance(details.reasons, tuple)
+
+        changed = details._replace(status='received')
+        self.assertEqual('received', changed.status)
+        self.assertEqual('untraceable', details.status)
+        self.assertIsInstance(changed, compact.TransactionDetails)
+
+    def test_shared_values(self):
+        found = compact.response(TRANSACTION_LIST_BY_SEARCH_PARAMS)
+        self.assertIs(found[0].recipient, found[1].recipient)
+        self.assertIs(found[0].time, found[0].status_modified)
+        self.assertIs(found[0].status_history_items[0].time, found[0].time)
+
+        other = compact.response(TRANSACTION_BY_ID_RESPONSE)[0]
+        self.assertIs(found[0].status, other.status)
+        self.assertIs(found[0].currency_code, other.currency_code)
+
+    def test_interner(self):
+        interner = compact.Interner(maxsize=1)
+        first = u''.join([u'E', u'UR'])
+        self.assertIs(first, interner(first))
+        self.assertIs(first, interner(u''.join([u'EU', u'R'])))
+        second = u''.join([u'C', u'HF'])
+        self.assertIs(second, interner(second))
+        self.assertEqual(1, len(interner))
+        self.assertIsNone(interner(None))
+
+    def test_other_roots(self):
+        self.assertIsInstance(compact.response(TRANSACTION_RESPONSE),
+                              fastmodel.NewTransaction)
+        self.assertIsNone(compact.response('<transactions />'))
+        self.assertRaises(sofort.exceptions.RequestErrors,
+                          compact.response, ROOT_ERRORS)
+
+    def test_client_decoder(self):
+        client = sofort.Client('user', 'key', '123',
+                               decoder=compact.response)
+        client._request_xml = MagicMock(
+            return_value=TRANSACTION_LIST_BY_SEARCH_PARAMS)
+        found = client.find_transactions()
+        self.assertEqual(['untraceable'] * 3,
+                         [details.status for details in found])
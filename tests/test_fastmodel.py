@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import warnings
+
+import sofort
+from sofort import fastmodel, model
+
+from tests.test_sofort import (TRANSACTION_RESPONSE, TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_IDS_RESPONSE,
+                               TRANSACTION_LIST_BY_SEARCH_PARAMS,
+                               REFUNDS_RESPONSE, ROOT_ERRORS, NEST_ERRORS,
+                               EXTRA_WARNING)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+
+def decode_both(xml):
+    xml = xml.encode('utf-8')
+    return model.response(xml), fastmodel.response(xml)
+
+
+class TestFastModel(unittest.TestCase):
+    def assertSameFields(self, expected, actual):
+        if isinstance(expected, list):
+            self.assertEqual(len(expected), len(actual))
+            for expected_item, actual_item in zip(expected, actual):
+                self.assertSameFields(expected_item, actual_item)
+        elif isinstance(actual, fastmodel.Record):
+            for name, _ in actual.fields:
+                self.assertSameFields(getattr(expected, name),
+                                      getattr(actual, name))
+        else:
+            self.assertEqual(expected, actual)
+
+    def test_transactions(self):
+        for xml in (TRANSACTION_BY_ID_RESPONSE,
+                    TRANSACTION_LIST_BY_IDS_RESPONSE,
+                    TRANSACTION_LIST_BY_SEARCH_PARAMS):
+            self.assertSameFields(*decode_both(xml))
+
+    def test_new_transaction(self):
+        self.assertSameFields(*decode_both(TRANSACTION_RESPONSE))
+
+    def test_refunds(self):
+        self.assertSameFields(*decode_both(REFUNDS_RESPONSE))
+
+    def test_field_types(self):
+        details = fastmodel.response(
+            TRANSACTION_BY_ID_RESPONSE.encode('utf-8'))[0]
+        self.assertEqual(u'李四', details.sender.holder)
+        self.assertEqual(['test'], details.user_variables)
+        self.assertIsNone(details.email_customer)
+        self.assertIs(True, details.test)
+        self.assertIs(False, details.su.consumer_protection)
+        self.assertEqual(123456, details.project_id)
+
+    def test_errors(self):
+        for xml in (ROOT_ERRORS, NEST_ERRORS):
+            with self.assertRaises(sofort.exceptions.RequestErrors) as expected:
+                model.response(xml)
+            with self.assertRaises(sofort.exceptions.RequestErrors) as actual:
+                fastmodel.response(xml)
+            self.assertEqual(str(expected.exception), str(actual.exception))
+            self.assertEqual(
+                [error.code for error in expected.exception.errors],
+                [error.code for error in actual.exception.errors])
+
+    def test_warning(self):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            fastmodel.response(EXTRA_WARNING)
+        self.assertEqual(1, len(w))
+        self.assertEqual('[8049] language_code: Unsupported language.',
+                         str(w[0].message))
+
+    def test_empty_response(self):
+        self.assertIsNone(fastmodel.response('<transaction />'))
+
+    def test_client_decoder(self):
+        client = sofort.Client('user', 'key', '123',
+                               decoder=fastmodel.response)
+        client._request_xml = MagicMock(return_value=TRANSACTION_BY_ID_RESPONSE)
+        details = client.details('123456-123456-56A29EC6-066A')
+        self.assertIsInstance(details[0], fastmodel.TransactionDetails)
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import datetime
+import pickle
+import sys
 import unittest
 
-from sofort.internals import Config, strip_reason
+from sofort.internals import (Config, LazyModule, strip_reason, strip_reasons,
+                              chunks, time_windows, prefetch)
 
 class TestSofortConfig(unittest.TestCase):
     def test_init(self):
@@ -32,6 +37,94 @@ class TestSofortConfig(unittest.TestCase):
         b.chips['Lays'] = 'salt'
         self.assertNotEqual(a.chips['Lays'], b.chips['Lays'])
 
+    def test_clone_shares_frozen_values(self):
+        a = Config(urls={'default': 'http://a'}, reasons=['x'])
+        b = a.clone()
+        c = a.clone()
+        self.assertTrue(b.shares(c))
+        self.assertEqual(set(), b.overridden())
+        b.update({'amount': 1})
+        self.assertEqual(set(['amount']), b.overridden())
+        self.assertFalse(c.has('amount'))
+
+    def test_clone_copy_on_access(self):
+        a = Config(urls={'default': 'http://a'})
+        b = a.clone()
+        b.urls['loss'] = 'http://b'
+        self.assertEqual({'default': 'http://a'}, a.urls)
+        self.assertEqual({'default': 'http://a'}, a.clone().urls)
+        self.assertEqual(set(['urls']), b.overridden())
+
+    def test_clone_detaches_read_values(self):
+        a = Config(array=[1])
+        array = a.array
+        a.clone()
+        array.append(9)
+        self.assertEqual([1], a.array)
+        a.array.append(2)
+        self.assertEqual([1, 2], a.array)
+
+    def test_copy_and_pickle(self):
+        a = Config(array=[1], bunny='hope')
+        a.clone()
+        a.update({'white': 'stripes'})
+        copies = [copy.copy(a), copy.deepcopy(a),
+                  pickle.loads(pickle.dumps(a)),
+                  pickle.loads(pickle.dumps(a, pickle.HIGHEST_PROTOCOL))]
+        for b in copies:
+            self.assertEqual([1], b.array)
+            self.assertEqual('hope', b.bunny)
+            self.assertEqual('stripes', b.white)
+            b.update({'bunny': 'bugz'})
+            self.assertEqual('hope', a.bunny)
+
+        frozen = copy.deepcopy(a.clone().freeze())
+        self.assertEqual('stripes', frozen.white)
+        self.assertRaises(AttributeError, frozen.update, {'white': 'x'})
+
+    def test_clone_after_update(self):
+        a = Config(bunny='hope')
+        b = a.clone()
+        a.update({'bunny': 'bugz'})
+        c = a.clone()
+        self.assertEqual('hope', b.bunny)
+        self.assertEqual('bugz', c.bunny)
+        self.assertFalse(b.shares(c))
+
+    def test_freeze(self):
+        a = Config(urls={'default': 'http://a'}, bunny='hope')
+        a.update({'white': 'stripes'})
+        self.assertIs(a, a.freeze())
+        self.assertEqual(set(), a.overridden())
+        self.assertIs(a.urls, a.urls)
+        self.assertRaises(TypeError, a.urls.__setitem__, 'loss', 'http://b')
+        self.assertRaises(TypeError, a.urls.update, {'loss': 'http://b'})
+        self.assertEqual({'default': 'http://a'}, a.urls)
+        self.assertEqual(set(), a.overridden())
+        self.assertRaises(AttributeError, a.update, {'bunny': 'bugz'})
+        self.assertRaises(AttributeError, setattr, a, 'bunny', 'bugz')
+
+        b = a.clone()
+        self.assertTrue(b.shares(a))
+        b.update({'bunny': 'bugz'})
+        self.assertEqual('bugz', b.bunny)
+        self.assertEqual('hope', a.bunny)
+        b.urls['loss'] = 'http://b'
+        self.assertEqual({'default': 'http://a', 'loss': 'http://b'}, b.urls)
+        self.assertEqual({'default': 'http://a'}, a.urls)
+
+        c = Config(items=[{'a': 1}], tags=set(['x'])).freeze()
+        self.assertEqual(({'a': 1},), c.items)
+        self.assertRaises(TypeError, c.items[0].__setitem__, 'a', 2)
+        self.assertEqual(frozenset(['x']), c.tags)
+        self.assertEqual({'a': 1}, copy.deepcopy(c.items[0]))
+
+    def test_missing_attribute(self):
+        c = Config(a=1)
+        self.assertRaises(AttributeError, getattr, c, 'b')
+        self.assertIsNone(getattr(c.clone(), 'b', None))
+        self.assertFalse(c.has('b'))
+
     def test_update(self):
         c = Config(bunny='hope', white='stripes')
 
@@ -47,4 +140,63 @@ class TestSofortConfig(unittest.TestCase):
     def test_prepare_reason(self):
         self.assertEqual(u'Invoice 001', strip_reason(u'Invoice (:#001:)'))
         self.assertEqual(u'aezAEZ091+-.,', strip_reason(u'aezAEZ091+-.,'))
-        self.assertEqual(u'üöäÄÜÖß', strip_reason(u'|üöäÄÜÖß|'))
+        self.assertEqual(u'ueoeaeAeUeOess', strip_reason(u'|üöäÄÜÖß|'))
+
+    def test_strip_reason_transliteration(self):
+        self.assertEqual(u'Cafe Creme, Mueller + Soehne',
+                         strip_reason(u'Café Crème, Müller & Söhne', None))
+        self.assertEqual(u'Invoice1 2', strip_reason(u'Invoice_1\t2'))
+        self.assertEqual(u'Rechnung', strip_reason(b'Rechnung'))
+
+    def test_strip_reason_length(self):
+        self.assertEqual(u'Invoice 0001 for Mueller +', strip_reason(
+            u'Invoice 0001 for Müller + Söhne GmbH'))
+        self.assertEqual(u'Order 12345 -TRANSACTION-', strip_reason(
+            u'Order 12345 -TRANSACTION-'))
+        self.assertEqual(u'Order for customer 12', strip_reason(
+            u'Order for customer 12 -TRANSACTION-'))
+        self.assertEqual(u'x' * 40, strip_reason(u'x' * 40, None))
+
+    def test_strip_reasons(self):
+        self.assertEqual([u'Invoice 1', u'Invoice 1', u'Strasse'],
+                         strip_reasons([u'Invoice 1', u'Invoice #1',
+                                        u'Stra\xdfe']))
+
+    def test_time_windows(self):
+        day = datetime.timedelta(days=1)
+        start = datetime.datetime(2016, 1, 1)
+        self.assertEqual(
+            [(start, start + 10 * day), (start + 10 * day, start + 20 * day),
+             (start + 20 * day, start + 25 * day)],
+            list(time_windows(start, start + 25 * day, 10 * day)))
+        self.assertEqual([], list(time_windows(start, start, day)))
+
+    def test_prefetch(self):
+        self.assertEqual([0, 1, 2], list(prefetch(range(3))))
+        self.assertEqual([], list(prefetch([])))
+
+    def test_prefetch_error(self):
+        def failing():
+            yield 1
+            raise KeyError('failure')
+        items = prefetch(failing())
+        self.assertEqual(1, next(items))
+        self.assertRaises(KeyError, next, items)
+
+    def test_chunks(self):
+        self.assertEqual([[0, 1], [2, 3], [4]], list(chunks(range(5), 2)))
+        self.assertEqual([], list(chunks([], 2)))
+
+    def test_lazy_module(self):
+        missing = LazyModule('sofort.no_such_module')
+        self.assertRaises(ImportError, getattr, missing, 'anything')
+
+        module = LazyModule('json.tool')
+        main = module.main
+        self.assertIs(sys.modules['json.tool'].main, main)
+        self.assertRaises(AttributeError, getattr, module, 'unknown')
+
+        module.patched = True
+        self.assertTrue(sys.modules['json.tool'].patched)
+        del module.patched
+        self.assertFalse(hasattr(sys.modules['json.tool'], 'patched'))
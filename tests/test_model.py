@@ -0,0 +1,73 @@
+import unittest
+
+import sofort
+from sofort import model
+
+from tests.test_sofort import (TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_SEARCH_PARAMS,
+                               TRANSACTION_RESPONSE, ROOT_ERROR)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock, patch
+else:
+    from mock import MagicMock, patch
+
+
+class TestLazyModel(unittest.TestCase):
+    def assertSameFields(self, expected, actual):
+        if isinstance(expected, list):
+            self.assertEqual(len(expected), len(actual))
+            for expected_item, actual_item in zip(expected, actual):
+                self.assertSameFields(expected_item, actual_item)
+        elif isinstance(actual, model.LazyModel):
+            for name in actual.model_class._fields:
+                self.assertSameFields(getattr(expected, name),
+                                      getattr(actual, name))
+        else:
+            self.assertEqual(expected, actual)
+
+    def test_same_fields(self):
+        for xml in (TRANSACTION_BY_ID_RESPONSE,
+                    TRANSACTION_LIST_BY_SEARCH_PARAMS):
+            self.assertSameFields(model.response(xml),
+                                  model.lazy_response(xml))
+
+    def test_decodes_on_access(self):
+        details = model.lazy_response(TRANSACTION_BY_ID_RESPONSE)[0]
+        to_native = model.Iso8601DateTimeType.to_native
+        with patch.object(model.Iso8601DateTimeType, 'to_native',
+                          autospec=True, side_effect=to_native) as parse:
+            self.assertEqual('untraceable', details.status)
+            self.assertEqual(0, parse.call_count)
+            details.time
+            details.time
+            self.assertEqual(1, parse.call_count)
+
+    def test_assignment(self):
+        details = model.lazy_response(TRANSACTION_BY_ID_RESPONSE)[0]
+        details.status = 'received'
+        self.assertEqual('received', details.status)
+        self.assertRaises(AttributeError, setattr, details, 'unknown', 1)
+        self.assertRaises(AttributeError, getattr, details, 'unknown')
+
+    def test_to_model(self):
+        details = model.lazy_response(TRANSACTION_BY_ID_RESPONSE)[0]
+        full = details.to_model()
+        self.assertIsInstance(full, model.TransactionDetailsModel)
+        self.assertEqual(details.status_modified, full.status_modified)
+
+    def test_other_roots(self):
+        transaction = model.lazy_response(TRANSACTION_RESPONSE)
+        self.assertIsInstance(transaction, model.NewTransactionModel)
+        self.assertIsNone(model.lazy_response('<transactions />'))
+        self.assertRaises(sofort.exceptions.RequestErrors,
+                          model.lazy_response, ROOT_ERROR)
+
+    def test_client_decoder(self):
+        client = sofort.Client('user', 'key', '123',
+                               decoder=model.lazy_response)
+        client._request_xml = MagicMock(
+            return_value=TRANSACTION_LIST_BY_SEARCH_PARAMS)
+        found = client.find_transactions()
+        self.assertEqual(['untraceable'] * 3,
+                         [details.status for details in found])
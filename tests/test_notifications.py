@@ -0,0 +1,153 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import sofort
+from sofort.cache import DetailsCache
+from sofort.notifications import (MAX_BODY_SIZE, NotificationReceiver,
+                                  parse_notification)
+
+from tests.test_sofort import (TRANSACTION_LIST_BY_IDS_RESPONSE,
+                               ROOT_ERROR)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock, patch
+else:
+    from mock import MagicMock, patch
+
+NOTIFICATION = b"""<?xml version="1.0" encoding="UTF-8" ?>
+<status_notification>
+    <transaction>{0}</transaction>
+    <time>2016-01-22T22:28:14+01:00</time>
+</status_notification>
+"""
+
+FIRST = '123456-123456-56A29EC6-066A'
+SECOND = '123456-123456-56A2A0C3-CA99'
+
+
+def notification(transaction_id):
+    return NOTIFICATION.replace(b'{0}', transaction_id.encode('ascii'))
+
+
+class TestNotificationReceiver(unittest.TestCase):
+    def setUp(self):
+        self.client = sofort.Client('user', 'key', '123')
+        self.client._request_xml = MagicMock(
+            return_value=TRANSACTION_LIST_BY_IDS_RESPONSE)
+        self.receiver = NotificationReceiver(self.client, window=0.05)
+        self.received = []
+        self.receiver.subscribe(self.received.append)
+
+    def test_parse_notification(self):
+        parsed = parse_notification(notification(FIRST))
+        self.assertEqual(FIRST, parsed.transaction)
+        self.assertEqual(2016, parsed.time.year)
+        self.assertRaises(ValueError, parse_notification, b'<errors />')
+
+    def test_external_entity(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'secret.txt')
+        with open(path, 'w') as f:
+            f.write('SECRETVALUE')
+        body = ('<!DOCTYPE r [<!ENTITY x SYSTEM "file://{0}">]>'
+                '<status_notification><transaction>&x;</transaction>'
+                '</status_notification>').format(path).encode('ascii')
+        self.assertRaises(ValueError, parse_notification, body)
+
+    def test_body_size(self):
+        body = notification(FIRST)
+        body = body.replace(b'<time>', b' ' * MAX_BODY_SIZE + b'<time>')
+        self.assertRaises(ValueError, parse_notification, body)
+
+    def test_coalescing(self):
+        for transaction_id in (FIRST, SECOND, FIRST, FIRST):
+            self.receiver.receive(notification(transaction_id))
+        self.assertEqual([FIRST, SECOND], self.receiver.pending())
+
+        self.receiver.flush()
+        self.assertEqual(1, self.client._request_xml.call_count)
+        self.assertEqual([FIRST, SECOND],
+                         [details.transaction for details in self.received])
+        self.assertEqual([], self.receiver.pending())
+
+    def test_failing_subscriber(self):
+        self.receiver.callbacks.insert(0, MagicMock(side_effect=ValueError))
+        self.receiver.max_batch = 1
+        self.receiver.add(FIRST)
+        self.receiver.add(SECOND)
+        with patch('sofort.notifications.logger') as logger:
+            self.receiver.flush()
+        self.assertEqual(2, self.client._request_xml.call_count)
+        self.assertEqual(4, len(self.received))
+        self.assertEqual(4, logger.exception.call_count)
+
+    def test_max_batch(self):
+        self.receiver.max_batch = 1
+        self.receiver.add(FIRST)
+        self.receiver.add(SECOND)
+        self.receiver.flush()
+        self.assertEqual(2, self.client._request_xml.call_count)
+
+    def test_failed_lookup_requeued(self):
+        self.client._request_xml = MagicMock(return_value=ROOT_ERROR)
+        self.receiver.add(FIRST)
+        self.assertRaises(sofort.exceptions.RequestErrors, self.receiver.flush)
+        self.assertEqual([FIRST], self.receiver.pending())
+
+    def test_on_error(self):
+        errors = []
+        self.receiver.on_error = lambda ids, error: errors.append(ids)
+        self.client._request_xml = MagicMock(return_value=ROOT_ERROR)
+        self.receiver.add(FIRST)
+        self.receiver.flush()
+        self.assertEqual([[FIRST]], errors)
+        self.assertEqual([], self.receiver.pending())
+
+    def test_cache_invalidated(self):
+        self.client.details_cache = DetailsCache()
+        self.client.details(FIRST)
+        self.assertEqual(2, len(self.client.details_cache))
+        self.receiver.add(FIRST)
+        self.assertEqual(1, len(self.client.details_cache))
+
+    def test_background_flush(self):
+        with self.receiver:
+            self.receiver.add(FIRST)
+            for _ in range(100):
+                if self.received:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(2, len(self.received))
+
+    def test_wsgi(self):
+        body = notification(FIRST)
+        start_response = MagicMock()
+        result = self.receiver({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }, start_response)
+        self.assertEqual([b'OK'], result)
+        self.assertEqual('200 OK', start_response.call_args[0][0])
+        self.assertEqual([FIRST], self.receiver.pending())
+
+        self.receiver({'REQUEST_METHOD': 'POST', 'CONTENT_LENGTH': '3',
+                       'wsgi.input': io.BytesIO(b'<x>')}, start_response)
+        self.assertEqual('400 Bad Request', start_response.call_args[0][0])
+
+        body = b' ' * (MAX_BODY_SIZE + 1)
+        self.receiver({'REQUEST_METHOD': 'POST',
+                       'CONTENT_LENGTH': str(len(body)),
+                       'wsgi.input': io.BytesIO(body)}, start_response)
+        self.assertEqual('413 Request Entity Too Large',
+                         start_response.call_args[0][0])
+        self.assertEqual([FIRST], self.receiver.pending())
+
+        self.receiver({'REQUEST_METHOD': 'GET'}, start_response)
+        self.assertEqual('405 Method Not Allowed',
+                         start_response.call_args[0][0])
@@ -0,0 +1,196 @@
+import logging
+import unittest
+
+import sofort
+from sofort.observers import (HistogramObserver, Observer, TracingObserver,
+                              request_kind)
+from sofort.testing import (CONNECTION_ERROR, FakeServer, FakeSofortApi,
+                            FakeTransport)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+HOOKS = ['request_built', 'request_sent', 'first_byte', 'response_received',
+         'response_parsed', 'request_failed']
+
+
+class RecordingObserver(Observer):
+    def __init__(self):
+        self.calls = []
+        self.event = None
+
+    def __getattribute__(self, name):
+        if name in HOOKS:
+            def hook(event):
+                self.calls.append(name)
+                self.event = event
+            return hook
+        return object.__getattribute__(self, name)
+
+
+class FailingObserver(Observer):
+    def request_built(self, event):
+        raise ValueError('broken observer')
+
+
+class FakeSpan(object):
+    def __init__(self, name, start_time):
+        self.name = name
+        self.start_time = start_time
+        self.end_time = None
+        self.events = []
+        self.attributes = {}
+        self.exceptions = []
+
+    def set_attribute(self, name, value):
+        self.attributes[name] = value
+
+    def add_event(self, name, timestamp):
+        self.events.append(name)
+
+    def record_exception(self, error):
+        self.exceptions.append(error)
+
+    def end(self, end_time):
+        self.end_time = end_time
+
+
+class FakeTracer(object):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time):
+        span = FakeSpan(name, start_time)
+        self.spans.append(span)
+        return span
+
+
+class TestObservers(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeSofortApi(seed=1)
+        self.ids = self.api.generate(5)
+        self.observer = RecordingObserver()
+        self.client = self.create_client(FakeTransport(self.api))
+
+    def create_client(self, transport=None, observers=None, **kwargs):
+        return sofort.Client(self.api.user_id, self.api.api_key,
+                             self.api.project_id, transport=transport,
+                             observers=observers or [self.observer],
+                             success_url='http://success.url',
+                             abort_url='http://abort.url',
+                             reasons=['Invoice 52'], **kwargs)
+
+    def test_request_kind(self):
+        self.assertEqual('multipay', request_kind(b'<multipay><a/>'))
+        self.assertEqual('refunds', request_kind(
+            b'<?xml version="1.0"?>\n<refunds version="3"/>'))
+        self.assertIsNone(request_kind(b'garbage'))
+
+    def test_hooks(self):
+        self.client.payment(12)
+        self.assertEqual(HOOKS[:-1], self.observer.calls)
+
+        event = self.observer.event
+        self.assertEqual('multipay', event.kind)
+        self.assertEqual(200, event.status)
+        self.assertEqual(1, event.attempts)
+        self.assertTrue(event.request_size > 0)
+        self.assertTrue(event.response_size > 0)
+        self.assertEqual(set(['build', 'connect', 'server', 'download',
+                              'parse']), set(event.phases()))
+        self.assertTrue(event.started <= event.built <= event.sent <=
+                        event.first_byte <= event.received <= event.parsed)
+
+    def test_http(self):
+        with FakeServer(self.api) as server:
+            client = self.create_client(base_url=server.url)
+            try:
+                client.details(self.ids)
+            finally:
+                client.close()
+        event = self.observer.event
+        self.assertEqual('transaction_request', event.kind)
+        self.assertTrue(event.duration('sent', 'first_byte') >= 0)
+        self.assertTrue(event.duration('built', 'sent') >= 0)
+
+    def test_request_errors(self):
+        self.assertRaises(sofort.exceptions.RequestErrors,
+                          self.client.payment, -1)
+        self.assertEqual('request_failed', self.observer.calls[-1])
+        self.assertIsInstance(self.observer.event.error,
+                              sofort.exceptions.RequestErrors)
+
+    def test_connection_errors(self):
+        self.api.errors = {CONNECTION_ERROR: 1.0}
+        client = self.create_client(FakeTransport(self.api), retry=None)
+        self.assertRaises(client.transport.errors, client.details, 'id')
+        self.assertEqual(['request_built', 'request_failed'],
+                         self.observer.calls)
+
+    def test_stream(self):
+        found = list(self.client.details(self.ids, stream=True))
+        self.assertEqual(5, len(found))
+        self.assertEqual(HOOKS[:-1], self.observer.calls)
+
+    def test_failing_observer(self):
+        logging.disable(logging.CRITICAL)
+        try:
+            client = self.create_client(
+                FakeTransport(self.api),
+                observers=[FailingObserver(), self.observer])
+            self.assertEqual(5, len(client.details(self.ids)))
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertEqual(HOOKS[:-1], self.observer.calls)
+
+    def test_without_observers(self):
+        transport = FakeTransport(self.api)
+        transport.post = MagicMock(side_effect=transport.post)
+        client = sofort.Client(self.api.user_id, self.api.api_key,
+                               self.api.project_id, transport=transport)
+        client.details(self.ids)
+        self.assertFalse(transport.post.call_args[1]['stream'])
+
+    def test_histograms(self):
+        metrics = HistogramObserver()
+        client = self.create_client(FakeTransport(self.api),
+                                    observers=[metrics])
+        client.details(self.ids)
+        client.details(self.ids[0])
+        self.assertRaises(sofort.exceptions.RequestErrors,
+                          client.payment, -1)
+
+        histogram = metrics.durations[('transaction_request', 'total')]
+        self.assertEqual(2, histogram.count)
+        self.assertEqual(2, histogram.cumulative()[-1][1])
+
+        text = metrics.render()
+        self.assertIn('# TYPE sofort_request_duration_seconds histogram',
+                      text)
+        self.assertIn('sofort_request_duration_seconds_count'
+                      '{kind="transaction_request",phase="parse"} 2', text)
+        self.assertIn('sofort_payload_size_bytes_bucket'
+                      '{kind="transaction_request",direction="request",'
+                      'le="+Inf"} 2', text)
+        self.assertIn('sofort_request_errors_total'
+                      '{kind="multipay",error="RequestErrors"} 1', text)
+
+    def test_tracing(self):
+        tracer = FakeTracer()
+        client = self.create_client(FakeTransport(self.api),
+                                    observers=[TracingObserver(tracer)])
+        client.details(self.ids)
+        self.assertRaises(sofort.exceptions.RequestErrors,
+                          client.payment, -1)
+
+        ok, failed = tracer.spans
+        self.assertEqual('sofort.transaction_request', ok.name)
+        self.assertEqual(['built', 'sent', 'first_byte', 'received',
+                          'parsed'], ok.events)
+        self.assertEqual(200, ok.attributes['sofort.status'])
+        self.assertTrue(ok.start_time <= ok.end_time)
+        self.assertEqual('sofort.multipay', failed.name)
+        self.assertEqual(1, len(failed.exceptions))
+        self.assertTrue(failed.attributes['error'])
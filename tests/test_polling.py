@@ -0,0 +1,233 @@
+import calendar
+import datetime
+import threading
+import unittest
+
+import iso8601
+
+import sofort
+from sofort.cache import DetailsCache
+from sofort.polling import StatusPoller
+from sofort.testing import FakeSofortApi, FakeTransport
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock, patch
+else:
+    from mock import MagicMock, patch
+
+PENDING = [('pending', 'not_credited_yet')]
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestStatusPoller(unittest.TestCase):
+    def setUp(self):
+        created = datetime.datetime.now(iso8601.UTC).replace(microsecond=0)
+        self.api = FakeSofortApi(seed=1)
+        self.transaction_ids = self.api.generate(
+            5, from_time=created, to_time=created, statuses=PENDING)
+        self.client = sofort.Client(self.api.user_id, self.api.api_key,
+                                    self.api.project_id,
+                                    transport=FakeTransport(self.api))
+        self.clock = Clock(calendar.timegm(created.utctimetuple()))
+        self.poller = StatusPoller(self.client, clock=self.clock, lead=0)
+        self.changes = []
+        self.poller.subscribe(self.changes.append)
+
+    def advance(self, seconds):
+        self.clock.now += seconds
+        return self.poller.tick()
+
+    def test_batched_first_check(self):
+        for transaction_id in self.transaction_ids:
+            self.poller.track(transaction_id)
+        self.assertEqual(self.transaction_ids, self.poller.due())
+
+        changes = self.poller.tick()
+        self.assertEqual(1, self.api.requests)
+        self.assertEqual(changes, self.changes)
+        self.assertEqual(self.transaction_ids,
+                         [change.transaction for change in changes])
+        self.assertEqual([(None, 'pending')] * 5,
+                         [(change.previous, change.status)
+                          for change in changes])
+        self.assertEqual(60, self.poller.next_due())
+
+    def test_max_batch(self):
+        self.poller.max_batch = 2
+        for transaction_id in self.transaction_ids:
+            self.poller.track(transaction_id)
+        self.poller.tick()
+        self.assertEqual(3, self.api.requests)
+        self.assertEqual(5, len(self.changes))
+
+    def test_lead(self):
+        self.poller.lead = 100
+        self.poller.max_batch = 3
+        first, second, third, fourth = self.transaction_ids[:4]
+        self.poller.track(first, status='pending')
+        self.clock.now += 30
+        self.poller.track(second, status='pending')
+        self.clock.now += 20
+        self.poller.track(third, status='pending')
+        self.poller.track(fourth, status='pending')
+
+        self.advance(10)
+        self.assertEqual(1, self.api.requests)
+        self.assertEqual(3, self.poller.checks)
+        self.assertEqual([fourth], self.poller.due(self.clock.now + 60))
+
+    def test_changes_only(self):
+        first, second = self.transaction_ids[:2]
+        self.poller.track(first, status='pending')
+        self.poller.track(second, status='pending')
+        self.assertEqual([], self.poller.tick())
+        self.assertEqual(0, self.api.requests)
+
+        self.assertEqual([], self.advance(60))
+        self.assertEqual(1, self.api.requests)
+
+        self.api.set_status(first, 'received', 'credited')
+        changes = self.advance(90)
+        self.assertEqual(2, self.api.requests)
+        self.assertEqual([(first, 'pending', 'received')],
+                         [(change.transaction, change.previous, change.status)
+                          for change in changes])
+        self.assertNotIn(first, self.poller)
+        self.assertIn(second, self.poller)
+        self.assertEqual({'tracked': 1, 'requests': 2, 'checks': 4,
+                          'changes': 1}, self.poller.stats())
+
+    def test_backoff(self):
+        self.poller.track(self.transaction_ids[0], status='pending')
+        intervals = []
+        for _ in range(6):
+            intervals.append(self.poller.next_due())
+            self.advance(intervals[-1])
+        self.assertEqual([60, 90, 135, 202.5, 303.75, 455.625], intervals)
+
+        self.clock.now += 86400
+        self.poller.tick()
+        self.assertEqual(3600, self.poller.next_due())
+
+    def test_intervals(self):
+        self.poller.intervals = {'pending': (10, 20)}
+        self.poller.default_interval = (30, 30)
+        first, second = self.transaction_ids[:2]
+        self.poller.track(first, status='pending')
+        self.poller.track(second, status='other')
+        self.assertEqual(10, self.poller.next_due())
+        self.assertEqual([], self.advance(20))
+        self.assertEqual([second, first],
+                         self.poller.due(self.clock.now + 20))
+
+    def test_age(self):
+        self.poller.track(self.transaction_ids[0], status='pending',
+                          created=self.clock.now - 6000)
+        self.assertEqual(600, self.poller.next_due())
+
+        # creation time reported by the API is taken over
+        self.poller.max_age = 500
+        self.advance(600)
+        self.assertEqual(0, len(self.poller))
+        self.assertIsNone(self.poller.next_due())
+
+    def test_unknown_transaction(self):
+        self.poller.track('unknown')
+        self.poller.tick()
+        self.assertEqual([], self.changes)
+        self.assertEqual(90, self.poller.next_due())
+
+    def test_untrack(self):
+        self.poller.track(self.transaction_ids[0])
+        self.poller.untrack(self.transaction_ids[0])
+        self.assertEqual([], self.poller.tick())
+        self.assertEqual(0, self.api.requests)
+        self.assertIsNone(self.poller.next_due())
+
+    def test_update(self):
+        transaction_id = self.transaction_ids[0]
+        self.poller.track(transaction_id, status='pending')
+        self.api.set_status(transaction_id, 'untraceable',
+                            'sofort_bank_account_needed')
+        details = self.client.details(transaction_id)[0]
+
+        self.poller.update(details)
+        self.assertEqual(300, self.poller.next_due())
+        self.poller.update(details)
+        self.assertEqual([('pending', 'untraceable')],
+                         [(change.previous, change.status)
+                          for change in self.changes])
+        self.assertEqual(450, self.poller.next_due())
+
+    def test_errors(self):
+        for transaction_id in self.transaction_ids:
+            self.poller.track(transaction_id)
+        self.client._request_xml = MagicMock(side_effect=IOError)
+        self.assertRaises(IOError, self.poller.tick)
+        self.assertEqual(60, self.poller.next_due())
+
+        errors = []
+        self.poller.on_error = lambda *args: errors.append(args)
+        self.poller.max_batch = 2
+        self.advance(60)
+        self.assertEqual([self.transaction_ids[:2], self.transaction_ids[2:4],
+                          self.transaction_ids[4:]],
+                         [transaction_ids for transaction_ids, _ in errors])
+        self.assertEqual(5, len(self.poller.due(self.clock.now + 60)))
+
+    def test_errors_after_changes(self):
+        details = self.client.details
+        calls = []
+
+        def failing_details(transaction_ids):
+            calls.append(transaction_ids)
+            if len(calls) == 2:
+                raise IOError
+            return details(transaction_ids)
+
+        self.client.details = failing_details
+        self.poller.max_batch = 2
+        self.poller.error_delay = 30
+        for transaction_id in self.transaction_ids[:4]:
+            self.poller.track(transaction_id)
+        self.assertRaises(IOError, self.poller.tick)
+        self.assertEqual(self.transaction_ids[:2],
+                         [change.transaction for change in self.changes])
+        self.assertEqual(self.transaction_ids[2:4],
+                         self.poller.due(self.clock.now + 30))
+
+    def test_failing_subscriber(self):
+        self.poller.callbacks.insert(0, MagicMock(side_effect=ValueError))
+        for transaction_id in self.transaction_ids:
+            self.poller.track(transaction_id)
+        with patch('sofort.polling.logger') as logger:
+            self.poller.tick()
+        self.assertEqual(5, len(self.changes))
+        self.assertEqual(5, logger.exception.call_count)
+
+    def test_cache(self):
+        self.client.details_cache = DetailsCache()
+        transaction_id = self.transaction_ids[0]
+        self.poller.track(transaction_id, status='pending')
+        self.client.details(transaction_id)
+
+        self.api.set_status(transaction_id, 'loss', 'not_credited')
+        self.assertEqual(['loss'],
+                         [change.status for change in self.advance(60)])
+        self.assertEqual('loss',
+                         self.client.details(transaction_id)[0].status)
+
+    def test_background(self):
+        changed = threading.Event()
+        self.poller.subscribe(lambda change: changed.set())
+        with self.poller:
+            self.poller.track(self.transaction_ids[0])
+            self.assertTrue(changed.wait(5))
+        self.assertEqual(1, len(self.changes))
@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import sofort
+from sofort import model
+from sofort.exceptions import RequestError, RequestErrors
+from sofort.refunds import BulkRefunds, RefundJournal
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+SENDER = {
+    'holder': 'Max Samplemerchant',
+    'iban': 'DE71700111109999999999',
+    'bic': 'DEKTDE7GXXX'
+}
+
+REFUND = u"""
+    <refund>
+        <transaction>{0}</transaction>
+        <amount>1.00</amount>
+        <status>{1}</status>
+        {2}
+    </refund>"""
+
+ERRORS = u"""<errors>
+            <error><code>8013</code><message>Amount too high.</message></error>
+        </errors>"""
+
+
+def refunds_response(refunds):
+    rows = []
+    for refund in refunds:
+        if refund['transaction'].startswith('error'):
+            rows.append(REFUND.format(refund['transaction'], 'error', ERRORS))
+        else:
+            rows.append(REFUND.format(refund['transaction'], 'accepted', ''))
+    return model.response((u'<refunds version="3"><title>Refunds</title>' +
+                           u''.join(rows) + u'</refunds>').encode('utf-8'))
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def refunds(self, sender, refunds):
+        with self.lock:
+            self.calls.append([refund['transaction'] for refund in refunds])
+        for refund in refunds:
+            if refund['transaction'].startswith('bad'):
+                raise RequestErrors([RequestError(7000, 'Invalid IBAN')])
+            if refund['transaction'].startswith('lost'):
+                raise IOError('Connection reset')
+        return refunds_response(refunds)
+
+
+def rows(*transactions):
+    return [{'transaction': transaction, 'amount': '1.00',
+             'comment': 'Event cancelled'} for transaction in transactions]
+
+
+class TestRefundsModel(unittest.TestCase):
+    def test_all_refunds_parsed(self):
+        response = refunds_response(rows('a', 'b', 'error-c'))
+        self.assertEqual('a', response.refund.transaction)
+        self.assertEqual(['a', 'b', 'error-c'],
+                         [refund.transaction for refund in response.refunds])
+        self.assertEqual(8013, response.refunds[2].errors[0].code)
+
+
+class TestBulkRefunds(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'refunds.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def engine(self, **kwargs):
+        return BulkRefunds(self.client, SENDER, journal=self.journal,
+                           batch_size=3, workers=2, **kwargs)
+
+    def statuses(self, report):
+        return dict((outcome.refund['transaction'], outcome.status)
+                    for outcome in report)
+
+    def test_batches(self):
+        report = self.engine().run(rows(*'abcdefg'))
+        self.assertEqual(7, len(report))
+        self.assertEqual(set('accepted'.split()),
+                         set(self.statuses(report).values()))
+        self.assertEqual([3, 3, 1],
+                         sorted([len(call) for call in self.client.calls],
+                                reverse=True))
+
+    def test_row_errors(self):
+        report = self.engine().run(rows('a', 'error-b', 'c'))
+        self.assertEqual({'a': 'accepted', 'error-b': 'error',
+                          'c': 'accepted'}, self.statuses(report))
+        failed = [outcome for outcome in report
+                  if outcome.status == 'error'][0]
+        self.assertEqual(['Amount too high.'], failed.errors)
+
+    def test_rejected_batch_is_bisected(self):
+        report = self.engine().run(rows('a', 'bad-b', 'c'))
+        self.assertEqual({'a': 'accepted', 'bad-b': 'failed',
+                          'c': 'accepted'}, self.statuses(report))
+
+    def test_resume_skips_finished_rows(self):
+        self.engine().run(rows('a', 'bad-b', 'lost-c', 'error-d'))
+        self.client.calls = []
+        report = self.engine().run(rows('a', 'bad-b', 'lost-c', 'error-d'))
+        self.assertEqual([['bad-b']], self.client.calls)
+        self.assertEqual({'a': 'accepted', 'bad-b': 'failed',
+                          'lost-c': 'unknown', 'error-d': 'error'},
+                         self.statuses(report))
+
+    def test_crash_after_submit_is_never_resubmitted(self):
+        engine = self.engine()
+        RefundJournal(self.journal).write(
+            [{'key': engine.key(row), 'status': 'submitted'}
+             for row in rows('a')])
+        report = engine.run(rows('a', 'b'))
+        self.assertEqual([['b']], self.client.calls)
+        self.assertEqual({'a': 'unknown', 'b': 'accepted'},
+                         self.statuses(report))
+
+    def test_identical_rows(self):
+        report = self.engine().run(rows('a', 'a', 'b'))
+        self.assertEqual(['accepted'] * 3,
+                         [outcome.status for outcome in report])
+        self.assertEqual(3, len(set(outcome.key for outcome in report)))
+
+        self.client.calls = []
+        self.engine().run(rows('a', 'a', 'a'))
+        self.assertEqual([['a']], self.client.calls)
+
+    def test_non_ascii(self):
+        refund = dict(rows('a')[0], comment=u'R\xfcckerstattung')
+        self.assertEqual(u'a|1.00|R\xfcckerstattung||',
+                         self.engine().key(refund))
+
+        self.engine().run([refund])
+        report = self.engine().run([refund])
+        self.assertEqual([['a']], self.client.calls)
+        self.assertEqual('accepted', report[0].status)
+
+        self.client.refunds = MagicMock(side_effect=RequestErrors(
+            [RequestError(7000, u'Ung\xfcltige IBAN', 'iban')]))
+        report = self.engine().run([dict(refund, transaction='b')])
+        self.assertEqual([u'iban: Ung\xfcltige IBAN'], report[0].errors)
+
+    def test_truncated_journal_line(self):
+        with open(self.journal, 'w') as f:
+            f.write('{"key": "a", "status": "acc')
+        self.assertEqual({}, RefundJournal(self.journal).load())
+
+    def test_without_journal(self):
+        report = BulkRefunds(self.client, SENDER).run(rows('a', 'b'))
+        self.assertEqual(2, len(report))
+
+    def test_with_client(self):
+        client = sofort.Client('user', 'key', '123')
+        client._request_xml = MagicMock(
+            side_effect=lambda config, data: REFUNDS_XML)
+        report = BulkRefunds(client, SENDER).run(rows('a', 'b'))
+        self.assertEqual(['accepted', 'accepted'],
+                         [outcome.status for outcome in report])
+        self.assertIn(b'<transaction>b</transaction>',
+                      client._request_xml.call_args[0][1])
+
+
+REFUNDS_XML = u"""<?xml version="1.0" encoding="UTF-8" ?>
+<refunds version="3">
+    <refund><transaction>a</transaction><status>accepted</status></refund>
+    <refund><transaction>b</transaction><status>accepted</status></refund>
+</refunds>
+"""
@@ -0,0 +1,207 @@
+import threading
+import unittest
+
+import requests
+
+import sofort
+from sofort.exceptions import (CircuitOpenError, RateLimitedError,
+                               ResponseStatusError, ServerError)
+from sofort.resilience import CircuitBreaker, RetryPolicy, retry_after
+from sofort.testing import FakeServer, FakeSofortApi
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import patch
+else:
+    from mock import patch
+
+class Script(object):
+    """Returns values scripted by the test one per request, then
+    ``default``"""
+    def __init__(self, default):
+        self.default = default
+        self.values = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            return self.values.pop(0) if self.values else self.default
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=3)
+        for attempt in range(5):
+            delay = policy.delay(attempt)
+            self.assertTrue(0 <= delay <= min(3, 2 ** attempt))
+        self.assertEqual(2, policy.delay(0, retry_after=2))
+        self.assertEqual(3, policy.delay(0, retry_after=60))
+
+    def test_should_retry(self):
+        policy = RetryPolicy(retries=2)
+        self.assertEqual([True, True, False],
+                         [policy.should_retry(attempt) for attempt in range(3)])
+
+    def test_retry_after(self):
+        self.assertEqual(5, retry_after({'Retry-After': '5'}))
+        self.assertIsNone(retry_after({}))
+        self.assertIsNone(retry_after(
+            {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4,
+                                      reset_timeout=10, clock=self.clock)
+
+    def test_opens_on_error_rate(self):
+        for success in (True, False, True):
+            self.breaker.record(success)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.breaker.record(False)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.assertRaises(CircuitOpenError, self.breaker.before_call)
+
+    def test_half_open_trial(self):
+        for _ in range(4):
+            self.breaker.record(False)
+        self.clock.now = 11
+        self.breaker.before_call()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, self.breaker.state)
+        self.assertRaises(CircuitOpenError, self.breaker.before_call)
+        self.breaker.record(False)
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+
+        self.clock.now = 22
+        self.breaker.before_call()
+        self.breaker.record(True)
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.breaker.before_call()
+
+
+class TestClientResilience(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.delays = Script(0)
+        cls.faults = Script(None)
+        cls.api = FakeSofortApi(latency=cls.delays, errors=cls.faults, seed=1)
+        cls.transaction_id = cls.api.generate(1)[0]
+        cls.server = FakeServer(cls.api)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.script()
+        self.delays.calls = 0
+        self.client = self.create_client()
+
+    def tearDown(self):
+        self.client.close()
+
+    def script(self, *responses):
+        """``(status, delay)`` of the next requests"""
+        self.faults.values = [None if status == 200 else status
+                              for status, _ in responses]
+        self.delays.values = [delay for _, delay in responses]
+
+    @property
+    def requests(self):
+        return self.delays.calls
+
+    def create_client(self, **kwargs):
+        options = dict(
+            base_url=self.server.url,
+            success_url='http://success.url',
+            abort_url='http://abort.url',
+            reasons=['Invoice'],
+            retry=RetryPolicy(retries=2, backoff=0),
+            read_timeout=0.2)
+        options.update(kwargs)
+        return sofort.Client(self.api.user_id, self.api.api_key,
+                             self.api.project_id, **options)
+
+    def test_details_retried_on_server_error(self):
+        self.script((503, 0), (429, 0))
+        details = self.client.details(self.transaction_id)
+        self.assertEqual(self.transaction_id, details[0].transaction)
+        self.assertEqual(3, self.requests)
+
+    def test_retries_exhausted(self):
+        self.script(*[(500, 0)] * 3)
+        with self.assertRaises(ServerError) as raised:
+            self.client.details('id')
+        self.assertEqual(500, raised.exception.status_code)
+        self.assertEqual(3, self.requests)
+
+        self.script(*[(429, 0)] * 3)
+        self.assertRaises(RateLimitedError, self.client.details, 'id')
+
+    def test_unexpected_status(self):
+        self.script((400, 0))
+        with self.assertRaises(ResponseStatusError) as raised:
+            self.client.details('id')
+        self.assertNotIsInstance(raised.exception, ServerError)
+        self.assertEqual('Unexpected response status: 400',
+                         str(raised.exception))
+        self.assertEqual(1, self.requests)
+
+    def test_read_timeout_retried(self):
+        self.script((200, 0.5))
+        self.client.details(self.transaction_id)
+        self.assertEqual(2, self.requests)
+
+    def test_read_timeout(self):
+        self.script(*[(200, 0.5)] * 3)
+        self.assertRaises(requests.Timeout, self.client.details, 'id')
+        self.assertEqual(3, self.requests)
+
+    def test_payment_never_retried(self):
+        self.script((503, 0))
+        self.assertRaises(ServerError, self.client.payment, 10)
+        self.assertEqual(1, self.requests)
+
+        self.script((200, 0.5))
+        self.assertRaises(requests.Timeout, self.client.payment, 10)
+        self.assertEqual(2, self.requests)
+
+    def test_refunds_never_retried(self):
+        self.script((502, 0))
+        self.assertRaises(ServerError, self.client.refunds, {}, [])
+        self.assertEqual(1, self.requests)
+
+    def test_circuit_breaker(self):
+        self.client = self.create_client(
+            retry=None,
+            circuit_breaker=CircuitBreaker(window=3, min_calls=3))
+        self.script(*[(500, 0)] * 3)
+        for _ in range(3):
+            self.assertRaises(ServerError, self.client.details, 'id')
+        self.assertRaises(CircuitOpenError, self.client.details, 'id')
+        self.assertRaises(CircuitOpenError, self.client.payment, 10)
+        self.assertEqual(3, self.requests)
+
+    def test_circuit_trial_unexpected_error(self):
+        breaker = CircuitBreaker(window=1, min_calls=1, reset_timeout=0)
+        self.client = self.create_client(retry=None, circuit_breaker=breaker)
+        breaker.record(False)
+        with patch.object(self.client.transport, 'post',
+                          side_effect=requests.exceptions.ChunkedEncodingError):
+            self.assertRaises(requests.exceptions.ChunkedEncodingError,
+                              self.client.details, 'id')
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+        self.client.details(self.transaction_id)
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import datetime
+import subprocess
+import sys
 import unittest
 import warnings
 
-from ConfigParser import ConfigParser
+try:
+    from ConfigParser import ConfigParser
+except ImportError:
+    from configparser import ConfigParser
 
 import sofort
 
@@ -12,6 +18,44 @@ if hasattr(unittest, 'mock'):
 else:
     from mock import MagicMock
 
+try:
+    basestring
+except NameError:
+    basestring = str
+
+HEAVY_MODULES = ('lxml', 'xmltodict', 'schematics', 'iso8601', 'requests')
+
+
+class TestImport(unittest.TestCase):
+    def loaded(self, code):
+        output = subprocess.check_output([sys.executable, '-c', code + '''
+import sys
+print(' '.join(sorted(set(name.split('.')[0] for name in sys.modules))))
+'''])
+        return set(output.decode('ascii').split()) & set(HEAVY_MODULES)
+
+    def test_import_is_light(self):
+        self.assertEqual(set(), self.loaded(
+            'import sofort\n'
+            'sofort.Client("123456", "secret", "654321")'))
+
+    def test_submodule_attributes(self):
+        # loaded on access, as before imports of the client became lazy
+        self.assertEqual(set(HEAVY_MODULES), self.loaded(
+            'import sofort\n'
+            'sofort.model.lazy_response\n'
+            'sofort.xml.multipay\n'
+            'from sofort import transport\n'
+            'transport.HttpTransport'))
+
+    def test_payment_document_needs_lxml_only(self):
+        self.assertEqual(set(['lxml']), self.loaded(
+            'import sofort\n'
+            'client = sofort.Client("123456", "secret", "654321")\n'
+            'client._payment_request(12, abort_url="a", success_url="b",'
+            ' reasons=["x"])'))
+
+
 class TestSofort(unittest.TestCase):
     def setUp(self):
         config = ConfigParser()
@@ -63,6 +107,28 @@ class TestSofort(unittest.TestCase):
         self.assertIsInstance(tran.payment_url, basestring)
         self.assertEqual('https://www.sofort.com/payment/go/136b2012718da0160fac20c2ec2f51100c90406e', tran.payment_url)
 
+    def test_pay_uses_template(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_RESPONSE)
+        self.client.payment(12, reasons=['Invoice 0001 payment'])
+        template = self.client._multipay_template
+        self.assertIsNotNone(template)
+        self.client.payment(13, reasons=['Invoice 0002 payment'])
+        self.assertIs(template, self.client._multipay_template)
+
+        expected = sofort.xml.multipay(self.client.config.clone().update({
+            'amount': 13,
+            'reasons': ['Invoice 0002 payment']
+        }))
+        self.assertEqual(expected, self.client._request_xml.call_args[0][1])
+
+    def test_pay_template_recompiled_on_config_change(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_RESPONSE)
+        self.client.payment(12)
+        self.client.configure(language_code='de')
+        self.client.payment(12)
+        self.assertIn(b'<language_code>de</language_code>',
+                      self.client._request_xml.call_args[0][1])
+
     def test_refunds(self):
         self.client._request_xml = MagicMock(return_value=REFUNDS_RESPONSE)
         refunds_response = self.client.refunds(sender={
@@ -107,6 +173,103 @@ class TestSofort(unittest.TestCase):
         found = self.client.find_transactions()
         self.assertIs(3, len(found))
 
+    def test_details_stream(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_LIST_BY_IDS_RESPONSE)
+        transactions = self.client.details(['123456-123456-56A29EC6-066A',
+                                            '123456-123456-56A2A0C3-CA99'],
+                                           stream=True)
+        self.assertEqual(
+            ['123456-123456-56A29EC6-066A', '123456-123456-56A2A0C3-CA99'],
+            [tran.transaction for tran in transactions])
+
+    def test_find_transactions_stream(self):
+        self.client._request_xml = MagicMock(return_value=TRANSACTION_LIST_BY_SEARCH_PARAMS)
+        found = list(self.client.find_transactions(stream=True))
+        expected = sofort.model.response(
+            TRANSACTION_LIST_BY_SEARCH_PARAMS.encode('utf-8'))
+        self.assertEqual([tran.to_primitive() for tran in expected],
+                         [tran.to_primitive() for tran in found])
+
+    def test_stream_errors(self):
+        self.client._request_xml = MagicMock(return_value=NEST_ERRORS)
+        self.assertRaises(sofort.exceptions.RequestErrors, list,
+                          self.client.details('123456-123456-56A29EC6-066A',
+                                              stream=True))
+
+    def test_stream_empty(self):
+        self.client._request_xml = MagicMock(return_value='<transactions />')
+        self.assertEqual([], list(self.client.find_transactions(stream=True)))
+
+    def test_stream_error_status_closes_response(self):
+        response = MagicMock(status_code=503, headers={})
+        transport = MagicMock(errors=(IOError,))
+        transport.post.return_value = response
+        client = sofort.Client('user', 'key', '123', transport=transport,
+                               retry=None)
+        self.assertRaises(sofort.exceptions.ServerError, list,
+                          client.details('123456-123456-56A29EC6-066A',
+                                         stream=True))
+        self.assertTrue(transport.post.call_args[1]['stream'])
+        response.close.assert_called_once_with()
+
+    def test_iter_transactions(self):
+        self.client._request_xml = MagicMock(side_effect=[
+            TRANSACTION_LIST_BY_SEARCH_PARAMS,
+            TRANSACTION_LIST_BY_IDS_RESPONSE,
+            TRANSACTION_BY_ID_RESPONSE,
+        ])
+        found = list(self.client.iter_transactions(
+            datetime.datetime(2016, 1, 1),
+            datetime.datetime(2016, 2, 10),
+            page_size=3))
+
+        self.assertEqual(5, len(found))
+        self.assertEqual(5, len(set(tran.transaction for tran in found)))
+        requests = [call[0][1] for call in self.client._request_xml.call_args_list]
+        self.assertIn(b'<page>1</page>', requests[0])
+        self.assertIn(b'<page>2</page>', requests[1])
+        self.assertIn(b'<from_time>2016-01-30T00:00:00</from_time>', requests[2])
+        self.assertIn(b'<to_time>2016-02-10T00:00:00</to_time>', requests[2])
+
+    def test_iter_transactions_empty_page(self):
+        self.client._request_xml = MagicMock(side_effect=[
+            TRANSACTION_LIST_BY_SEARCH_PARAMS,
+            '<transactions />',
+        ])
+        found = list(self.client.iter_transactions(
+            datetime.datetime(2016, 1, 1),
+            datetime.datetime(2016, 1, 10),
+            page_size=3, prefetch_pages=False))
+        self.assertEqual(3, len(found))
+
+    def test_iter_transactions_error(self):
+        self.client._request_xml = MagicMock(return_value=ROOT_ERROR)
+        found = self.client.iter_transactions(datetime.datetime(2016, 1, 1),
+                                              datetime.datetime(2016, 1, 10))
+        self.assertRaises(sofort.exceptions.RequestErrors, list, found)
+
+    def test_details_bulk(self):
+        def request_xml(config, data):
+            if b'bad' in data:
+                return ROOT_ERROR
+            return TRANSACTION_BY_ID_RESPONSE
+
+        self.client._request_xml = MagicMock(side_effect=request_xml)
+        ids = ['id-{0}'.format(i) for i in range(9)] + ['bad-id']
+        results = list(self.client.details_bulk(ids, chunk_size=3, workers=2))
+
+        self.assertEqual(4, len(results))
+        self.assertEqual(4, self.client._request_xml.call_count)
+        self.assertEqual(sorted(ids), sorted(sum(
+            [chunk.transaction_ids for chunk in results], [])))
+        failed = [chunk for chunk in results if chunk.error]
+        self.assertEqual(1, len(failed))
+        self.assertEqual(['bad-id'], failed[0].transaction_ids)
+        self.assertIsInstance(failed[0].error, sofort.exceptions.RequestErrors)
+        for chunk in results:
+            if not chunk.error:
+                self.assertEqual(1, len(chunk.transactions))
+
     def test_root_error(self):
         self.client._request_xml = MagicMock(return_value=ROOT_ERROR)
         self.assertRaises(sofort.exceptions.RequestErrors, self.client.details,
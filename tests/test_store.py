@@ -0,0 +1,143 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import iso8601
+
+import sofort
+from sofort import fastmodel, model
+from sofort.store import TransactionStore
+
+from tests.test_sofort import (TRANSACTION_BY_ID_RESPONSE,
+                               TRANSACTION_LIST_BY_IDS_RESPONSE,
+                               TRANSACTION_LIST_BY_SEARCH_PARAMS)
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+
+class TestTransactionStore(unittest.TestCase):
+    def setUp(self):
+        self.store = TransactionStore()
+        self.client = sofort.Client('user', 'key', '123')
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_round_trip(self):
+        details = model.response(TRANSACTION_BY_ID_RESPONSE)[0]
+        self.store.save(details)
+        loaded = self.store.get(details.transaction)
+
+        self.assertIsInstance(loaded, model.TransactionDetailsModel)
+        for name in ('project_id', 'transaction', 'test', 'time', 'status',
+                     'status_modified', 'amount', 'reasons',
+                     'user_variables'):
+            self.assertEqual(getattr(details, name), getattr(loaded, name))
+        self.assertEqual(details.sender.iban, loaded.sender.iban)
+        self.assertEqual(details.su.consumer_protection,
+                         loaded.su.consumer_protection)
+        self.assertEqual(details.status_history_items[0].time,
+                         loaded.status_history_items[0].time)
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_fastmodel_records(self):
+        self.store.save(fastmodel.response(TRANSACTION_BY_ID_RESPONSE))
+        loaded = self.store.get('123456-123456-56A29EC6-066A')
+        self.assertEqual(datetime.datetime(2016, 1, 22, 21, 28, 14,
+                                           tzinfo=iso8601.UTC),
+                         loaded.status_modified)
+        self.assertEqual(['Testueberweisung', '123456-123456-56A29EC6-066A'],
+                         loaded.reasons)
+
+    def test_find(self):
+        self.store.save(model.response(TRANSACTION_LIST_BY_SEARCH_PARAMS))
+        self.assertEqual(3, len(self.store))
+
+        found = self.store.find(limit=2)
+        self.assertEqual(2, len(found))
+        self.assertTrue(found[0].time >= found[1].time)
+        self.assertEqual([], self.store.find(status='received'))
+        self.assertEqual(3, len(self.store.find(status=['untraceable',
+                                                        'received'])))
+        self.assertEqual([], self.store.find(
+            from_time=datetime.datetime(2016, 3, 1)))
+        self.assertEqual(2, len(self.store.find(
+            from_time=datetime.datetime(2016, 2, 27))))
+        self.assertEqual({'untraceable': 3}, self.store.count())
+        self.assertEqual(3, self.store.count('untraceable'))
+
+    def test_replace(self):
+        details = model.response(TRANSACTION_BY_ID_RESPONSE)[0]
+        self.store.save(details)
+        details.status = 'received'
+        self.store.save(details)
+        self.assertEqual(1, len(self.store))
+        self.assertEqual('received',
+                         self.store.get(details.transaction).status)
+
+    def test_incremental_sync(self):
+        self.client._request_xml = MagicMock(
+            return_value=TRANSACTION_LIST_BY_IDS_RESPONSE)
+        start = datetime.datetime.now(iso8601.UTC)
+        since = start - datetime.timedelta(days=1)
+        self.assertEqual(2, self.store.incremental_sync(self.client,
+                                                        since=since))
+        request = self.client._request_xml.call_args[0][1]
+        self.assertIn(b'<from_status_modified_time>', request)
+        self.assertNotIn(b'<from_time>', request)
+
+        mark = self.store.high_water_mark()
+        self.assertTrue(start <= mark <= datetime.datetime.now(iso8601.UTC))
+
+        self.client._request_xml = MagicMock(return_value='<transactions />')
+        self.assertEqual(0, self.store.incremental_sync(
+            self.client, overlap=datetime.timedelta(seconds=30)))
+        request = self.client._request_xml.call_args_list[0][0][1]
+        from_time = mark - datetime.timedelta(seconds=30)
+        self.assertIn(b'<from_status_modified_time>' +
+                      from_time.isoformat().encode('ascii'), request)
+        self.assertEqual(2, len(self.store))
+
+    def test_save_keeps_mark(self):
+        self.assertIsNone(self.store.high_water_mark())
+        self.client._request_xml = MagicMock(return_value='<transactions />')
+        self.store.incremental_sync(self.client)
+        mark = self.store.high_water_mark()
+
+        # e.g. a notification handler storing a fresh change
+        details = model.response(TRANSACTION_BY_ID_RESPONSE)[0]
+        details.status_modified = mark + datetime.timedelta(hours=1)
+        self.store.save(details)
+        self.assertEqual(mark, self.store.high_water_mark())
+
+    def test_failed_sync_keeps_mark(self):
+        self.client._request_xml = MagicMock(
+            side_effect=[TRANSACTION_LIST_BY_IDS_RESPONSE, IOError])
+        self.assertRaises(IOError, self.store.incremental_sync, self.client,
+                          page_size=2)
+        self.assertEqual(2, len(self.store))
+        self.assertIsNone(self.store.high_water_mark())
+
+
+class TestTransactionStoreFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'transactions.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persistent(self):
+        client = sofort.Client('user', 'key', '123')
+        client._request_xml = MagicMock(return_value='<transactions />')
+        with TransactionStore(self.path) as store:
+            store.save(model.response(TRANSACTION_BY_ID_RESPONSE))
+            store.incremental_sync(client)
+        with TransactionStore(self.path) as store:
+            self.assertEqual(1, len(store))
+            self.assertIsNotNone(store.high_water_mark())
@@ -0,0 +1,133 @@
+import datetime
+import unittest
+
+import iso8601
+
+import sofort
+from sofort.resilience import RetryPolicy
+from sofort.testing import (CONNECTION_ERROR, FakeServer, FakeSofortApi,
+                            FakeTransport)
+
+SENDER = {
+    'holder': 'Max Samplemerchant',
+    'iban': 'DE71700111109999999999',
+    'bic': 'DEKTDE7GXXX'
+}
+
+
+class TestFakeSofortApi(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeSofortApi(seed=1)
+        self.client = self.create_client(FakeTransport(self.api))
+
+    def create_client(self, transport=None, **kwargs):
+        return sofort.Client(self.api.user_id, self.api.api_key,
+                             self.api.project_id, transport=transport,
+                             success_url='http://success.url',
+                             abort_url='http://abort.url',
+                             reasons=['Invoice 52'], **kwargs)
+
+    def test_payment(self):
+        transaction = self.client.payment(12.5)
+        self.assertTrue(transaction.payment_url.startswith(
+            'https://www.sofort.com/payment/go/'))
+
+        details = self.client.details(transaction.transaction)[0]
+        self.assertEqual('untraceable', details.status)
+        self.assertEqual(['Invoice 52'], details.reasons)
+        self.assertEqual('12.5', str(details.amount))
+
+    def test_payment_errors(self):
+        with self.assertRaises(sofort.exceptions.RequestErrors) as context:
+            self.client.payment(-1)
+        self.assertEqual([8054, 8014],
+                         [error.code for error in context.exception.errors])
+
+    def test_generate(self):
+        to_time = datetime.datetime(2016, 2, 1, tzinfo=iso8601.UTC)
+        ids = self.api.generate(250, to_time - datetime.timedelta(days=10),
+                                to_time)
+        self.assertEqual(250, len(set(ids)))
+
+        found = list(self.client.iter_transactions(
+            to_time - datetime.timedelta(days=20), to_time, page_size=100))
+        self.assertEqual(ids, [details.transaction for details in found])
+        self.assertEqual(3, self.api.requests)
+
+        # above what the API returns per page
+        found = list(self.client.iter_transactions(
+            to_time - datetime.timedelta(days=20), to_time, page_size=500))
+        self.assertEqual(ids, [details.transaction for details in found])
+
+    def test_status_modified_search(self):
+        self.api.generate(5, datetime.datetime(2016, 1, 1),
+                          datetime.datetime(2016, 1, 2))
+        transaction = self.client.payment(10)
+        when = datetime.datetime(2030, 1, 1, tzinfo=iso8601.UTC)
+        self.api.set_status(transaction.transaction, 'received', 'credited',
+                            when)
+
+        found = self.client.find_transactions(
+            when - datetime.timedelta(hours=1),
+            when + datetime.timedelta(hours=1),
+            time_field='status_modified_time')
+        self.assertEqual([transaction.transaction],
+                         [details.transaction for details in found])
+        self.assertEqual('received', found[0].status)
+
+    def test_refunds(self):
+        transaction = self.client.payment(10)
+        response = self.client.refunds(SENDER, [
+            {'transaction': transaction.transaction, 'amount': '4.00'},
+            {'transaction': transaction.transaction, 'amount': '7.00'},
+            {'transaction': 'unknown', 'amount': '1.00'},
+        ])
+        self.assertEqual(['accepted', 'error', 'error'],
+                         [refund.status for refund in response.refunds])
+        self.assertEqual(8016, response.refunds[2].errors[0].code)
+
+        details = self.client.details(transaction.transaction)[0]
+        self.assertEqual('4.00', str(details.amount_refunded))
+
+    def test_unauthorized(self):
+        client = sofort.Client('user', 'wrong', '123',
+                               transport=FakeTransport(self.api))
+        self.assertRaises(sofort.exceptions.UnauthorizedError,
+                          client.details, 'id')
+
+    def test_faults(self):
+        self.api.errors = {503: 1.0}
+        client = self.create_client(FakeTransport(self.api),
+                                    retry=RetryPolicy(backoff=0))
+        self.assertRaises(sofort.exceptions.ServerError, client.details,
+                          'id')
+        self.assertEqual(0, self.api.requests)
+
+        self.api.errors = {CONNECTION_ERROR: 1.0}
+        self.assertRaises(client.transport.errors, client.details, 'id')
+
+        faults = [429, None]
+        self.api.errors = lambda: faults.pop(0)
+        self.assertIsNone(client.details('id'))
+        self.assertEqual(1, self.api.requests)
+
+    def test_latency(self):
+        self.assertEqual(0.5, FakeSofortApi(latency=0.5).latency())
+        latency = FakeSofortApi(latency=(0.1, 0.2)).latency()
+        self.assertTrue(0.1 <= latency <= 0.2)
+
+        api = FakeSofortApi(latency=5)
+        client = sofort.Client(api.user_id, api.api_key, api.project_id,
+                               transport=FakeTransport(api), read_timeout=0.01,
+                               retry=None)
+        self.assertRaises(client.transport.errors, client.details, 'id')
+
+    def test_server(self):
+        ids = self.api.generate(3)
+        with FakeServer(self.api) as server:
+            client = self.create_client(base_url=server.url)
+            try:
+                found = client.details(ids)
+            finally:
+                client.close()
+        self.assertEqual(ids, [details.transaction for details in found])
@@ -0,0 +1,137 @@
+import threading
+import unittest
+from decimal import Decimal
+
+import sofort
+from sofort.testing import FakeServer, FakeSofortApi
+from sofort.transport import HttpTransport
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock
+else:
+    from mock import MagicMock
+
+THREADS = 32
+CALLS_PER_THREAD = 50
+
+
+class TestSharedClient(unittest.TestCase):
+    """One client used by many threads at once against the fake API"""
+    def setUp(self):
+        self.api = FakeSofortApi(seed=1)
+        self.server = FakeServer(self.api)
+        self.server.start()
+        self.client = sofort.Client(
+            self.api.user_id, self.api.api_key, self.api.project_id,
+            base_url=self.server.url, pool_maxsize=THREADS,
+            success_url='http://success.url', abort_url='http://abort.url',
+            reasons=['Shop order'])
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def run_threads(self, target):
+        errors = []
+
+        def run(number):
+            try:
+                target(number)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(number,))
+                   for number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+
+    def test_concurrent_payments_and_details(self):
+        mismatches = []
+
+        def work(number):
+            for call in range(CALLS_PER_THREAD):
+                amount = Decimal('{0}.{1:02d}'.format(number + 1, call))
+                reason = 'Order {0}-{1}'.format(number, call)
+                transaction = self.client.payment(amount, reasons=[reason])
+                details = self.client.details(transaction.transaction)[0]
+                if (details.amount, details.reasons) != (amount, [reason]):
+                    mismatches.append((amount, reason, details.amount,
+                                       details.reasons))
+
+        self.run_threads(work)
+        self.assertEqual([], mismatches)
+        self.assertEqual(2 * THREADS * CALLS_PER_THREAD, self.api.requests)
+        self.assertEqual(THREADS * CALLS_PER_THREAD,
+                         len(self.api.transactions))
+        # connections are pooled, not opened per call
+        self.assertLessEqual(self.server.connections, 2 * THREADS)
+        self.assertEqual(('Shop order',), self.client.config.reasons)
+
+    def test_configure_while_running(self):
+        def work(number):
+            for call in range(CALLS_PER_THREAD // 5):
+                if number == 0:
+                    self.client.configure(reasons=['Order {0}'.format(call)])
+                transaction = self.client.payment(1)
+                details = self.client.details(transaction.transaction)[0]
+                self.assertTrue(details.reasons[0].startswith(
+                    ('Shop order', 'Order ')))
+
+        self.run_threads(work)
+        self.assertEqual(('Order 9',), self.client.config.reasons)
+
+
+class TestThreadSafety(unittest.TestCase):
+    def test_frozen_defaults(self):
+        client = sofort.Client('user', 'key', '123', reasons=['Default'])
+        self.assertEqual(set(), client.config.overridden())
+        params = client.config.clone()
+        params.reasons.append('Changed')
+        self.assertEqual(['Default'], client.config.clone().reasons)
+
+        # values are immutable, reading leaves nothing behind that
+        # clone() would freeze again
+        self.assertRaises(AttributeError, getattr, client.config.reasons,
+                          'append')
+        self.assertEqual(('Default',), client.config.reasons)
+        self.assertEqual(set(), client.config.overridden())
+        self.assertTrue(client.config.shares(client.config.clone()))
+
+        self.assertRaises(AttributeError, client.config.update,
+                          {'reasons': ['Other']})
+        self.assertRaises(AttributeError, setattr, client.config,
+                          'language_code', 'de')
+        client.configure(reasons=['Other'])
+        self.assertEqual(('Other',), client.config.reasons)
+
+    def test_session_per_thread(self):
+        transport = HttpTransport()
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(transport._acquire()))
+        thread.start()
+        thread.join()
+        session = transport._acquire()
+        self.assertIsNot(sessions[0], session)
+        self.assertIs(sessions[0].get_adapter('https://api.sofort.com'),
+                      session.get_adapter('https://api.sofort.com'))
+
+    def test_transport_created_once(self):
+        client = sofort.Client('user', 'key', '123')
+        client._create_transport = MagicMock(side_effect=object)
+        transports = []
+
+        def work(number):
+            transports.append(client.transport)
+
+        threads = [threading.Thread(target=work, args=(number,))
+                   for number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(set(map(id, transports))))
+        self.assertEqual(1, client._create_transport.call_count)
@@ -0,0 +1,58 @@
+import unittest
+
+import sofort
+from sofort.transport import HttpTransport
+
+if hasattr(unittest, 'mock'):
+    from unittest.mock import MagicMock, patch
+else:
+    from mock import MagicMock, patch
+
+
+class TestHttpTransport(unittest.TestCase):
+    def test_session_is_reused(self):
+        transport = HttpTransport()
+        self.assertIs(transport._acquire(), transport._acquire())
+
+    def test_pool_settings(self):
+        transport = HttpTransport(pool_connections=3, pool_maxsize=7)
+        adapter = transport._acquire().get_adapter('https://api.sofort.com')
+        self.assertEqual(3, adapter._pool_connections)
+        self.assertEqual(7, adapter._pool_maxsize)
+
+    def test_idle_eviction(self):
+        transport = HttpTransport(idle_timeout=60)
+        with patch('sofort.transport.time.time', return_value=1000):
+            session = transport._acquire()
+        with patch('sofort.transport.time.time', return_value=1030):
+            self.assertIs(session, transport._acquire())
+        with patch('sofort.transport.time.time', return_value=1100):
+            self.assertIsNot(session, transport._acquire())
+
+    def test_close(self):
+        transport = HttpTransport()
+        session = transport._acquire()
+        transport.close()
+        self.assertIsNot(session, transport._acquire())
+
+    def test_no_keep_alive(self):
+        transport = HttpTransport(keep_alive=False)
+        session = MagicMock()
+        transport._create_session = MagicMock(return_value=session)
+        transport.post('http://localhost/', ('user', 'key'), '<xml />')
+        session.post.assert_called_once_with(
+            'http://localhost/', auth=('user', 'key'), data='<xml />',
+            headers={'Connection': 'close'}, stream=False, timeout=None)
+
+
+class TestClientTransport(unittest.TestCase):
+    def test_client_pool_config(self):
+        client = sofort.Client('user', 'key', '123', pool_maxsize=32,
+                               pool_idle_timeout=5)
+        self.assertEqual(32, client.transport.pool_maxsize)
+        self.assertEqual(5, client.transport.idle_timeout)
+
+    def test_context_manager_closes_transport(self):
+        with sofort.Client('user', 'key', '123') as client:
+            client.transport = MagicMock()
+        client.transport.close.assert_called_once_with()
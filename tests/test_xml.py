@@ -39,6 +39,55 @@ class TestSofortXML(XmlTest):
         )
         self.assertXmlEqual(MULTIPAY_SAMPLE, sofort.xml.multipay(conf))
 
+    def test_multipay_template(self):
+        defaults = sofort.internals.Config(
+            project_id=123456,
+            currency_code='EUR',
+            interface_version='python_sofort_v.test',
+            success_link_redirect=True,
+            success_url='http://success.url?trn={}'.format(sofort.TRANSACTION_ID),
+            abort_url='http://abort.url?trn={}'.format(sofort.TRANSACTION_ID),
+            notification_urls={
+                'default': 'http://notify.url',
+                'loss': 'http://notify.url',
+                'refund': 'http://refund.url'
+            },
+            notification_emails={'default': 'shop@example.com'}
+        )
+        template = sofort.xml.MultipayTemplate.compile(defaults)
+
+        for extra in ({'amount': 777, 'reasons': ['Invoice 1']},
+                      {'amount': 1.5, 'reasons': ['A & B', '<x>'],
+                       'user_variables': ['u1', 'u2']},
+                      {'amount': 1}):
+            params = defaults.clone().update(extra)
+            self.assertTrue(template.matches(params))
+            self.assertEqual(sofort.xml.multipay(params),
+                             template.render(params))
+            # multipay() copied the notification dicts into params
+            self.assertTrue(template.matches(params))
+
+        params = defaults.clone().update({
+            'amount': 1,
+            'notification_emails': {'default': 'shop@example.com'}})
+        self.assertTrue(template.matches(params))
+        params.notification_urls['loss'] = 'http://loss.url'
+        self.assertFalse(template.matches(params))
+
+    def test_multipay_template_mismatch(self):
+        defaults = sofort.internals.Config(project_id=1, currency_code='EUR',
+                                           success_url='http://s',
+                                           abort_url='http://a')
+        template = sofort.xml.MultipayTemplate.compile(defaults)
+        self.assertFalse(template.matches(
+            defaults.clone().update({'language_code': 'de'})))
+        self.assertFalse(template.matches(
+            defaults.clone().update({'success_url': 'http://other'})))
+        defaults.update({'success_url': 'http://changed'})
+        self.assertFalse(template.matches(defaults.clone()))
+        self.assertIsNone(sofort.xml.MultipayTemplate.compile(
+            sofort.internals.Config(project_id=1, currency_code='EUR')))
+
     def test_transactions_request_by_id(self):
         ids = [
             '99999-53245-5483-4891',